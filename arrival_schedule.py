@@ -0,0 +1,71 @@
+"""
+Open-loop arrival schedule: intended request start times following a rate plan
+
+The plan is a list of (rps, seconds) steps: a single step is a constant rate,
+several steps make a stepped profile. Free of Locust imports, so engines
+other than Locust (see async_load) can schedule arrivals the same way;
+load_shapes builds the Locust wait time and shape on top of it.
+"""
+import json
+import math
+import time
+
+
+def parse_rate_plan(value):
+    """Parse a JSON rate plan '[[rps, seconds], ...]' into a list of tuples"""
+    steps = [(float(rps), float(seconds)) for rps, seconds in json.loads(value)]
+    if not steps:
+        raise ValueError("Rate plan must contain at least one step")
+    for rps, seconds in steps:
+        if rps <= 0 or seconds <= 0:
+            raise ValueError(f"Invalid rate plan step: {rps} rps for {seconds}s")
+    return steps
+
+
+def plan_duration(steps):
+    """Total length of a rate plan in seconds"""
+    return sum(seconds for _, seconds in steps)
+
+
+def rate_at(steps, elapsed):
+    """Target rate at a moment of the plan, or None once the plan is over"""
+    for rps, seconds in steps:
+        if elapsed < seconds:
+            return rps
+        elapsed -= seconds
+    return None
+
+
+def concurrency_budget(steps, headroom_seconds=2.0):
+    """Users needed to sustain the peak rate with requests taking up to headroom_seconds"""
+    peak = max(rps for rps, _ in steps)
+    return max(1, math.ceil(peak * headroom_seconds))
+
+
+class ArrivalSchedule:
+    """Hands out intended request start times following a rate plan
+
+    Shared by all users of the process. Not thread-safe, but gevent and
+    asyncio only switch on I/O, so next_arrival() is never interleaved.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.start_time = None
+        self._next = None
+
+    def start(self):
+        """Anchor the plan at the current time (done lazily by the first arrival)"""
+        self.start_time = time.time()
+        self._next = self.start_time
+
+    def next_arrival(self):
+        """Reserve the next slot; returns its intended start time or None when the plan is over"""
+        if self.start_time is None:
+            self.start()
+        rps = rate_at(self.steps, self._next - self.start_time)
+        if rps is None:
+            return None
+        slot = self._next
+        self._next += 1.0 / rps
+        return slot
@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+"""
+Asyncio load engine: the locustfile's workload as native coroutines
+
+Locust runs every simulated user as a greenlet and does its own bookkeeping
+for each request, so one process tops out at a few thousand requests per
+second, below what the gRPC server sustains. This engine sends the same
+operation mix (list / get / search / add at 6 / 6 / 3 / 1) with grpc.aio and
+aiohttp: one event loop per process, one process per core.
+
+Scenario configs are read as run_tests.py reads them: closed-loop
+(USERS, SPAWN_RATE, DURATION, 1-3 s between a user's requests) or open-loop
+(TARGET_RPS / RPS_STEPS, latency from the intended start), with the same
+key distribution and seed; process n draws keys from stream n of the seed,
+like Locust worker n. Users, spawn rate and arrival rate are split evenly
+between the processes.
+
+Results are written in Locust's layout (results_stats.csv,
+results_stats_history.csv, results_failures.csv, HDR histograms, workload
+and client CPU) to load_test_results/{TEST_NAME}_async_{user class}/, so
+compare_results.py reports them as one more scenario. Trace replay,
+convergence stop, the network emulator and the payload sweep are Locust-only.
+
+Usage:
+    python async_load.py --config locust_config_open_loop --processes 8
+    python async_load.py --config locust_config_stress --protocol grpc
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from contextlib import nullcontext
+from urllib.parse import quote
+
+import aiohttp
+import grpc
+from hdrh.histogram import HdrHistogram
+
+# Add gRPC service path
+grpc_service_path = os.path.join(os.path.dirname(__file__), "rpc-grpc-protobuf", "glossary_grpc_project", "glossary_service")
+sys.path.insert(0, grpc_service_path)
+
+from glossary_pb2 import AddTermRequest, GetTermRequest, ListTermsRequest, SearchTermsRequest
+from glossary_pb2_grpc import GlossaryServiceStub
+from arrival_schedule import ArrivalSchedule, concurrency_budget, plan_duration
+from grpc_channel_pool import PER_USER, channel_options, parse_channel_mode
+from key_distribution import SAMPLE_KEYWORDS, SEARCH_QUERIES, KeySampler, load_keys, search_queries, seeded_random
+from latency_histogram import HIGHEST_US, LOWEST_US, LatencyHistograms, new_histogram
+from results_store import ResultsStore, write_run_metadata
+from run_tests import (
+    CLIENT_CPU_LIMIT,
+    CONFIGS,
+    RESULTS_DIR,
+    check_servers,
+    duration_seconds,
+    key_settings,
+    load_config,
+    rate_plan,
+)
+from server_sampler import ServerSampler
+
+ENGINE = "asyncio"
+
+# Added to TEST_NAME, so runs of this engine are separate scenarios in the report
+SCENARIO_SUFFIX = "_async"
+
+USER_CLASSES = {"rest": "RestUser", "grpc": "GrpcUser"}
+
+# Task weights of the locustfile's user classes
+OPERATIONS = ["list", "get", "search", "add"]
+OPERATION_WEIGHTS = [6, 6, 3, 1]
+
+# Closed-loop pause between a user's requests, as the locustfile's between(1, 3)
+WAIT_TIME = (1.0, 3.0)
+
+REQUEST_TIMEOUT = 10
+
+# Percentile columns of Locust's stats CSVs
+CSV_PERCENTILES = [50, 66, 75, 80, 90, 95, 98, 99, 99.9, 99.99, 100]
+
+# Per-second history histograms only feed the history CSV: 2 significant digits
+# keep one second of one process at a few hundred bytes encoded
+HISTORY_SIGNIFICANT_FIGURES = 2
+
+
+def history_histogram():
+    return HdrHistogram(LOWEST_US, HIGHEST_US, HISTORY_SIGNIFICANT_FIGURES)
+
+
+class Workload:
+    """Keys, search queries and new terms of one process, drawn like the locustfile's"""
+
+    def __init__(self, settings, stream=0):
+        distribution = settings["key_distribution"]
+        if settings["keywords_file"]:
+            self.keywords = KeySampler(load_keys(settings["keywords_file"]), distribution)
+            self.queries = KeySampler(search_queries(self.keywords.keys), distribution)
+        else:
+            self.keywords = KeySampler(SAMPLE_KEYWORDS, distribution)
+            self.queries = KeySampler(SEARCH_QUERIES, distribution)
+        self.keywords.rng = self.queries.rng = seeded_random(settings["key_seed"], stream)
+
+    def next_operation(self):
+        return random.choices(OPERATIONS, OPERATION_WEIGHTS)[0]
+
+    def new_term(self):
+        keyword = f"TestTerm_{random.randint(10000, 99999)}"
+        return {"keyword": keyword, "description": f"Test description for {keyword}"}
+
+
+class GrpcClient:
+    """The four RPCs on grpc.aio channels, named and judged like GrpcUser's calls"""
+
+    def __init__(self, target, channels, users):
+        count = users if channels == PER_USER else channels
+        self.channels = [grpc.aio.insecure_channel(target, options=channel_options()) for _ in range(count)]
+        self.stubs = [GlossaryServiceStub(channel) for channel in self.channels]
+
+    async def call(self, user, operation, workload):
+        """Send one operation; returns (request type, name, response length, error or None)"""
+        stub = self.stubs[user % len(self.stubs)]
+        accepted = ()
+        if operation == "list":
+            name, method, request = "ListTerms", stub.ListTerms, ListTermsRequest()
+        elif operation == "get":
+            name, method, request = "GetTerm", stub.GetTerm, GetTermRequest(keyword=workload.keywords.sample())
+            accepted = (grpc.StatusCode.NOT_FOUND,)
+        elif operation == "search":
+            name, method, request = "SearchTerms", stub.SearchTerms, SearchTermsRequest(query=workload.queries.sample())
+        else:
+            payload = workload.new_term()
+            name, method = "AddTerm", stub.AddTerm
+            request = AddTermRequest(keyword=payload["keyword"], description=payload["description"])
+            accepted = (grpc.StatusCode.ALREADY_EXISTS,)
+        try:
+            response = await method(request, timeout=REQUEST_TIMEOUT)
+        except grpc.aio.AioRpcError as e:
+            return "gRPC", name, 0, None if e.code() in accepted else f"{e.code().name}: {e.details()}"
+        return "gRPC", name, response.ByteSize(), None
+
+    async def close(self):
+        for channel in self.channels:
+            await channel.close()
+
+
+class RestClient:
+    """The four REST requests on an aiohttp session, named and judged like RestUser's tasks"""
+
+    def __init__(self, base_url, users):
+        # A keep-alive connection per user, as every Locust user has its own session
+        self.session = aiohttp.ClientSession(
+            base_url,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=users),
+        )
+
+    async def call(self, user, operation, workload):
+        """Send one operation; returns (request type, name, response length, error or None)"""
+        params = body = None
+        if operation == "list":
+            method, url, name, accepted = "GET", "/terms", "/terms", (200,)
+        elif operation == "get":
+            keyword = workload.keywords.sample()
+            method, url, name, accepted = "GET", f"/terms/{quote(keyword, safe='')}", "/terms/{keyword}", (200, 404)
+        elif operation == "search":
+            method, url, name, accepted = "GET", "/terms/search", "/terms/search?q={query}", (200,)
+            params = {"q": workload.queries.sample()}
+        else:
+            method, url, name, accepted = "POST", "/terms", "/terms", (201, 400)
+            body = workload.new_term()
+        try:
+            async with self.session.request(method, url, params=params, json=body) as response:
+                status = response.status
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return method, name, 0, f"{type(e).__name__}: {e}"
+        try:
+            json.loads(content)  # Decoded, as the REST tasks decode every response
+        except ValueError:
+            pass
+        error = None if status in accepted else f"Status code: {status}"
+        return method, name, len(content), error
+
+    async def close(self):
+        await self.session.close()
+
+
+class Recorder:
+    """Requests of one process: per-endpoint totals and histograms, failures and a per-second history"""
+
+    def __init__(self):
+        self.histograms = LatencyHistograms()
+        self.endpoints = {}
+        self.failures = {}
+        self.history = []
+        self.users = 0
+        self._second = history_histogram()
+        self._second_totals = [0, 0, 0]  # requests, failures, response bytes
+
+    def record(self, request_type, name, response_time, response_length, error):
+        entry = self.endpoints.get((request_type, name))
+        if entry is None:
+            entry = self.endpoints[(request_type, name)] = {
+                "requests": 0, "failures": 0, "time_ms": 0.0, "min_ms": response_time, "max_ms": 0.0, "bytes": 0,
+            }
+        entry["requests"] += 1
+        entry["time_ms"] += response_time
+        entry["min_ms"] = min(entry["min_ms"], response_time)
+        entry["max_ms"] = max(entry["max_ms"], response_time)
+        entry["bytes"] += response_length
+        self.histograms.record(request_type, name, response_time)
+        self._second.record_value(min(max(int(round(response_time * 1000)), LOWEST_US), HIGHEST_US))
+        self._second_totals[0] += 1
+        self._second_totals[2] += response_length
+        if error is not None:
+            entry["failures"] += 1
+            self._second_totals[1] += 1
+            failure = (request_type, name, error)
+            self.failures[failure] = self.failures.get(failure, 0) + 1
+
+    def close_second(self, timestamp):
+        """Add the requests finished since the last call to the history as second timestamp"""
+        requests_made, failures, response_bytes = self._second_totals
+        self.history.append({
+            "timestamp": timestamp,
+            "users": self.users,
+            "requests": requests_made,
+            "failures": failures,
+            "bytes": response_bytes,
+            "histogram": self._second.encode().decode("ascii") if requests_made else None,
+        })
+        self._second.reset()
+        self._second_totals = [0, 0, 0]
+
+    def to_payload(self, client_cpu):
+        """Picklable results sent to the parent process"""
+        return {
+            "endpoints": self.endpoints,
+            "failures": self.failures,
+            "histograms": self.histograms.to_payload(),
+            "history": self.history,
+            "client_cpu": client_cpu,
+        }
+
+
+async def sleep_until(moment):
+    delay = moment - time.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def send(client, user, workload, recorder, intended_start=None):
+    """Send the next operation of the mix and record it"""
+    operation = workload.next_operation()
+    start = time.perf_counter()
+    request_type, name, response_length, error = await client.call(user, operation, workload)
+    response_time = (time.perf_counter() - start) * 1000
+    if intended_start is not None:
+        # Open-loop: a request sent late because no user was free includes the lag
+        response_time = max(response_time, (time.time() - intended_start) * 1000)
+    recorder.record(request_type, name, response_time, response_length, error)
+
+
+async def closed_loop_user(user, client, workload, recorder):
+    while True:
+        await send(client, user, workload, recorder)
+        await asyncio.sleep(random.uniform(*WAIT_TIME))
+
+
+async def open_loop_user(user, client, workload, recorder, schedule):
+    while True:
+        slot = schedule.next_arrival()
+        if slot is None:
+            return
+        await sleep_until(slot)
+        await send(client, user, workload, recorder, intended_start=slot)
+
+
+async def record_history(recorder):
+    """Close a second of the history at every wall-clock second"""
+    while True:
+        second = math.floor(time.time())
+        await sleep_until(second + 1)
+        recorder.close_second(second)
+
+
+async def run_load(spec, barrier):
+    """Run one process's share of the load; returns its results payload"""
+    workload = Workload(spec["workload"], spec["index"])
+    if spec["protocol"] == "grpc":
+        client = GrpcClient(spec["target"], spec["channels"], spec["users"])
+    else:
+        client = RestClient(spec["target"], spec["users"])
+    recorder = Recorder()
+    # All processes start together, once every one of them is ready
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    cpu_start, start = time.process_time(), time.time()
+    deadline = start + spec["duration"]
+    history = asyncio.create_task(record_history(recorder))
+    users = []
+    try:
+        if spec["plan"]:
+            schedule = ArrivalSchedule(spec["plan"])
+            schedule.start()
+            users = [asyncio.create_task(open_loop_user(user, client, workload, recorder, schedule))
+                     for user in range(spec["users"])]
+            recorder.users = len(users)
+        else:
+            for user in range(spec["users"]):
+                spawn_at = start + user / spec["spawn_rate"]
+                if spawn_at >= deadline:
+                    break
+                await sleep_until(spawn_at)
+                users.append(asyncio.create_task(closed_loop_user(user, client, workload, recorder)))
+                recorder.users = len(users)
+        await sleep_until(deadline)
+    finally:
+        # Requests still in flight at the deadline are dropped, as Locust stops its users
+        for task in users + [history]:
+            task.cancel()
+        await asyncio.gather(*users, history, return_exceptions=True)
+        await client.close()
+    recorder.close_second(math.floor(time.time()))
+
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.time() - start
+    requests_made = sum(entry["requests"] for entry in recorder.endpoints.values())
+    return recorder.to_payload({
+        "cpu_seconds": cpu_seconds,
+        "wall_seconds": wall_seconds,
+        "requests": requests_made,
+        "cpu_ms_per_request": cpu_seconds * 1000 / requests_made if requests_made else None,
+        "cpu_utilization": cpu_seconds / wall_seconds if wall_seconds > 0 else None,
+    })
+
+
+def process_main(spec, barrier, results):
+    """Entry point of a load process"""
+    results.put((spec["index"], asyncio.run(run_load(spec, barrier))))
+
+
+def collect_results(processes, results):
+    """Payloads of all load processes in process order; raises RuntimeError if one of them died"""
+    payloads = {}
+    while len(payloads) < len(processes):
+        try:
+            index, payload = results.get(timeout=1)
+            payloads[index] = payload
+        except queue.Empty:
+            failed = [process for process in processes if process.exitcode not in (None, 0)]
+            if failed:
+                raise RuntimeError(f"{len(failed)} load process(es) failed, exit code {failed[0].exitcode}")
+    return [payloads[index] for index in sorted(payloads)]
+
+
+def share(total, parts, index):
+    """Part index of total split as evenly as possible into parts"""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def percentile_ms(histogram, percentile):
+    return int(round(histogram.get_value_at_percentile(percentile) / 1000))
+
+
+def stats_row(request_type, name, entry, histogram, duration):
+    """One row of Locust's results_stats.csv"""
+    count = entry["requests"]
+    row = {
+        "Type": request_type,
+        "Name": name,
+        "Request Count": count,
+        "Failure Count": entry["failures"],
+        "Median Response Time": percentile_ms(histogram, 50),
+        "Average Response Time": entry["time_ms"] / count if count else 0,
+        "Min Response Time": entry["min_ms"] if count else 0,
+        "Max Response Time": entry["max_ms"],
+        "Average Content Size": entry["bytes"] / count if count else 0,
+        "Requests/s": count / duration,
+        "Failures/s": entry["failures"] / duration,
+    }
+    for percentile in CSV_PERCENTILES:
+        row[f"{percentile:g}%"] = percentile_ms(histogram, percentile)
+    return row
+
+
+def merge_endpoints(payloads):
+    """Per-endpoint totals of all processes"""
+    merged = {}
+    for payload in payloads:
+        for key, entry in payload["endpoints"].items():
+            if key not in merged:
+                merged[key] = dict(entry)
+                continue
+            total = merged[key]
+            for field in ("requests", "failures", "time_ms", "bytes"):
+                total[field] += entry[field]
+            total["min_ms"] = min(total["min_ms"], entry["min_ms"])
+            total["max_ms"] = max(total["max_ms"], entry["max_ms"])
+    return merged
+
+
+def write_stats(output_dir, endpoints, histograms, duration):
+    """results_stats.csv: a row per endpoint (sorted by name, as Locust does) and the Aggregated row"""
+    rows = []
+    for request_type, name in sorted(endpoints, key=lambda key: (key[1], key[0])):
+        histogram = histograms.histograms[f"{request_type} {name}"]
+        rows.append(stats_row(request_type, name, endpoints[(request_type, name)], histogram, duration))
+    total = {"requests": 0, "failures": 0, "time_ms": 0.0, "bytes": 0, "min_ms": 0.0, "max_ms": 0.0}
+    if endpoints:
+        for field in ("requests", "failures", "time_ms", "bytes"):
+            total[field] = sum(entry[field] for entry in endpoints.values())
+        total["min_ms"] = min(entry["min_ms"] for entry in endpoints.values())
+        total["max_ms"] = max(entry["max_ms"] for entry in endpoints.values())
+    rows.append(stats_row("", "Aggregated", total, histograms.combined(), duration))
+    with open(os.path.join(output_dir, "results_stats.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_history(output_dir, payloads):
+    """results_stats_history.csv: an Aggregated row per second, percentiles of that second"""
+    seconds = {}
+    for payload in payloads:
+        for entry in payload["history"]:
+            second = seconds.setdefault(entry["timestamp"], {"users": 0, "requests": 0, "failures": 0, "bytes": 0,
+                                                              "histogram": history_histogram()})
+            for field in ("users", "requests", "failures", "bytes"):
+                second[field] += entry[field]
+            if entry["histogram"]:
+                second["histogram"].add(HdrHistogram.decode(entry["histogram"].encode("ascii")))
+
+    fieldnames = (["Timestamp", "User Count", "Type", "Name", "Requests/s", "Failures/s"]
+                  + [f"{percentile:g}%" for percentile in CSV_PERCENTILES]
+                  + ["Total Request Count", "Total Failure Count", "Total Median Response Time",
+                     "Total Average Response Time", "Total Min Response Time", "Total Max Response Time",
+                     "Total Average Content Size"])
+    cumulative = history_histogram()
+    requests_made = failures = response_bytes = 0
+    with open(os.path.join(output_dir, "results_stats_history.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        for timestamp in sorted(seconds):
+            second = seconds[timestamp]
+            cumulative.add(second["histogram"])
+            requests_made += second["requests"]
+            failures += second["failures"]
+            response_bytes += second["bytes"]
+            if second["requests"]:
+                percentiles = [percentile_ms(second["histogram"], percentile) for percentile in CSV_PERCENTILES]
+            else:
+                percentiles = ["N/A"] * len(CSV_PERCENTILES)
+            if requests_made:
+                totals = [percentile_ms(cumulative, 50), cumulative.get_mean_value() / 1000,
+                          cumulative.get_min_value() / 1000, cumulative.get_max_value() / 1000,
+                          response_bytes / requests_made]
+            else:
+                totals = [0, 0.0, 0, 0, 0]
+            writer.writerow([timestamp, second["users"], "", "Aggregated", f"{second['requests']:.6f}",
+                             f"{second['failures']:.6f}", *percentiles, requests_made, failures, *totals])
+
+
+def write_failures(output_dir, payloads):
+    """results_failures.csv: occurrences of each distinct error per endpoint"""
+    failures = {}
+    for payload in payloads:
+        for key, count in payload["failures"].items():
+            failures[key] = failures.get(key, 0) + count
+    with open(os.path.join(output_dir, "results_failures.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Method", "Name", "Error", "Occurrences"])
+        for (request_type, name, error), count in sorted(failures.items(), key=lambda item: -item[1]):
+            writer.writerow([request_type, name, error, count])
+
+
+def combine_process_cpu(payloads):
+    """Client CPU totals of a run from per-process usage (the busiest process decides saturation)"""
+    processes = {str(index): payload["client_cpu"] for index, payload in enumerate(payloads)}
+    cpu_seconds = sum(usage["cpu_seconds"] for usage in processes.values())
+    requests_made = sum(usage["requests"] for usage in processes.values())
+    utilizations = [usage["cpu_utilization"] for usage in processes.values() if usage["cpu_utilization"] is not None]
+    return {
+        "cpu_seconds": cpu_seconds,
+        "wall_seconds": max(usage["wall_seconds"] for usage in processes.values()),
+        "requests": requests_made,
+        "cpu_ms_per_request": cpu_seconds * 1000 / requests_made if requests_made else None,
+        "cpu_utilization": max(utilizations) if utilizations else None,
+        "workers": processes,
+    }
+
+
+def run_scenario(config_name, protocol, processes, args, server_sampler=None):
+    """Run one scenario config against one protocol with the asyncio engine"""
+    config = load_config(config_name)
+    test_name = config.TEST_NAME + SCENARIO_SUFFIX
+    user_class = USER_CLASSES[protocol]
+    if getattr(config, "TRACE_FILE", None):
+        print(f"Skipping {config.TEST_NAME}: trace replay needs Locust (run_tests.py)")
+        return False
+
+    output_dir = os.path.join(RESULTS_DIR, f"{test_name}_{user_class}")
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Running {test_name} test for {user_class} ({ENGINE} engine)...")
+    write_run_metadata(output_dir, test_name, user_class)
+
+    plan = rate_plan(config)
+    if plan:
+        users = getattr(config, "USERS", None) or concurrency_budget(plan)
+        duration = plan_duration(plan)
+        steps = ", ".join(f"{rps:g} rps x {seconds:g}s" for rps, seconds in plan)
+        print(f"  Open-loop rate plan: {steps}, {users} users")
+    else:
+        users = config.USERS
+        duration = duration_seconds(config.DURATION)
+        print(f"  Users: {config.USERS}, Spawn rate: {config.SPAWN_RATE}, Duration: {config.DURATION}")
+    processes = max(1, min(processes, users))
+
+    distribution, seed, keywords_file = key_settings(config)
+    settings = {
+        "engine": ENGINE,
+        "key_distribution": distribution,
+        "key_seed": seed,
+        "key_streams": processes,
+        "keywords_file": os.path.abspath(keywords_file) if keywords_file else None,
+    }
+    workload = Workload(settings)
+    settings.update(keywords=len(workload.keywords.keys), search_queries=len(workload.queries.keys),
+                    trace_file=None, description_size=0, compression=None)
+    print(f"  Keys: {distribution}, seed {seed}" + (f", from {keywords_file}" if keywords_file else ""))
+
+    channels = parse_channel_mode(args.grpc_channels or getattr(config, "GRPC_CHANNELS", PER_USER))
+    specs = [{
+        "index": index,
+        "protocol": protocol,
+        "target": args.grpc_target if protocol == "grpc" else args.rest_url,
+        "channels": channels,
+        "users": share(users, processes, index),
+        "spawn_rate": None if plan else config.SPAWN_RATE / processes,
+        "duration": duration,
+        "plan": [[rps / processes, seconds] for rps, seconds in plan] if plan else None,
+        "workload": settings,
+    } for index in range(processes)]
+    print(f"  Processes: {processes}")
+
+    # Spawned, not forked: gRPC does not survive a fork of a process that used it
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [context.Process(target=process_main, args=(spec, barrier, results)) for spec in specs]
+    try:
+        with server_sampler.recording(output_dir) if server_sampler else nullcontext():
+            for worker in workers:
+                worker.start()
+            payloads = collect_results(workers, results)
+    except RuntimeError as e:
+        print(f"  Error running test: {e}")
+        print()
+        return False
+    finally:
+        for worker in workers:
+            worker.join(timeout=30)
+            if worker.is_alive():
+                worker.kill()
+
+    histograms = LatencyHistograms()
+    for payload in payloads:
+        histograms.merge(LatencyHistograms.from_payload(payload["histograms"]))
+    endpoints = merge_endpoints(payloads)
+    write_stats(output_dir, endpoints, histograms, duration)
+    write_history(output_dir, payloads)
+    write_failures(output_dir, payloads)
+    if histograms.histograms:
+        histograms.save(os.path.join(output_dir, "results_histograms.json"))
+    with open(os.path.join(output_dir, "results_workload.json"), "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    client_cpu = combine_process_cpu(payloads)
+    with open(os.path.join(output_dir, "results_client_cpu.json"), "w", encoding="utf-8") as f:
+        json.dump({"user_class": user_class, "engine": ENGINE, **client_cpu}, f, indent=2)
+
+    total = sum(entry["requests"] for entry in endpoints.values())
+    failed = sum(entry["failures"] for entry in endpoints.values())
+    combined = histograms.combined() if total else new_histogram()
+    print(f"  {total} requests, {failed} failures, {total / duration:.1f} req/s, "
+          f"p95 {combined.get_value_at_percentile(95) / 1000:.1f} ms")
+    if client_cpu["cpu_ms_per_request"] is not None:
+        print(f"  Client CPU: {client_cpu['cpu_ms_per_request']:.3f} ms per request, "
+              f"{client_cpu['cpu_utilization'] * 100:.0f}% of one core (busiest process)")
+    if client_cpu["cpu_utilization"] is not None and client_cpu["cpu_utilization"] > CLIENT_CPU_LIMIT:
+        print("  WARNING: a load process is CPU bound, results may reflect the client, not the server. "
+              "Use more --processes")
+    print(f"  Test completed. Results saved to {output_dir}")
+    # The next run of the scenario overwrites the directory: keep this one in the history
+    with ResultsStore() as store:
+        store.ingest_run(output_dir)
+    print()
+    return True
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Run REST and gRPC load test scenarios on the asyncio engine")
+    parser.add_argument(
+        "--config",
+        action="append",
+        help="Config module to run (repeatable), e.g. locust_config_open_loop. Defaults to all closed-loop configs",
+    )
+    parser.add_argument("--protocol", choices=["rest", "grpc", "both"], default="both", help="Protocols to test")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Load processes, one event loop each (default: one per core)")
+    parser.add_argument("--rest-url", default="http://localhost:8000", help="REST API base URL")
+    parser.add_argument("--grpc-target", default="localhost:50051", help="gRPC server address")
+    parser.add_argument("--grpc-channels",
+                        help="gRPC channels per process: 'per-user' or a number shared by the process's users "
+                             "(default: GRPC_CHANNELS of the config)")
+    parser.add_argument("--rest-pid", type=int, help="REST server PID (default: found by port 8000)")
+    parser.add_argument("--grpc-pid", type=int, help="gRPC server PID (default: found by port 50051)")
+    parser.add_argument("--sample-interval", type=float, default=1.0,
+                        help="Server resource sampling interval in seconds (0 disables sampling)")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    configs = args.config or CONFIGS
+    protocols = ["rest", "grpc"] if args.protocol == "both" else [args.protocol]
+
+    if not check_servers():
+        print("\nUse 'python check_servers.py' for detailed server status.")
+        sys.exit(1)
+
+    sampler = None
+    if args.sample_interval > 0:
+        sampler = ServerSampler.create(args.rest_pid, args.grpc_pid, args.sample_interval)
+
+    print(f"\nStarting load testing ({ENGINE} engine)...")
+    print(f"Results will be saved to: {RESULTS_DIR}\n")
+    for protocol in protocols:
+        print(f"=== Testing {'gRPC API' if protocol == 'grpc' else 'REST API (FastAPI)'} ===")
+        for config in configs:
+            run_scenario(config, protocol, args.processes, args, server_sampler=sampler)
+
+    print("All tests completed!")
+    print("Run 'python compare_results.py' to analyze and compare results.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Capacity search: find the maximum sustainable request rate of each server
+under a latency and error-rate SLO
+
+Runs short open-loop steps (see load_shapes.py) at increasing arrival rates.
+The rate grows geometrically until a step breaks the SLO, then the interval
+between the last passing and the first failing rate is bisected to locate
+the knee. Each step's Locust output is kept under
+load_test_results/capacity_search/{user_class}/{rps}rps/ and the latency
+curve with the result is saved to capacity.json next to them.
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from types import SimpleNamespace
+
+from run_tests import RESULTS_DIR, check_servers, run_test
+
+CAPACITY_DIR = os.path.join(RESULTS_DIR, "capacity_search")
+
+
+def read_aggregated(output_dir):
+    """Read the Aggregated row of a step's results_stats.csv"""
+    path = os.path.join(output_dir, "results_stats.csv")
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] != "Aggregated":
+                continue
+            requests = int(row["Request Count"])
+            failures = int(row["Failure Count"])
+            return {
+                "requests": requests,
+                "error_rate": failures / requests * 100 if requests else 100.0,
+                "rps": float(row["Requests/s"]),
+                "p50": float(row["50%"]),
+                "p95": float(row["95%"]),
+                "p99": float(row["99%"]),
+            }
+    return None
+
+
+def meets_slo(stats, target_rps, args):
+    """Whether a step kept p99, error rate and the offered rate within the SLO"""
+    return (
+        stats["requests"] > 0
+        and stats["p99"] <= args.slo_p99_ms
+        and stats["error_rate"] <= args.slo_error_rate
+        and stats["rps"] >= target_rps * args.min_throughput_ratio
+    )
+
+
+def run_step(user_class, protocol_name, target_rps, args):
+    """Run one open-loop step at a fixed arrival rate and evaluate it"""
+    config = SimpleNamespace(
+        TEST_NAME=f"capacity_{target_rps:g}rps",
+        TARGET_RPS=target_rps,
+        DURATION=args.step_duration,
+        USERS=args.users,
+    )
+    output_dir = os.path.join(CAPACITY_DIR, user_class, f"{target_rps:g}rps")
+    stats = None
+    if run_test(config, user_class, protocol_name, output_dir=output_dir, workers=args.workers):
+        stats = read_aggregated(output_dir)
+
+    point = {"target_rps": target_rps, **(stats or {})}
+    point["passed"] = stats is not None and meets_slo(stats, target_rps, args)
+
+    if stats:
+        verdict = "PASS" if point["passed"] else "FAIL"
+        print(f"  {verdict}: {stats['rps']:.1f} rps achieved, p99 {stats['p99']:.0f} ms, "
+              f"errors {stats['error_rate']:.2f}%")
+    else:
+        print("  FAIL: no results")
+    print()
+    return point
+
+
+def find_capacity(user_class, protocol_name, args):
+    """Ramp then bisect the arrival rate; return the capacity result dict"""
+    curve = []
+    passed_rps = None
+    failed_rps = None
+
+    # Geometric ramp until the SLO breaks
+    target_rps = args.start_rps
+    while target_rps <= args.max_rps:
+        point = run_step(user_class, protocol_name, target_rps, args)
+        curve.append(point)
+        if not point["passed"]:
+            failed_rps = target_rps
+            break
+        passed_rps = target_rps
+        target_rps = round(target_rps * args.growth, 1)
+
+    # Bisect between the last passing and the first failing rate
+    if passed_rps is not None and failed_rps is not None:
+        for _ in range(args.bisect_steps):
+            if (failed_rps - passed_rps) / passed_rps <= args.tolerance:
+                break
+            target_rps = round((passed_rps + failed_rps) / 2, 1)
+            point = run_step(user_class, protocol_name, target_rps, args)
+            curve.append(point)
+            if point["passed"]:
+                passed_rps = target_rps
+            else:
+                failed_rps = target_rps
+
+    curve.sort(key=lambda p: p["target_rps"])
+    result = {
+        "user_class": user_class,
+        "protocol": protocol_name,
+        "slo": {
+            "p99_ms": args.slo_p99_ms,
+            "error_rate": args.slo_error_rate,
+            "min_throughput_ratio": args.min_throughput_ratio,
+        },
+        "step_duration": args.step_duration,
+        "max_sustainable_rps": passed_rps,
+        "first_failing_rps": failed_rps,
+        "curve": curve,
+    }
+
+    output_dir = os.path.join(CAPACITY_DIR, user_class)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "capacity.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Find max sustainable RPS for REST and gRPC under an SLO")
+    parser.add_argument("--slo-p99-ms", type=float, default=250.0, help="p99 latency limit in ms")
+    parser.add_argument("--slo-error-rate", type=float, default=1.0, help="Error rate limit in percent")
+    parser.add_argument("--min-throughput-ratio", type=float, default=0.9,
+                        help="Achieved/target RPS below this ratio counts as saturation")
+    parser.add_argument("--start-rps", type=float, default=50.0, help="First step rate")
+    parser.add_argument("--max-rps", type=float, default=20000.0, help="Stop ramping above this rate")
+    parser.add_argument("--growth", type=float, default=1.5, help="Rate multiplier between ramp steps")
+    parser.add_argument("--bisect-steps", type=int, default=4, help="Maximum bisection steps after the ramp")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Stop bisecting when pass/fail rates are within this relative gap")
+    parser.add_argument("--step-duration", default="1m", help="Length of each step, e.g. 30s, 1m")
+    parser.add_argument("--users", type=int, default=None,
+                        help="Concurrency budget per step (default: derived from the rate)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Local Locust worker processes per step (default: one per core, 0 = single process)")
+    parser.add_argument("--rest-user", choices=["RestUser", "FastRestUser"], default="RestUser",
+                        help="REST user class to search with")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    if not check_servers():
+        print("\nUse 'python check_servers.py' for detailed server status.")
+        return 1
+
+    print(f"\nSearching capacity: p99 <= {args.slo_p99_ms:g} ms, errors <= {args.slo_error_rate:g}%")
+    print(f"Results will be saved to: {CAPACITY_DIR}")
+    print()
+
+    results = []
+    for user_class, protocol_name in [(args.rest_user, "REST"), ("GrpcUser", "gRPC")]:
+        print(f"=== Capacity search: {protocol_name} ({user_class}) ===")
+        results.append(find_capacity(user_class, protocol_name, args))
+
+    print("=== Max sustainable RPS ===")
+    for result in results:
+        max_rps = result["max_sustainable_rps"]
+        if max_rps is None:
+            print(f"  {result['protocol']}: SLO not met even at {args.start_rps:g} rps")
+        elif result["first_failing_rps"] is None:
+            print(f"  {result['protocol']}: >= {max_rps:g} rps (knee not reached below --max-rps)")
+        else:
+            print(f"  {result['protocol']}: {max_rps:g} rps (fails at {result['first_failing_rps']:g} rps)")
+    print("Run 'python compare_results.py' to include the curves in the report.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Self-check that gRPC calls overlap under gevent the same way GrpcUser runs them.
+
+Spawns N greenlets (one per simulated user) that each issue a ListTerms call
+over a shared channel and reports how many calls were in flight at once.
+With working gevent integration the peak matches the user count; with
+blocking calls it stays at 1.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import sys
+import os
+import time
+import gevent
+import grpc
+from grpc.experimental import gevent as grpc_gevent
+
+grpc_gevent.init_gevent()
+
+# Add gRPC service path
+grpc_service_path = os.path.join(os.path.dirname(__file__), "rpc-grpc-protobuf", "glossary_grpc_project", "glossary_service")
+sys.path.insert(0, grpc_service_path)
+
+from glossary_pb2 import ListTermsRequest
+from glossary_pb2_grpc import GlossaryServiceStub
+
+GRPC_SERVER = "localhost:50051"
+
+
+def measure_concurrency(users):
+    """Fire one RPC per user concurrently, return (peak in-flight, errors, elapsed)"""
+    channel = grpc.insecure_channel(GRPC_SERVER)
+    stub = GlossaryServiceStub(channel)
+    state = {"current": 0, "peak": 0, "errors": 0}
+
+    def one_call():
+        state["current"] += 1
+        state["peak"] = max(state["peak"], state["current"])
+        try:
+            stub.ListTerms(ListTermsRequest(), timeout=30)
+        except grpc.RpcError:
+            state["errors"] += 1
+        finally:
+            state["current"] -= 1
+
+    start_time = time.time()
+    gevent.joinall([gevent.spawn(one_call) for _ in range(users)])
+    elapsed = time.time() - start_time
+    channel.close()
+    return state["peak"], state["errors"], elapsed
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=500, help="Number of concurrent callers")
+    parser.add_argument("--tolerance", type=float, default=0.9,
+                        help="Minimum fraction of users that must be in flight at once")
+    args = parser.parse_args()
+
+    print(f"Checking gRPC concurrency with {args.users} greenlets...")
+    peak, errors, elapsed = measure_concurrency(args.users)
+    print(f"  Peak in-flight calls: {peak}")
+    print(f"  Errors: {errors}")
+    print(f"  Elapsed: {elapsed:.2f}s")
+
+    if peak >= args.users * args.tolerance:
+        print("✓ gRPC calls run concurrently under gevent")
+        return 0
+    print("✗ gRPC calls are serialized, measured latency will include client-side queueing")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
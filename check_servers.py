@@ -13,6 +13,7 @@ sys.path.insert(0, grpc_service_path)
 
 from glossary_pb2 import ListTermsRequest
 from glossary_pb2_grpc import GlossaryServiceStub
+from grpc_channel_pool import MAX_RECEIVE_MESSAGE_LENGTH
 
 REST_URL = "http://localhost:8000"
 GRPC_SERVER = "localhost:50051"
@@ -36,7 +37,9 @@ def check_rest_server():
 def check_grpc_server():
     """Check if gRPC server is running"""
     try:
-        channel = grpc.insecure_channel(GRPC_SERVER)
+        channel = grpc.insecure_channel(GRPC_SERVER, options=[
+            ("grpc.max_receive_message_length", MAX_RECEIVE_MESSAGE_LENGTH),
+        ])
         stub = GlossaryServiceStub(channel)
         request = ListTermsRequest()
         # Try to call with short timeout
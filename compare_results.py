@@ -3,26 +3,123 @@
 Script to analyze and compare load test results between REST and gRPC
 """
 import os
+import re
 import csv
 import json
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from collections import defaultdict
 
+from confidence_intervals import DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES, compare_runs, histogram_buckets
+from history_analysis import HISTORY_FILE, MIN_TREND_CHANGE, ROLLING_SECONDS, analyze_history
+from latency_histogram import LatencyHistograms, new_histogram, summarize
+from network_emulator import BYTE_COUNTING_PROFILE, STATS_FILE as NETWORK_STATS_FILE
+from request_phases import PhaseStats
+from results_store import ResultsStore
+from server_profiler import OTHER_COMPONENT, PROFILE_FILE, summarize_profile
+from server_sampler import SAMPLES_FILE, summarize_samples
+
 
 RESULTS_DIR = "load_test_results"
 OUTPUT_FILE = "LOAD_TESTING_REPORT.md"
 
+# REST user classes in order of preference when several were run
+REST_USER_CLASSES = ["RestUser", "FastRestUser", "Http2RestUser"]
+
+# REST over HTTP/2, compared with the HTTP/1.1 REST class and gRPC per operation
+HTTP2_REST_USER = "Http2RestUser"
+
+# Subdirectory written by capacity_search.py (not a regular scenario)
+CAPACITY_DIR_NAME = "capacity_search"
+
+# Marker that run_tests.py adds to scenario names of gRPC channel mode runs
+CHANNEL_MODE_MARKER = "_channels-"
+
+# Test name suffix of runs made over a generated dataset, e.g. normal_load_terms-100000
+DATASET_SIZE_MARKER = "_terms-"
+
+# Test name suffix of repeated runs of a scenario (run_tests.py --trials), e.g. normal_load_trial-2
+TRIAL_MARKER = "_trial-"
+
+# Test name markers of payload sweep runs (run_tests.py --description-sizes / --compression),
+# e.g. light_load_net-direct_desc-4096_comp-gzip
+PAYLOAD_PATTERN = re.compile(r"_desc-(\d+)|_comp-([a-z]+)")
+
+# Report metrics backed by a bootstrap comparison (metric key -> statistic)
+SIGNIFICANCE_METRICS = {
+    "avg_response_time": "mean",
+    "median_response_time": "p50",
+    "p95_response_time": "p95",
+    "p99_response_time": "p99",
+    "avg_rps": "rps",
+}
+
+# Rows of the confidence interval tables (statistic, label)
+SIGNIFICANCE_ROWS = [
+    ("mean", "Среднее время ответа (мс)"),
+    ("p50", "Медиана (мс)"),
+    ("p95", "P95 (мс)"),
+    ("p99", "P99 (мс)"),
+    ("rps", "RPS"),
+]
+
+# Written by serialization_benchmark.py into the results directory
+SERIALIZATION_FILE = "serialization_benchmark.json"
+
+# List size shown in the serialization section when it was benchmarked
+SERIALIZATION_REPORT_SIZE = 1000
+
+# Locust's per-endpoint stats file; results_requests.csv is the name used by older runs
+STATS_FILES = ["results_stats.csv", "results_requests.csv"]
+
+# Equivalent REST and gRPC operations (operation, label, REST request type, REST name)
+OPERATIONS = [
+    ("ListTerms", "Список терминов", "GET", "/terms"),
+    ("GetTerm", "Поиск по ключу", "GET", "/terms/{keyword}"),
+    ("SearchTerms", "Поиск (LIKE)", "GET", "/terms/search?q={query}"),
+    ("AddTerm", "Добавление", "POST", "/terms"),
+]
+
+# Phase columns of the overhead section, in report order (phase key, header)
+PHASE_COLUMNS = [
+    ("request_bytes", "Запрос (байт)"),
+    ("response_bytes", "Ответ (байт)"),
+    ("connection_reused", "Соединение переиспользовано (%)"),
+    ("connect_ms", "Подключение (мс)"),
+    ("serialize_ms", "Сериализация (мс)"),
+    ("ttfb_ms", "TTFB (мс)"),
+    ("time_to_message_ms", "Сеть + сервер (мс)"),
+    ("body_read_ms", "Чтение тела (мс)"),
+    ("decode_ms", "Декодирование JSON (мс)"),
+    ("deserialize_ms", "Десериализация (мс)"),
+    ("client_overhead_ms", "Стек клиента (мс)"),
+    ("total_ms", "Всего (мс)"),
+]
+
+# Equivalent REST and gRPC phases compared side by side (label, REST key, gRPC key)
+PHASE_COMPARISON = [
+    ("Размер запроса (байт)", "request_bytes", "request_bytes"),
+    ("Размер ответа (байт)", "response_bytes", "response_bytes"),
+    ("Подключение (мс)", "connect_ms", None),
+    ("Кодирование запроса (мс)", None, "serialize_ms"),
+    ("Сеть + сервер до ответа (мс)", "ttfb_ms", "time_to_message_ms"),
+    ("Чтение тела ответа (мс)", "body_read_ms", None),
+    ("Декодирование ответа (мс)", "decode_ms", "deserialize_ms"),
+]
+
 
 def load_csv_results(results_dir):
     """Load CSV results from Locust output"""
     results = {}
     
     for root, dirs, files in os.walk(results_dir):
-        for file in files:
-            if file.startswith("results_requests") and file.endswith(".csv"):
+        dirs[:] = [d for d in dirs if d != CAPACITY_DIR_NAME]
+        for file in STATS_FILES:
+            if file in files:
                 # Extract test name and protocol from directory structure
-                # Format: {test_name}_{user_class}/results_requests.csv
+                # Format: {test_name}_{user_class}/results_stats.csv
                 dir_name = os.path.basename(root)
                 parts = dir_name.split("_")
                 if len(parts) >= 2:
@@ -37,34 +134,426 @@ def load_csv_results(results_dir):
                         results[test_name][protocol] = df
                     except Exception as e:
                         print(f"Error loading {filepath}: {e}")
+                break
     
     return results
 
 
+def load_run_files(results_dir, filename, loader):
+    """Load a per-run side file from every scenario directory, keyed like load_csv_results"""
+    loaded = {}
+    for root, dirs, files in os.walk(results_dir):
+        dirs[:] = [d for d in dirs if d != CAPACITY_DIR_NAME]
+        if filename not in files:
+            continue
+        dir_name = os.path.basename(root)
+        parts = dir_name.split("_")
+        if len(parts) >= 2:
+            test_name = "_".join(parts[:-1])
+            protocol = parts[-1]
+            filepath = os.path.join(root, filename)
+            try:
+                loaded.setdefault(test_name, {})[protocol] = loader(filepath)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading {filepath}: {e}")
+    return loaded
+
+
+def load_json(filepath):
+    with open(filepath, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_client_cpu(results_dir):
+    """Load client CPU cost files written by the locustfile"""
+    return load_run_files(results_dir, "results_client_cpu.json", load_json)
+
+
+def load_workloads(results_dir):
+    """Load the key distribution and seed each run was made with"""
+    return load_run_files(results_dir, "results_workload.json", load_json)
+
+
+def load_convergence(results_dir):
+    """Load the actual duration and convergence state of runs made in convergence mode"""
+    return load_run_files(results_dir, "results_convergence.json", load_json)
+
+
+def format_convergence(state):
+    """Report wording for the convergence state of one run"""
+    outcome = "сошёлся, остановлен досрочно" if state["stopped_early"] else "не сошёлся, до предела длительности"
+    text = f"{state['duration_s']:.0f} с ({outcome}"
+    estimates = state.get("estimates")
+    if estimates:
+        text += (f"; P95 ±{estimates['p95_relative_half_width'] * 100:.1f}%, "
+                 f"RPS ±{estimates['rps_relative_half_width'] * 100:.1f}%")
+    return text + ")"
+
+
+def load_histograms(results_dir):
+    """Load per-endpoint HDR latency histograms written by the locustfile"""
+    return load_run_files(results_dir, "results_histograms.json", LatencyHistograms.load)
+
+
+def load_server_resources(results_dir):
+    """Load per-server resource summaries sampled during each run"""
+    return load_run_files(results_dir, SAMPLES_FILE, summarize_samples)
+
+
+def load_history_analyses(results_dir):
+    """Load the peaks, warm-up, steady-state and trend analysis of each run's stats history"""
+    return load_run_files(results_dir, HISTORY_FILE, analyze_history)
+
+
+def history_peaks(history, key):
+    """One peak ("peak_users" or "peak_rps") of each run, from its history analysis"""
+    return {
+        test_name: {user_class: analysis[key] for user_class, analysis in runs.items()}
+        for test_name, runs in history.items()
+    }
+
+
+def load_network(results_dir):
+    """Load the network profile and forwarded traffic of runs made through the network emulator"""
+    return load_run_files(results_dir, NETWORK_STATS_FILE, load_json)
+
+
+def network_metrics(network, route, total_requests):
+    """Bytes on the wire per request in each direction and retransmission stalls of one run"""
+    stats = network["routes"].get(route)
+    if not stats or not total_requests:
+        return {}
+    return {
+        "net_up_bytes_per_request": stats["up"]["bytes"] / total_requests,
+        "net_down_bytes_per_request": stats["down"]["bytes"] / total_requests,
+        "net_stalls": stats["up"]["stalls"] + stats["down"]["stalls"],
+    }
+
+
+def format_network(network):
+    """Report wording for an emulated network profile"""
+    def describe(link):
+        bandwidth = f"{link['bandwidth_mbps']:g} Мбит/с" if link["bandwidth_mbps"] else "полоса не ограничена"
+        return f"{link['latency_ms']:g}±{link['jitter_ms']:g} мс, {bandwidth}, потери {link['loss'] * 100:g}%"
+    
+    links = f"↑ {describe(network['links']['up'])}; ↓ {describe(network['links']['down'])}"
+    text = f"`{network['profile']}` ({links})"
+    if network["profile"] == BYTE_COUNTING_PROFILE:
+        text += (". **Время ответа и CPU не сравнимы с прогонами без эмуляции сети**: каждый запрос "
+                 "проходит через прокси, считающий байты, в процессе run_tests.py, а под высокой нагрузкой "
+                 "прокси сам становится узким местом")
+    return text
+
+
+def server_metrics(resources, server, total_requests, peak_users):
+    """Server efficiency metrics of one run: CPU per request and memory per user"""
+    summary = resources.get(server)
+    if not summary:
+        return {}
+    metrics = {
+        "server_peak_rss_mb": summary["peak_rss_bytes"] / (1024 * 1024),
+        "server_peak_threads": summary["peak_threads"],
+    }
+    if total_requests:
+        metrics["server_cpu_ms"] = summary["cpu_seconds"] * 1000 / total_requests
+    if peak_users:
+        metrics["server_rss_per_user_kb"] = summary["peak_rss_bytes"] / 1024 / peak_users
+    return metrics
+
+
+def load_phases(results_dir):
+    """Load per-endpoint request phase timings written by the locustfile"""
+    return load_run_files(results_dir, "results_phases.json", PhaseStats.load)
+
+
+def format_phase(key, value):
+    """Format a phase mean for the report"""
+    if value is None:
+        return "N/A"
+    if key == "connection_reused":
+        return f"{value * 100:.1f}"
+    if key.endswith("_bytes"):
+        return f"{value:.0f}"
+    return f"{value:.3f}"
+
+
+def generate_phase_comparison(scenario_phases):
+    """Side-by-side table of request-weighted REST and gRPC phase means"""
+    rest_user = pick_rest_user(scenario_phases)
+    if not rest_user or "GrpcUser" not in scenario_phases:
+        return ""
+    rest = scenario_phases[rest_user].overall()
+    grpc_phases = scenario_phases["GrpcUser"].overall()
+    
+    table = f"| Фаза | REST ({rest_user}) | gRPC |\n"
+    table += "|------|------|------|\n"
+    for label, rest_key, grpc_key in PHASE_COMPARISON:
+        rest_val = rest.get(rest_key) if rest_key else None
+        grpc_val = grpc_phases.get(grpc_key) if grpc_key else None
+        if rest_val is None and grpc_val is None:
+            continue
+        rest_str = format_phase(rest_key, rest_val) if rest_key else "—"
+        grpc_str = format_phase(grpc_key, grpc_val) if grpc_key else "—"
+        table += f"| {label} | {rest_str} | {grpc_str} |\n"
+    return table + "\n"
+
+
+def generate_overhead_section(phases):
+    """Build a report section with measured per-endpoint phase breakdowns"""
+    if not phases:
+        return ""
+    
+    section = "### Анализ overhead (измерено)\n\n"
+    section += "Средние значения по каждому эндпоинту: размеры сообщений в байтах и время фаз запроса в мс.\n\n"
+    for test_name in sorted(phases):
+        comparison = generate_phase_comparison(phases[test_name])
+        if comparison:
+            section += f"#### {test_name.replace('_', ' ').title()} — REST и gRPC\n\n"
+            section += "Среднее по всем запросам сценария («—» — у протокола нет такой фазы).\n\n"
+            section += comparison
+        for user_class in sorted(phases[test_name]):
+            endpoints = phases[test_name][user_class].means()
+            columns = [(key, label) for key, label in PHASE_COLUMNS
+                       if any(key in means for means in endpoints.values())]
+            if not columns:
+                continue
+            section += f"#### {test_name.replace('_', ' ').title()} — {user_class}\n\n"
+            section += "| Эндпоинт | " + " | ".join(label for _, label in columns) + " |\n"
+            section += "|----------|" + "|".join("-" * (len(label) + 2) for _, label in columns) + "|\n"
+            for endpoint in sorted(endpoints):
+                means = endpoints[endpoint]
+                cells = [format_phase(key, means.get(key)) for key, _ in columns]
+                section += f"| {endpoint} | " + " | ".join(cells) + " |\n"
+            section += "\n"
+    return section
+
+
+def load_profiles(results_dir):
+    """Load summaries of the server stacks sampled by py-spy during each run"""
+    return load_run_files(results_dir, PROFILE_FILE, summarize_profile)
+
+
+def component_label(component):
+    return "Прочее (код сервиса, стандартная библиотека)" if component == OTHER_COMPONENT else component
+
+
+def component_share(profile, component):
+    """Percent of a profile's samples spent in a component"""
+    return profile["components"].get(component, 0) / profile["samples"] * 100
+
+
+def generate_profile_section(profiles):
+    """Build a report section with the server time per component and the top self-time functions"""
+    if not profiles:
+        return ""
+    
+    section = "### Профилирование серверов (py-spy)\n\n"
+    section += ("Сэмплы стеков сервера под нагрузкой (`run_tests.py --profile-servers`, полные стеки — "
+                "`server_profile.txt` в каталоге прогона). Компонент — самая глубокая известная библиотека "
+                "на стеке; собственное время — доля сэмплов, в которых функция на вершине стека. "
+                "Время в C коде относится к вызывающей Python функции: запросы SQLite входят в SQLAlchemy. "
+                "Ожидание блокировки SQLite попадает в сэмплы только с `--profile-idle`.\n\n")
+    for test_name in sorted(profiles):
+        scenario = {user_class: profile for user_class, profile in profiles[test_name].items()
+                    if profile["samples"]}
+        if not scenario:
+            continue
+        user_classes = sorted(scenario)
+        title = test_name.replace('_', ' ').title()
+        section += f"#### {title} — время сервера по компонентам\n\n"
+        section += "| Компонент | " + " | ".join(f"{user_class} (%)" for user_class in user_classes) + " |\n"
+        section += "|-----------|" + "|".join("-" * (len(user_class) + 6) for user_class in user_classes) + "|\n"
+        components = sorted(
+            {component for profile in scenario.values() for component in profile["components"]},
+            key=lambda component: (component == OTHER_COMPONENT,
+                                   -max(component_share(profile, component) for profile in scenario.values())),
+        )
+        for component in components:
+            cells = [f"{component_share(scenario[user_class], component):.1f}" for user_class in user_classes]
+            section += f"| {component_label(component)} | " + " | ".join(cells) + " |\n"
+        section += "| Сэмплов | " + " | ".join(str(scenario[user_class]["samples"]) for user_class in user_classes)
+        section += " |\n\n"
+        for user_class in user_classes:
+            profile = scenario[user_class]
+            section += f"#### {title} — {user_class}: собственное время\n\n"
+            section += "| Функция | Доля сэмплов (%) |\n"
+            section += "|---------|------------------|\n"
+            for function, samples in profile["self"].items():
+                section += f"| `{function}` | {samples / profile['samples'] * 100:.1f} |\n"
+            section += "\n"
+    return section
+
+
+def histogram_metrics(histograms):
+    """Exact latency metrics from the merged histograms of all endpoints"""
+    summary = summarize(histograms.combined())
+    if not summary["count"]:
+        return {}
+    return {
+        "avg_response_time": summary["mean"],
+        "median_response_time": summary["p50"],
+        "p95_response_time": summary["p95"],
+        "p99_response_time": summary["p99"],
+        "p999_response_time": summary["p99.9"],
+        "p9999_response_time": summary["p99.99"],
+        "min_response_time": summary["min"],
+        "max_response_time": summary["max"],
+    }
+
+
+def load_capacity_results(results_dir):
+    """Load capacity.json files written by capacity_search.py, keyed by user class"""
+    capacity = {}
+    capacity_dir = os.path.join(results_dir, CAPACITY_DIR_NAME)
+    if not os.path.isdir(capacity_dir):
+        return capacity
+    for user_class in sorted(os.listdir(capacity_dir)):
+        filepath = os.path.join(capacity_dir, user_class, "capacity.json")
+        if os.path.exists(filepath):
+            try:
+                with open(filepath, encoding="utf-8") as f:
+                    capacity[user_class] = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading {filepath}: {e}")
+    return capacity
+
+
+def generate_capacity_section(capacity):
+    """Build a report section with max sustainable RPS and latency curves"""
+    if not capacity:
+        return ""
+    
+    section = "### Максимальная устойчивая пропускная способность\n\n"
+    section += "Поиск точки насыщения (`capacity_search.py`): open-loop ступени с растущей интенсивностью, "
+    section += "затем бисекция между последней успешной и первой неуспешной ступенью.\n\n"
+    section += "| Протокол | SLO P99 (мс) | SLO ошибок (%) | Макс. устойчивый RPS | Первый неуспешный RPS |\n"
+    section += "|----------|--------------|----------------|----------------------|-----------------------|\n"
+    for result in capacity.values():
+        slo = result["slo"]
+        max_rps = result.get("max_sustainable_rps")
+        failing = result.get("first_failing_rps")
+        max_str = f"{max_rps:g}" if max_rps is not None else "SLO не выполнен"
+        failing_str = f"{failing:g}" if failing is not None else "не достигнут"
+        section += (f"| {result['protocol']} | {slo['p99_ms']:g} | {slo['error_rate']:g} | "
+                    f"{max_str} | {failing_str} |\n")
+    section += "\n"
+    
+    for result in capacity.values():
+        section += f"#### Кривая латентности: {result['protocol']} ({result['user_class']})\n\n"
+        section += "| Целевой RPS | Фактический RPS | P50 (мс) | P95 (мс) | P99 (мс) | Ошибок (%) | SLO |\n"
+        section += "|-------------|-----------------|----------|----------|----------|------------|-----|\n"
+        for point in result["curve"]:
+            if "rps" not in point:
+                section += f"| {point['target_rps']:g} | N/A | N/A | N/A | N/A | N/A | ✗ |\n"
+                continue
+            verdict = "✓" if point["passed"] else "✗"
+            section += (f"| {point['target_rps']:g} | {point['rps']:.1f} | {point['p50']:.0f} | "
+                        f"{point['p95']:.0f} | {point['p99']:.0f} | {point['error_rate']:.2f} | {verdict} |\n")
+        section += "\n"
+    return section
+
+
+def load_serialization_results(results_dir):
+    """Load serialization_benchmark.py results, or None"""
+    filepath = os.path.join(results_dir, SERIALIZATION_FILE)
+    if not os.path.exists(filepath):
+        return None
+    try:
+        return load_json(filepath)
+    except (OSError, ValueError) as e:
+        print(f"Error loading {filepath}: {e}")
+        return None
+
+
+def generate_serialization_section(serialization):
+    """Build a report section from serialization microbenchmark results"""
+    if not serialization or not serialization.get("results"):
+        return ""
+    
+    results = serialization["results"]
+    sizes = sorted({point["size"] for point in results})
+    size = SERIALIZATION_REPORT_SIZE if SERIALIZATION_REPORT_SIZE in sizes else sizes[-1]
+    settings = serialization.get("settings", {})
+    
+    section = f"### Сериализация {size} терминов (измерено)\n\n"
+    section += (f"`serialization_benchmark.py`, Python {serialization.get('python', '?')}: медиана "
+                f"{settings.get('repeat', '?')} прогонов после {settings.get('warmup', '?')} прогревочных. "
+                "Память — пик аллокаций Python на одну операцию.\n\n")
+    for description_length in sorted({point["description_length"] for point in results}):
+        points = [p for p in results if p["size"] == size and p["description_length"] == description_length]
+        if not points:
+            continue
+        section += f"#### Описание {description_length} символов\n\n"
+        section += "| Формат | Сериализация (мс) | Десериализация (мс) | Размер (байт) | Память: сериализация / десериализация (КБ) |\n"
+        section += "|--------|-------------------|---------------------|---------------|--------------------------------------------|\n"
+        for point in points:
+            section += (f"| {point['format']} | {point['encode_ns'] / 1e6:.3f} | {point['decode_ns'] / 1e6:.3f} | "
+                        f"{point['bytes']} | {point['encode_alloc_bytes'] / 1024:.1f} / "
+                        f"{point['decode_alloc_bytes'] / 1024:.1f} |\n")
+        section += "\n"
+    return section
+
+
+def pick_rest_user(test_results):
+    """Return the REST user class present in a scenario's results, or None"""
+    for user_class in REST_USER_CLASSES:
+        if user_class in test_results:
+            return user_class
+    return None
+
+
+def split_aggregated(df):
+    """Split Locust stats into (per-endpoint rows, Aggregated row or None)"""
+    if "Name" not in df.columns:
+        return df, None
+    is_aggregated = df["Name"] == "Aggregated"
+    aggregated = df[is_aggregated]
+    return df[~is_aggregated], (aggregated.iloc[0] if not aggregated.empty else None)
+
+
+def percentile_column(df, percentile):
+    """Column of a percentile in Locust stats ("95%", or "95% Response Time" in older files)"""
+    for column in (f"{percentile}%", f"{percentile}% Response Time"):
+        if column in df.columns:
+            return column
+    return None
+
+
 def calculate_metrics(df):
-    """Calculate metrics from a DataFrame"""
+    """Calculate metrics from a DataFrame
+    
+    Totals come from the endpoint rows only: Locust's Aggregated row repeats
+    them. Averages are weighted by request count; percentiles are taken from
+    the Aggregated row, since percentiles of endpoints cannot be combined.
+    """
     if df.empty:
         return {}
+    endpoints, aggregated = split_aggregated(df)
+    if endpoints.empty:
+        return {}
+    counts = endpoints["Request Count"]
+    total = int(counts.sum())
     
     metrics = {
-        "total_requests": int(df["Request Count"].sum()),
-        "total_failures": int(df["Failure Count"].sum()),
-        "avg_response_time": float(df["Average Response Time"].mean()),
-        "median_response_time": float(df["Median Response Time"].median()),
-        "min_response_time": float(df["Min Response Time"].min()),
-        "max_response_time": float(df["Max Response Time"].max()),
+        "total_requests": total,
+        "total_failures": int(endpoints["Failure Count"].sum()),
+        "min_response_time": float(endpoints["Min Response Time"].min()),
+        "max_response_time": float(endpoints["Max Response Time"].max()),
     }
+    if total:
+        metrics["avg_response_time"] = float((endpoints["Average Response Time"] * counts).sum() / total)
     
-    # Calculate percentiles if available
-    if "95% Response Time" in df.columns:
-        metrics["p95_response_time"] = float(df["95% Response Time"].median())
-    if "99% Response Time" in df.columns:
-        metrics["p99_response_time"] = float(df["99% Response Time"].median())
+    # Percentiles if available
+    for key, percentile in (("median_response_time", 50), ("p95_response_time", 95), ("p99_response_time", 99)):
+        column = percentile_column(df, percentile)
+        if column and aggregated is not None:
+            metrics[key] = float(aggregated[column])
+    if "median_response_time" not in metrics and aggregated is not None:
+        metrics["median_response_time"] = float(aggregated["Median Response Time"])
     
-    # Calculate RPS (Requests Per Second)
+    # Calculate RPS (Requests Per Second); the peak comes from the stats history
     if "Requests/s" in df.columns:
-        metrics["avg_rps"] = float(df["Requests/s"].mean())
-        metrics["max_rps"] = float(df["Requests/s"].max())
+        metrics["avg_rps"] = float(endpoints["Requests/s"].sum())
     
     # Calculate error rate
     total = metrics["total_requests"]
@@ -74,7 +563,704 @@ def calculate_metrics(df):
     return metrics
 
 
-def generate_comparison_report(results):
+def endpoint_operation(request_type, name):
+    """Operation an endpoint belongs to, or None
+    
+    REST names are matched by prefix too, so per-keyword names of older
+    runs ("/terms/WebGL") count as GetTerm.
+    """
+    if request_type == "gRPC":
+        return name if any(name == operation for operation, *_ in OPERATIONS) else None
+    if request_type == "POST":
+        return "AddTerm" if name == "/terms" else None
+    if request_type != "GET":
+        return None
+    if name == "/terms":
+        return "ListTerms"
+    if name.startswith("/terms/search"):
+        return "SearchTerms"
+    if name.startswith("/terms/"):
+        return "GetTerm"
+    return None
+
+
+def operation_metrics(df, histograms=None):
+    """Per-operation latency, throughput and response size of one run
+    
+    Latency percentiles come from the run's histograms merged per operation
+    when available, otherwise from the CSV when an operation has one row.
+    """
+    endpoints, _ = split_aggregated(df)
+    operations = {}
+    for _, row in endpoints.iterrows():
+        operation = endpoint_operation(row["Type"], row["Name"])
+        if operation is None:
+            continue
+        count = int(row["Request Count"])
+        entry = operations.setdefault(operation, {"requests": 0, "failures": 0, "rps": 0.0, "rows": [],
+                                                  "_time": 0.0, "_bytes": 0.0})
+        entry["requests"] += count
+        entry["failures"] += int(row["Failure Count"])
+        entry["rps"] += float(row.get("Requests/s", 0.0))
+        entry["_time"] += float(row["Average Response Time"]) * count
+        entry["_bytes"] += float(row.get("Average Content Size", 0.0)) * count
+        entry["rows"].append(row)
+    
+    merged = {}
+    for key, histogram in (histograms.histograms.items() if histograms else ()):
+        request_type, name = key.split(" ", 1)
+        operation = endpoint_operation(request_type, name)
+        if operation in operations:
+            merged.setdefault(operation, new_histogram()).add(histogram)
+    
+    for operation, entry in operations.items():
+        rows = entry.pop("rows")
+        requests_made = entry["requests"]
+        entry["avg_response_time"] = entry.pop("_time") / requests_made if requests_made else None
+        entry["response_bytes"] = entry.pop("_bytes") / requests_made if requests_made else None
+        if operation in merged:
+            summary = summarize(merged[operation])
+            entry.update(avg_response_time=summary["mean"], p50=summary["p50"], p95=summary["p95"],
+                         p99=summary["p99"], histogram=merged[operation])
+        elif len(rows) == 1:
+            for percentile in (50, 95, 99):
+                column = percentile_column(df, percentile)
+                if column:
+                    entry[f"p{percentile}"] = float(rows[0][column])
+    return operations
+
+
+def mixture_percentile(histograms, weights, percentile):
+    """Percentile (ms) of the mixture of latency histograms at the given weights
+    
+    The mixture's CDF is the weighted sum of the histograms' CDFs; a weighted
+    mean of their percentiles is not a percentile of any distribution.
+    Returns None when a histogram is missing or empty.
+    """
+    values = []
+    masses = []
+    for key, weight in weights.items():
+        if histograms.get(key) is None:
+            return None
+        bucket_values, counts = histogram_buckets(histograms[key])
+        total = counts.sum()
+        if not total:
+            return None
+        values.append(bucket_values)
+        masses.append(weight * counts / total)
+    values = np.concatenate(values)
+    order = np.argsort(values, kind="stable")
+    cumulative = np.cumsum(np.concatenate(masses)[order])
+    index = np.searchsorted(cumulative, cumulative[-1] * percentile / 100)
+    return float(values[order][min(index, len(values) - 1)])
+
+
+def weighted_overall(rest_operations, grpc_operations):
+    """Overall REST and gRPC figures at one operation mix
+    
+    Both protocols are weighted by the combined share of each operation in
+    the two runs, so a different random task mix cannot favour either side.
+    Mean latency and response size are weighted means; P95 is the percentile
+    of the operations' histograms mixed at those weights, None without
+    histograms. Returns (weights, rest, grpc); throughput is summed.
+    """
+    common = [op for op, *_ in OPERATIONS if op in rest_operations and op in grpc_operations]
+    total = sum(rest_operations[op]["requests"] + grpc_operations[op]["requests"] for op in common)
+    if not total:
+        return {}, {}, {}
+    weights = {op: (rest_operations[op]["requests"] + grpc_operations[op]["requests"]) / total for op in common}
+    overall = []
+    for operations in (rest_operations, grpc_operations):
+        figures = {"rps": sum(operations[op]["rps"] for op in common)}
+        for key in ("avg_response_time", "response_bytes"):
+            values = [operations[op].get(key) for op in common]
+            if all(value is not None for value in values):
+                figures[key] = sum(weights[op] * value for op, value in zip(common, values))
+        figures["p95"] = mixture_percentile({op: operations[op].get("histogram") for op in common}, weights, 95)
+        overall.append(figures)
+    return weights, overall[0], overall[1]
+
+
+def generate_operation_table(rest_df, grpc_df, rest_histograms=None, grpc_histograms=None):
+    """Per-operation REST vs gRPC table of one scenario, with a weighted overall row"""
+    rest_operations = operation_metrics(rest_df, rest_histograms)
+    grpc_operations = operation_metrics(grpc_df, grpc_histograms)
+    weights, rest_overall, grpc_overall = weighted_overall(rest_operations, grpc_operations)
+    if not weights:
+        return ""
+    
+    def cell(value, digits=2):
+        return "N/A" if value is None else f"{value:.{digits}f}"
+    
+    table = "#### По операциям\n\n"
+    table += ("| Операция | Доля (%) | REST среднее (мс) | gRPC среднее (мс) | REST P95 (мс) | gRPC P95 (мс) "
+              "| REST RPS | gRPC RPS | REST ответ (байт) | gRPC ответ (байт) |\n")
+    table += "|----------|----------|" + "---|" * 8 + "\n"
+    for operation, label, request_type, name in OPERATIONS:
+        if operation not in weights:
+            continue
+        rest, grpc_entry = rest_operations[operation], grpc_operations[operation]
+        table += (f"| {label} (`{request_type} {name}` / {operation}) | {weights[operation] * 100:.1f} "
+                  f"| {cell(rest['avg_response_time'])} | {cell(grpc_entry['avg_response_time'])} "
+                  f"| {cell(rest.get('p95'))} | {cell(grpc_entry.get('p95'))} "
+                  f"| {cell(rest['rps'])} | {cell(grpc_entry['rps'])} "
+                  f"| {cell(rest['response_bytes'], 0)} | {cell(grpc_entry['response_bytes'], 0)} |\n")
+    table += (f"| **Взвешенно по смеси операций** | 100.0 "
+              f"| {cell(rest_overall.get('avg_response_time'))} | {cell(grpc_overall.get('avg_response_time'))} "
+              f"| {cell(rest_overall.get('p95'))} | {cell(grpc_overall.get('p95'))} "
+              f"| {cell(rest_overall['rps'])} | {cell(grpc_overall['rps'])} "
+              f"| {cell(rest_overall.get('response_bytes'), 0)} | {cell(grpc_overall.get('response_bytes'), 0)} |\n\n")
+    table += ("Взвешенная строка - сумма по операциям с долями общей смеси обоих прогонов "
+              "(P95 - процентиль смеси гистограмм операций с этими долями, без гистограмм N/A; "
+              "RPS - сумма).\n\n")
+    return table
+
+
+def generate_transport_table(http1_df, http2_df, grpc_df, http1_histograms=None, http2_histograms=None,
+                             grpc_histograms=None):
+    """Per-operation HTTP/1.1 JSON vs HTTP/2 JSON vs gRPC table of one scenario
+
+    The HTTP/2 JSON run shares the encoding with HTTP/1.1 and the transport
+    with gRPC, so the gap between the outer columns splits into a transport
+    effect (HTTP/2 - HTTP/1.1) and an encoding effect (gRPC - HTTP/2).
+    """
+    runs = [
+        operation_metrics(http1_df, http1_histograms),
+        operation_metrics(http2_df, http2_histograms),
+        operation_metrics(grpc_df, grpc_histograms),
+    ]
+    common = [entry for entry in OPERATIONS if all(entry[0] in operations for operations in runs)]
+    if not common:
+        return ""
+
+    def cell(value, digits=2):
+        return "N/A" if value is None else f"{value:.{digits}f}"
+
+    def effect(value, reference):
+        if value is None or not reference:
+            return "N/A"
+        return f"{value - reference:+.2f} ({(value - reference) / reference * 100:+.1f}%)"
+
+    table = "#### Транспорт и кодирование по операциям\n\n"
+    table += ("| Операция | HTTP/1.1 JSON среднее (мс) | HTTP/2 JSON среднее (мс) | gRPC среднее (мс) "
+              "| HTTP/1.1 JSON P95 (мс) | HTTP/2 JSON P95 (мс) | gRPC P95 (мс) "
+              "| HTTP/1.1 JSON RPS | HTTP/2 JSON RPS | gRPC RPS "
+              "| Эффект транспорта (мс) | Эффект кодирования (мс) |\n")
+    table += "|----------|" + "---|" * 11 + "\n"
+    for operation, label, request_type, name in common:
+        http1, http2, grpc_entry = (operations[operation] for operations in runs)
+        table += (f"| {label} (`{request_type} {name}` / {operation}) "
+                  f"| {cell(http1['avg_response_time'])} | {cell(http2['avg_response_time'])} "
+                  f"| {cell(grpc_entry['avg_response_time'])} "
+                  f"| {cell(http1.get('p95'))} | {cell(http2.get('p95'))} | {cell(grpc_entry.get('p95'))} "
+                  f"| {cell(http1['rps'])} | {cell(http2['rps'])} | {cell(grpc_entry['rps'])} "
+                  f"| {effect(http2['avg_response_time'], http1['avg_response_time'])} "
+                  f"| {effect(grpc_entry['avg_response_time'], http2['avg_response_time'])} |\n")
+    table += ("\nЭффект транспорта - HTTP/2 JSON минус HTTP/1.1 JSON (те же запросы и JSON, другой протокол), "
+              "эффект кодирования - gRPC минус HTTP/2 JSON (тот же HTTP/2, protobuf вместо JSON), "
+              "по среднему времени ответа.\n\n")
+    return table
+
+
+def split_channel_mode(test_name):
+    """Split 'light_load_channels-8' into ('light_load', '8'), or return None"""
+    if CHANNEL_MODE_MARKER not in test_name:
+        return None
+    base, mode = test_name.rsplit(CHANNEL_MODE_MARKER, 1)
+    return base, mode
+
+
+def split_trial(test_name):
+    """Split 'light_load_trial-2' into ('light_load', 2), or return None"""
+    if TRIAL_MARKER not in test_name:
+        return None
+    base, trial = test_name.rsplit(TRIAL_MARKER, 1)
+    return (base, int(trial)) if trial.isdigit() else None
+
+
+def pool_trials(runs, pool):
+    """Per-run data with the repeated runs of every scenario pooled into one entry
+    
+    runs is {test_name: {user_class: value}} as loaded per run directory. As in
+    collect_trials, the runs of a scenario are its plain run and its _trial-N
+    runs; where there are several, they are replaced by pool([value of each
+    run]) under the scenario's own name.
+    """
+    trials = defaultdict(lambda: defaultdict(list))
+    for name in sorted(runs or {}, key=lambda name: split_trial(name) or (name, 0)):
+        split = split_trial(name)
+        for user_class, value in runs[name].items():
+            trials[split[0] if split else name][user_class].append(value)
+    return {
+        scenario: {user_class: values[0] if len(values) == 1 else pool(values)
+                   for user_class, values in by_user.items()}
+        for scenario, by_user in trials.items()
+    }
+
+
+def pool_stats(dfs):
+    """Locust stats of repeated runs as one run
+    
+    Counts are summed, averages weighted by request count and rates averaged
+    per run. Percentiles of separate runs cannot be combined: they are
+    request-weighted means here, replaced by the pooled histograms where the
+    runs recorded them.
+    """
+    frames = [df for df in dfs if not df.empty]
+    if len(frames) < 2:
+        return frames[0] if frames else dfs[0]
+    rows = pd.concat(frames, ignore_index=True)
+    summed = {"Request Count", "Failure Count", "Min Response Time", "Max Response Time", "Requests/s", "Failures/s"}
+    averaged = [column for column in rows.columns
+                if column not in summed and pd.api.types.is_numeric_dtype(rows[column])]
+    weights = rows["Request Count"]
+    for column in averaged:
+        rows[column] = rows[column] * weights
+    grouped = rows.groupby(["Type", "Name"], dropna=False, sort=False)
+    pooled = grouped.sum(numeric_only=True)
+    requests_made = pooled["Request Count"].where(pooled["Request Count"] > 0)
+    for column in averaged:
+        pooled[column] = (pooled[column] / requests_made).fillna(0.0)
+    pooled["Min Response Time"] = grouped["Min Response Time"].min()
+    pooled["Max Response Time"] = grouped["Max Response Time"].max()
+    for column in ("Requests/s", "Failures/s"):
+        if column in pooled.columns:
+            pooled[column] = pooled[column] / len(frames)
+    return pooled.reset_index().reindex(columns=rows.columns)
+
+
+def pool_histograms(values):
+    pooled = LatencyHistograms()
+    for histograms in values:
+        pooled.merge(histograms)
+    return pooled
+
+
+def pool_client_cpu(values):
+    """Client CPU of repeated runs: totals summed, CPU per request over all their requests"""
+    pooled = dict(values[0])
+    for key in ("cpu_seconds", "wall_seconds", "requests"):
+        pooled[key] = sum(value.get(key) or 0 for value in values)
+    if pooled["requests"]:
+        pooled["cpu_ms_per_request"] = pooled["cpu_seconds"] * 1000 / pooled["requests"]
+    return pooled
+
+
+def pool_server_resources(values):
+    """Server resource summaries of repeated runs: peaks are the highest, totals summed"""
+    pooled = {}
+    for server in dict.fromkeys(server for value in values for server in value):
+        summaries = [value[server] for value in values if server in value]
+        pooled[server] = {
+            key: (max(summary[key] for summary in summaries) if key.startswith("peak_")
+                  else summaries[0][key] if key.startswith("baseline_")
+                  else sum(summary[key] for summary in summaries))
+            for key in summaries[0]
+        }
+    return pooled
+
+
+def pool_network(values):
+    """Network emulator stats of repeated runs: the first run's profile, traffic summed"""
+    pooled = dict(values[0])
+    routes = {}
+    for value in values:
+        for route, directions in value["routes"].items():
+            for direction, stats in directions.items():
+                totals = routes.setdefault(route, {}).setdefault(direction, {})
+                for key, count in stats.items():
+                    totals[key] = totals.get(key, 0) + count
+    pooled["routes"] = routes
+    return pooled
+
+
+def pool_history(values):
+    """History analyses of repeated runs: the first one, with drift or decay found in any run"""
+    pooled = dict(values[0])
+    for flag, trend in (("latency_drift", "p95_trend"), ("throughput_decay", "rps_trend")):
+        flagged = [value for value in values if value.get(flag)]
+        if flagged:
+            pooled[flag] = True
+            pooled[trend] = flagged[0][trend]
+    return pooled
+
+
+def first_trial(values):
+    return values[0]
+
+
+def highest(values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def aggregated_rps(df):
+    """Request rate of a run: Locust's Aggregated row, or the sum over endpoints"""
+    if df.empty or "Requests/s" not in df.columns:
+        return None
+    if "Name" in df.columns:
+        aggregated = df[df["Name"] == "Aggregated"]
+        if not aggregated.empty:
+            return float(aggregated["Requests/s"].iloc[0])
+    return float(df["Requests/s"].sum())
+
+
+def collect_trials(results, histograms):
+    """Per-run latency buckets and RPS of every scenario, repeated runs grouped
+    
+    Returns {scenario: {user_class: [{"buckets": ..., "rps": ...}, ...]}}.
+    """
+    trials = defaultdict(lambda: defaultdict(list))
+    for test_name in sorted(results):
+        if split_channel_mode(test_name):
+            continue
+        split = split_trial(test_name)
+        scenario = split[0] if split else test_name
+        for user_class, df in results[test_name].items():
+            run_histograms = (histograms or {}).get(test_name, {}).get(user_class)
+            buckets = None
+            if run_histograms and run_histograms.histograms:
+                buckets = histogram_buckets(run_histograms.combined())
+            trials[scenario][user_class].append({"buckets": buckets, "rps": aggregated_rps(df)})
+    return trials
+
+
+def compute_significance(results, histograms, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_RESAMPLES):
+    """Bootstrap comparison of REST and gRPC for every scenario
+    
+    Returns {scenario: {"trials": runs per protocol, "comparison": compare_runs() result}}.
+    """
+    significance = {}
+    for scenario, by_user in collect_trials(results, histograms).items():
+        rest_user = pick_rest_user(by_user)
+        if not rest_user or "GrpcUser" not in by_user:
+            continue
+        significance[scenario] = {
+            "trials": min(len(by_user[rest_user]), len(by_user["GrpcUser"])),
+            "comparison": compare_runs(by_user[rest_user], by_user["GrpcUser"], confidence, resamples),
+        }
+    return significance
+
+
+def format_interval(ci):
+    return "N/A" if ci is None else f"[{ci[0]:.2f}; {ci[1]:.2f}]"
+
+
+def significance_verdict(stat):
+    """Report wording for one compared statistic"""
+    if stat["significant"] is None:
+        return "не оценено (1 прогон)"
+    if not stat["significant"]:
+        return "нет значимой разницы"
+    return "значимо (у gRPC больше)" if stat["diff"] > 0 else "значимо (у gRPC меньше)"
+
+
+def generate_significance_section(significance, confidence=DEFAULT_CONFIDENCE):
+    """Build a report section with bootstrap confidence intervals per scenario"""
+    if not significance:
+        return ""
+    
+    level = f"{confidence * 100:g}%"
+    section = f"### Доверительные интервалы ({level}, bootstrap)\n\n"
+    section += ("Интервалы латентности учитывают разброс между прогонами и между запросами внутри прогона; "
+                "при одном прогоне - только внутри прогона, и значимость не оценивается: разброс между "
+                "прогонами больше (повторите сценарий: `run_tests.py --trials N`). "
+                "Разница значима, если её интервал не содержит ноль.\n\n")
+    for scenario in sorted(significance):
+        entry = significance[scenario]
+        comparison = entry["comparison"]
+        if not comparison:
+            continue
+        section += f"#### {scenario.replace('_', ' ').title()} (прогонов: {entry['trials']})\n\n"
+        section += f"| Метрика | REST [{level} ДИ] | gRPC [{level} ДИ] | gRPC - REST [{level} ДИ] | Вывод |\n"
+        section += "|---------|------------------|------------------|--------------------------|-------|\n"
+        for key, label in SIGNIFICANCE_ROWS:
+            stat = comparison.get(key)
+            if stat is None:
+                continue
+            section += (f"| {label} | {stat['rest']:.2f} {format_interval(stat['rest_ci'])} "
+                        f"| {stat['grpc']:.2f} {format_interval(stat['grpc_ci'])} "
+                        f"| {stat['diff']:+.2f} {format_interval(stat['diff_ci'])} "
+                        f"| {significance_verdict(stat)} |\n")
+        section += "\n"
+    return section
+
+
+def split_dataset_size(test_name):
+    """Split 'light_load_terms-1000' into ('light_load', 1000), or return None"""
+    if DATASET_SIZE_MARKER not in test_name or split_channel_mode(test_name):
+        return None
+    trial = split_trial(test_name)
+    if trial:
+        test_name = trial[0]
+    base, size = test_name.rsplit(DATASET_SIZE_MARKER, 1)
+    return (base, int(size)) if size.isdigit() else None
+
+
+def generate_dataset_section(results):
+    """Build a report section showing how each scenario scales with the number of terms"""
+    sizes_by_scenario = defaultdict(dict)
+    for test_name in sorted(results):
+        test_results = results[test_name]
+        split = split_dataset_size(test_name)
+        rest_user = pick_rest_user(test_results)
+        if split and rest_user and "GrpcUser" in test_results:
+            base, size = split
+            # With repeated runs the first one stands for the dataset size
+            sizes_by_scenario[base].setdefault(size, (
+                calculate_metrics(test_results[rest_user]),
+                calculate_metrics(test_results["GrpcUser"]),
+            ))
+    
+    if not sizes_by_scenario:
+        return ""
+    
+    section = "### Масштабирование по объёму данных\n\n"
+    section += "Таблица terms заполнена синтетическими терминами (dataset_generator.py).\n\n"
+    for base in sorted(sizes_by_scenario):
+        section += f"#### {base.replace('_', ' ').title()}\n\n"
+        section += "| Терминов | REST среднее (мс) | gRPC среднее (мс) | REST P95 (мс) | gRPC P95 (мс) | REST RPS | gRPC RPS |\n"
+        section += "|----------|-------------------|-------------------|---------------|---------------|----------|----------|\n"
+        for size in sorted(sizes_by_scenario[base]):
+            rest, grpc_metrics = sizes_by_scenario[base][size]
+            values = [
+                metrics.get(key)
+                for key in ("avg_response_time", "p95_response_time", "avg_rps")
+                for metrics in (rest, grpc_metrics)
+            ]
+            cells = " | ".join(f"{v:.2f}" if isinstance(v, (int, float)) else "N/A" for v in values)
+            section += f"| {size:,} | {cells} |\n"
+        section += "\n"
+    return section
+
+
+def split_payload(test_name):
+    """Split 'light_load_desc-4096_comp-gzip' into ('light_load', 4096, 'gzip'), or return None
+    
+    Either payload value may be missing (None); repeated runs count as the
+    scenario they repeat.
+    """
+    if split_channel_mode(test_name):
+        return None
+    trial = split_trial(test_name)
+    if trial:
+        test_name = trial[0]
+    matches = PAYLOAD_PATTERN.findall(test_name)
+    if not matches:
+        return None
+    size = next((int(size) for size, _ in matches if size), None)
+    compression = next((compression for _, compression in matches if compression), None)
+    return PAYLOAD_PATTERN.sub("", test_name), size, compression
+
+
+def compressed_share(workload, compression):
+    """Share of a REST run's responses the server sent with the requested Content-Encoding, or None
+    
+    Accept-Encoding only asks for compressed responses; without compression
+    support on the server (GZipMiddleware) they all come back as identity.
+    """
+    encodings = (workload or {}).get("response_encodings")
+    if compression in (None, "none") or not encodings:
+        return None
+    return encodings.get(compression, 0) / sum(encodings.values())
+
+
+def generate_payload_section(results, network=None, client_cpu=None, server_resources=None, workloads=None):
+    """Build a report section comparing on-wire bytes, latency and CPU across payload sizes and compression"""
+    runs_by_scenario = defaultdict(dict)
+    uncompressed = []
+    proxied = False
+    for test_name in sorted(results):
+        test_results = results[test_name]
+        split = split_payload(test_name)
+        rest_user = pick_rest_user(test_results)
+        if not split:
+            continue
+        base, size, compression = split
+        for label, user_class, route in (("REST", rest_user, "rest"), ("gRPC", "GrpcUser", "grpc")):
+            if user_class not in test_results:
+                continue
+            metrics = calculate_metrics(test_results[user_class])
+            total_requests = metrics.get("total_requests")
+            run_network = (network or {}).get(test_name, {}).get(user_class)
+            if run_network:
+                metrics.update(network_metrics(run_network, route, total_requests))
+                proxied = proxied or run_network["profile"] == BYTE_COUNTING_PROFILE
+            run_cpu = (client_cpu or {}).get(test_name, {}).get(user_class)
+            if run_cpu:
+                metrics["client_cpu_ms"] = run_cpu.get("cpu_ms_per_request")
+            run_resources = (server_resources or {}).get(test_name, {}).get(user_class)
+            if run_resources:
+                metrics.update(server_metrics(run_resources, route, total_requests, None))
+            if route == "rest":
+                metrics["compressed_share"] = compressed_share(
+                    (workloads or {}).get(test_name, {}).get(user_class), compression)
+                if metrics["compressed_share"] == 0:
+                    uncompressed.append(test_name)
+            # With repeated runs the first one stands for the combination
+            runs_by_scenario[base].setdefault((size, compression, label), metrics)
+    
+    if not runs_by_scenario:
+        return ""
+    
+    def wire_bytes(metrics):
+        up = metrics.get("net_up_bytes_per_request")
+        down = metrics.get("net_down_bytes_per_request")
+        return None if up is None or down is None else up + down
+    
+    def change(value, reference):
+        if value is None or not reference:
+            return "N/A"
+        return f"{(value - reference) / reference * 100:+.1f}%"
+    
+    def cell(value):
+        return "N/A" if value is None else f"{value:.2f}"
+    
+    def direction(compression, label, metrics):
+        if compression in (None, "none"):
+            return "-"
+        if label == "gRPC":
+            return "запросы ↑"
+        share = metrics.get("compressed_share")
+        return "ответы ↓" + ("" if share is None else f" ({share * 100:.0f}% сжато)")
+    
+    section = "### Размер данных и сжатие\n\n"
+    section += ("Байты на запрос измерены на проводе (network_emulator.py), вместе с заголовками и кадрами "
+                "протокола. Протоколы сжимают разные направления: REST запрашивает сжатые ответы (↓) через "
+                "Accept-Encoding, тела запросов не сжимаются, а ответ сжимается, только если это поддерживает "
+                "сервер (доля ответов с нужным Content-Encoding - в столбце \"Сжимается\"); gRPC сжимает "
+                "запросы (↑) каждого вызова. Сравнение - с тем же размером описания без сжатия (`none`).\n\n")
+    if proxied:
+        section += (f"Прогоны без профиля сети идут через профиль `{BYTE_COUNTING_PROFILE}`: трафик считает "
+                    "прокси в процессе run_tests.py, который добавляет к каждому запросу лишний переход. P95 и "
+                    "CPU в таблице сравнимы между собой (сравнение с `none` идёт через тот же прокси), но не с "
+                    "обычными прогонами сценария, а под высокой нагрузкой они измеряют прокси.\n\n")
+    if uncompressed:
+        section += ("**Сжатие не применено**: сервер не сжал ни одного ответа REST в прогонах "
+                    f"{', '.join(f'`{name}`' for name in sorted(set(uncompressed)))} - их трафик и время "
+                    "ответа не отличаются от `none` по существу (нужен GZipMiddleware на сервере).\n\n")
+    for base in sorted(runs_by_scenario):
+        runs = runs_by_scenario[base]
+        section += f"#### {base.replace('_', ' ').title()}\n\n"
+        section += ("| Описание (симв.) | Сжатие | Протокол | Сжимается | Байт/запрос ↑ | Байт/запрос ↓ "
+                    "| Трафик vs none | P95 (мс) | P95 vs none | CPU клиента (мс/запрос) | CPU сервера (мс/запрос) |\n")
+        section += ("|------------------|--------|----------|-----------|---------------|---------------"
+                    "|----------------|----------|-------------|-------------------------|-------------------------|\n")
+        for size, compression, label in sorted(runs, key=lambda key: (key[0] or 0, key[1] or "", key[2])):
+            metrics = runs[(size, compression, label)]
+            traffic_change = p95_change = "-"
+            reference = runs.get((size, "none", label)) if compression not in (None, "none") else None
+            if reference:
+                traffic_change = change(wire_bytes(metrics), wire_bytes(reference))
+                p95_change = change(metrics.get("p95_response_time"), reference.get("p95_response_time"))
+            size_text = "по умолчанию" if size is None else f"{size:,}"
+            section += (
+                f"| {size_text} | {compression or 'по умолчанию'} | {label} | {direction(compression, label, metrics)} "
+                f"| {cell(metrics.get('net_up_bytes_per_request'))} "
+                f"| {cell(metrics.get('net_down_bytes_per_request'))} | {traffic_change} "
+                f"| {cell(metrics.get('p95_response_time'))} | {p95_change} "
+                f"| {cell(metrics.get('client_cpu_ms'))} | {cell(metrics.get('server_cpu_ms'))} |\n"
+            )
+        section += "\n"
+    return section
+
+
+def format_range(value_range):
+    return "N/A" if value_range is None else f"{value_range[0]:.2f} - {value_range[1]:.2f}"
+
+
+def format_trend(value_trend, unit, flag):
+    """Report wording for one steady-state trend"""
+    if value_trend is None:
+        return "N/A (мало данных)"
+    cell = f"{value_trend['slope_per_min']:+.2f} {unit}/мин ({value_trend['change'] * 100:+.1f}%, p={value_trend['p_value']:.3f})"
+    return f"**{flag}**: {cell}" if flag else cell
+
+
+def history_findings(analysis):
+    """Analysis bullets for latency drift and throughput decay of one run"""
+    findings = []
+    if analysis.get("latency_drift"):
+        findings.append(f"P95 растёт в устойчивом режиме на {analysis['p95_trend']['change'] * 100:.1f}% "
+                        f"({analysis['p95_trend']['slope_per_min']:+.2f} мс/мин)")
+    if analysis.get("throughput_decay"):
+        findings.append(f"RPS падает в устойчивом режиме на {-analysis['rps_trend']['change'] * 100:.1f}% "
+                        f"({analysis['rps_trend']['slope_per_min']:+.2f} запросов/с за минуту)")
+    return findings
+
+
+def generate_history_section(history):
+    """Build a report section with the steady-state view of every run's stats history"""
+    scenarios = [name for name in sorted(history or {}) if not split_trial(name) and not split_channel_mode(name)]
+    if not scenarios:
+        return ""
+    
+    section = "### Динамика во времени\n\n"
+    section += ("По посекундной истории Locust (`results_stats_history.csv`). Прогрев - подъём пользователей "
+                "и период до стабилизации P95 и RPS (MSER-5); он исключён из метрик устойчивого режима. "
+                f"Скользящие значения - по окну {ROLLING_SECONDS} с. Тренд - тест Манна-Кендалла и оценка Сена "
+                f"на устойчивом участке; рост P95 или падение RPS отмечается, если он значим и превышает "
+                f"{MIN_TREND_CHANGE:.0%} "
+                "за участок.\n\n")
+    for scenario in scenarios:
+        section += f"#### {scenario.replace('_', ' ').title()}\n\n"
+        section += ("| Клиент | Длительность / прогрев (с) | RPS: весь прогон / устойчивый | "
+                    "Среднее (мс): весь прогон / устойчивый | P95 устойчивый (мс) | Скользящий P95 (мс) | "
+                    "Скользящий RPS | Тренд P95 | Тренд RPS |\n")
+        section += "|--------|---|---|---|---|---|---|---|---|\n"
+        for user_class in sorted(history[scenario]):
+            analysis = history[scenario][user_class]
+            pairs = [
+                (analysis["duration_s"], analysis["warmup_s"]),
+                (analysis["whole_rps"], analysis["steady_rps"]),
+                (analysis["whole_avg_ms"], analysis["steady_avg_ms"]),
+            ]
+            cells = [" / ".join("N/A" if v is None else f"{v:.2f}" for v in pair) for pair in pairs]
+            p95 = analysis["steady_p95_ms"]
+            cells.append("N/A" if p95 is None else f"{p95:.2f}")
+            cells.append(format_range(analysis["rolling_p95_ms"]))
+            cells.append(format_range(analysis["rolling_rps"]))
+            cells.append(format_trend(analysis["p95_trend"], "мс", "дрейф" if analysis["latency_drift"] else None))
+            cells.append(format_trend(analysis["rps_trend"], "запросов/с",
+                                      "падение" if analysis["throughput_decay"] else None))
+            section += f"| {user_class} | {' | '.join(cells)} |\n"
+        section += "\n"
+    return section
+
+
+def generate_channel_mode_section(results):
+    """Build a report section comparing gRPC channel modes per scenario"""
+    modes_by_scenario = defaultdict(dict)
+    for test_name, test_results in results.items():
+        split = split_channel_mode(test_name)
+        if split and "GrpcUser" in test_results:
+            base, mode = split
+            modes_by_scenario[base][mode] = calculate_metrics(test_results["GrpcUser"])
+    
+    if not modes_by_scenario:
+        return ""
+    
+    section = "### Сравнение режимов gRPC каналов\n\n"
+    section += "Один канал на всех пользователей, пул из N каналов и канал на каждого пользователя.\n\n"
+    for base in sorted(modes_by_scenario):
+        section += f"#### {base.replace('_', ' ').title()}\n\n"
+        section += "| Каналы | Среднее время ответа (мс) | P95 (мс) | Средний RPS | Процент ошибок (%) |\n"
+        section += "|--------|---------------------------|----------|-------------|--------------------|\n"
+        # Numeric pool sizes first in ascending order, then per-user
+        modes = sorted(modes_by_scenario[base], key=lambda m: (not m.isdigit(), int(m) if m.isdigit() else 0))
+        for mode in modes:
+            metrics = modes_by_scenario[base][mode]
+            values = [metrics.get(key) for key in ("avg_response_time", "p95_response_time", "avg_rps", "error_rate")]
+            cells = " | ".join(f"{v:.2f}" if isinstance(v, (int, float)) else "N/A" for v in values)
+            section += f"| {mode} | {cells} |\n"
+        section += "\n"
+    return section
+
+
+def generate_comparison_report(results, client_cpu=None, capacity=None, histograms=None, phases=None,
+                               serialization=None, server_resources=None, peak_users=None, workloads=None,
+                               significance=None, confidence=DEFAULT_CONFIDENCE, peak_rps=None, history=None,
+                               convergence=None, network=None, profiles=None):
     """Generate a markdown report comparing REST and gRPC results"""
     
     report = """# Отчет о нагрузочном тестировании: FastAPI REST vs gRPC
@@ -125,15 +1311,100 @@ def generate_comparison_report(results):
 
 """
     
+    # Repeated runs of a scenario (run_tests.py --trials) are shown pooled under the scenario
+    pooled_results = pool_trials(results, pool_stats)
+    pooled_histograms = pool_trials(histograms, pool_histograms)
+    pooled_client_cpu = pool_trials(client_cpu, pool_client_cpu)
+    pooled_peak_rps = pool_trials(peak_rps, highest)
+    pooled_resources = pool_trials(server_resources, pool_server_resources)
+    pooled_users = pool_trials(peak_users, highest)
+    pooled_network = pool_trials(network, pool_network)
+    pooled_workloads = pool_trials(workloads, first_trial)
+    pooled_convergence = pool_trials(convergence, first_trial)
+    pooled_history = pool_trials(history, pool_history)
+    
     # Process each test scenario
-    for test_name in sorted(results.keys()):
-        test_results = results[test_name]
+    for test_name in sorted(pooled_results.keys()):
+        # Channel modes have their own section
+        if split_channel_mode(test_name):
+            continue
+        test_results = pooled_results[test_name]
+        scenario_significance = (significance or {}).get(test_name, {}).get("comparison", {})
         report += f"### {test_name.replace('_', ' ').title()}\n\n"
+        trials = (significance or {}).get(test_name, {}).get("trials", 1)
+        if trials > 1:
+            report += (f"Метрики объединены по {trials} прогонам сценария (`--trials`): запросы суммированы, "
+                       "RPS - среднее за прогон.\n\n")
         
-        if "RestUser" in test_results and "GrpcUser" in test_results:
-            rest_metrics = calculate_metrics(test_results["RestUser"])
+        rest_user = pick_rest_user(test_results)
+        if rest_user and "GrpcUser" in test_results:
+            rest_metrics = calculate_metrics(test_results[rest_user])
             grpc_metrics = calculate_metrics(test_results["GrpcUser"])
             
+            # Exact percentiles from merged HDR histograms replace the CSV approximations
+            scenario_histograms = pooled_histograms.get(test_name, {})
+            if rest_user in scenario_histograms and "GrpcUser" in scenario_histograms:
+                rest_metrics.update(histogram_metrics(scenario_histograms[rest_user]))
+                grpc_metrics.update(histogram_metrics(scenario_histograms["GrpcUser"]))
+                report += "Латентность рассчитана по объединённым HDR-гистограммам (точность до мкс).\n\n"
+            
+            # Load generator CPU cost per request, if recorded
+            scenario_cpu = pooled_client_cpu.get(test_name, {})
+            if rest_user in scenario_cpu:
+                rest_metrics["client_cpu_ms"] = scenario_cpu[rest_user].get("cpu_ms_per_request")
+            if "GrpcUser" in scenario_cpu:
+                grpc_metrics["client_cpu_ms"] = scenario_cpu["GrpcUser"].get("cpu_ms_per_request")
+            
+            # Peak request rate from the stats history
+            scenario_peak_rps = pooled_peak_rps.get(test_name, {})
+            for metrics, user_class in ((rest_metrics, rest_user), (grpc_metrics, "GrpcUser")):
+                if scenario_peak_rps.get(user_class) is not None:
+                    metrics["max_rps"] = scenario_peak_rps[user_class]
+            
+            # Server resource efficiency, if the servers were sampled
+            scenario_resources = pooled_resources.get(test_name, {})
+            scenario_users = pooled_users.get(test_name, {})
+            for metrics, user_class, server in ((rest_metrics, rest_user, "rest"), (grpc_metrics, "GrpcUser", "grpc")):
+                if user_class in scenario_resources:
+                    metrics.update(server_metrics(
+                        scenario_resources[user_class], server,
+                        metrics.get("total_requests"), scenario_users.get(user_class),
+                    ))
+            
+            # Traffic through the network emulator, if the run was made over an emulated network
+            scenario_network = pooled_network.get(test_name, {})
+            for metrics, user_class, route in ((rest_metrics, rest_user, "rest"), (grpc_metrics, "GrpcUser", "grpc")):
+                if user_class in scenario_network:
+                    metrics.update(network_metrics(
+                        scenario_network[user_class], route, metrics.get("total_requests"),
+                    ))
+            
+            if rest_user != "RestUser":
+                report += f"REST клиент: `{rest_user}`\n\n"
+            
+            if rest_user in scenario_network or "GrpcUser" in scenario_network:
+                settings = scenario_network.get(rest_user) or scenario_network["GrpcUser"]
+                report += f"Эмуляция сети: {format_network(settings)}\n\n"
+            
+            # Key distribution and seed, to reproduce the run
+            scenario_workloads = pooled_workloads.get(test_name, {})
+            settings = scenario_workloads.get(rest_user) or scenario_workloads.get("GrpcUser")
+            if settings:
+                report += (f"Распределение ключей: `{settings['key_distribution']}`, seed {settings['key_seed']}, "
+                           f"ключей: {settings['keywords']}\n\n")
+            
+            # Runs stopped once their estimates converged
+            scenario_convergence = pooled_convergence.get(test_name, {})
+            if rest_user in scenario_convergence or "GrpcUser" in scenario_convergence:
+                state = scenario_convergence.get(rest_user) or scenario_convergence["GrpcUser"]
+                report += (f"Режим сходимости (допуск ±{state['tolerance'] * 100:g}% "
+                           f"в течение {state['window_s']:g} с, {state['confidence'] * 100:g}% ДИ): ")
+                report += "; ".join(
+                    f"{label} - {format_convergence(scenario_convergence[user_class])}"
+                    for label, user_class in (("REST", rest_user), ("gRPC", "GrpcUser"))
+                    if user_class in scenario_convergence
+                ) + "\n\n"
+            
             report += "#### Метрики производительности\n\n"
             report += "| Метрика | REST (FastAPI) | gRPC | Разница |\n"
             report += "|---------|----------------|------|----------|\n"
@@ -144,22 +1415,37 @@ def generate_comparison_report(results):
                 ("Медианное время ответа (мс)", "median_response_time"),
                 ("P95 время ответа (мс)", "p95_response_time"),
                 ("P99 время ответа (мс)", "p99_response_time"),
+                ("P99.9 время ответа (мс)", "p999_response_time"),
+                ("P99.99 время ответа (мс)", "p9999_response_time"),
                 ("Средний RPS", "avg_rps"),
                 ("Максимальный RPS", "max_rps"),
                 ("Всего запросов", "total_requests"),
                 ("Ошибок", "total_failures"),
                 ("Процент ошибок (%)", "error_rate"),
+                ("CPU клиента на запрос (мс)", "client_cpu_ms"),
+                ("CPU сервера на запрос (мс)", "server_cpu_ms"),
+                ("Пиковая память сервера (МБ)", "server_peak_rss_mb"),
+                ("Память сервера на пользователя (КБ)", "server_rss_per_user_kb"),
+                ("Потоков сервера (макс.)", "server_peak_threads"),
+                ("Байт на запрос: клиент → сервер", "net_up_bytes_per_request"),
+                ("Байт на запрос: сервер → клиент", "net_down_bytes_per_request"),
+                ("Задержек ретрансмиссии", "net_stalls"),
             ]
             
             for label, metric_key in metrics_to_compare:
-                rest_val = rest_metrics.get(metric_key, "N/A")
-                grpc_val = grpc_metrics.get(metric_key, "N/A")
+                rest_val = rest_metrics.get(metric_key)
+                grpc_val = grpc_metrics.get(metric_key)
+                rest_val = "N/A" if rest_val is None else rest_val
+                grpc_val = "N/A" if grpc_val is None else grpc_val
                 
                 if rest_val != "N/A" and grpc_val != "N/A":
                     if isinstance(rest_val, (int, float)) and isinstance(grpc_val, (int, float)):
                         diff = grpc_val - rest_val
                         diff_pct = (diff / rest_val * 100) if rest_val != 0 else 0
                         diff_str = f"{diff:+.2f} ({diff_pct:+.1f}%)"
+                        stat = scenario_significance.get(SIGNIFICANCE_METRICS.get(metric_key))
+                        if stat and stat["significant"] is False:
+                            diff_str = f"нет значимой разницы ({diff_str})"
                     else:
                         diff_str = "N/A"
                 else:
@@ -172,10 +1458,28 @@ def generate_comparison_report(results):
             
             report += "\n"
             
+            # Matching operations side by side, the overall row at a common operation mix
+            report += generate_operation_table(
+                test_results[rest_user], test_results["GrpcUser"],
+                scenario_histograms.get(rest_user), scenario_histograms.get("GrpcUser"),
+            )
+            if rest_user != HTTP2_REST_USER and HTTP2_REST_USER in test_results:
+                report += generate_transport_table(
+                    test_results[rest_user], test_results[HTTP2_REST_USER], test_results["GrpcUser"],
+                    scenario_histograms.get(rest_user), scenario_histograms.get(HTTP2_REST_USER),
+                    scenario_histograms.get("GrpcUser"),
+                )
+            
             # Analysis
             report += "#### Анализ\n\n"
             
-            if rest_metrics.get("avg_response_time") and grpc_metrics.get("avg_response_time"):
+            level = f"{confidence * 100:g}%"
+            mean_stat = scenario_significance.get("mean")
+            rps_stat = scenario_significance.get("rps")
+            if mean_stat and mean_stat["significant"] is False:
+                report += (f"- Разница среднего времени ответа статистически не значима "
+                           f"({level} ДИ разницы: {format_interval(mean_stat['diff_ci'])} мс)\n")
+            elif rest_metrics.get("avg_response_time") and grpc_metrics.get("avg_response_time"):
                 if grpc_metrics["avg_response_time"] < rest_metrics["avg_response_time"]:
                     improvement = ((rest_metrics["avg_response_time"] - grpc_metrics["avg_response_time"]) / 
                                   rest_metrics["avg_response_time"] * 100)
@@ -184,8 +1488,13 @@ def generate_comparison_report(results):
                     improvement = ((grpc_metrics["avg_response_time"] - rest_metrics["avg_response_time"]) / 
                                   grpc_metrics["avg_response_time"] * 100)
                     report += f"- REST показывает **{improvement:.1f}%** лучшее среднее время ответа\n"
+                if mean_stat and mean_stat["significant"] is None:
+                    report += "  (один прогон: значимость разницы времени ответа не оценена)\n"
             
-            if rest_metrics.get("avg_rps") and grpc_metrics.get("avg_rps"):
+            if rps_stat and rps_stat["significant"] is False:
+                report += (f"- Разница RPS статистически не значима "
+                           f"({level} ДИ разницы: {format_interval(rps_stat['diff_ci'])})\n")
+            elif rest_metrics.get("avg_rps") and grpc_metrics.get("avg_rps"):
                 if grpc_metrics["avg_rps"] > rest_metrics["avg_rps"]:
                     improvement = ((grpc_metrics["avg_rps"] - rest_metrics["avg_rps"]) / 
                                   rest_metrics["avg_rps"] * 100)
@@ -194,11 +1503,29 @@ def generate_comparison_report(results):
                     improvement = ((rest_metrics["avg_rps"] - grpc_metrics["avg_rps"]) / 
                                   grpc_metrics["avg_rps"] * 100)
                     report += f"- REST обрабатывает **{improvement:.1f}%** больше запросов в секунду\n"
+                if rps_stat and rps_stat["significant"] is None:
+                    report += "  (один прогон: значимость разницы RPS не оценена)\n"
+            
+            # Drift and decay hidden by the whole-run averages
+            scenario_history = pooled_history.get(test_name, {})
+            for label, user_class in (("REST", rest_user), ("gRPC", "GrpcUser")):
+                for finding in history_findings(scenario_history.get(user_class, {})):
+                    report += f"- {label}: {finding}\n"
             
             report += "\n"
         else:
             report += "Данные для сравнения недоступны.\n\n"
     
+    report += generate_significance_section(significance, confidence)
+    report += generate_history_section(history)
+    report += generate_overhead_section(phases)
+    report += generate_profile_section(profiles)
+    report += generate_serialization_section(serialization)
+    report += generate_channel_mode_section(results)
+    report += generate_dataset_section(results)
+    report += generate_payload_section(results, network, client_cpu, server_resources, workloads)
+    report += generate_capacity_section(capacity)
+    
     # Overall conclusions
     report += """---
 
@@ -260,8 +1587,19 @@ HTML отчеты доступны для каждого теста в соот
     return report
 
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Compare REST and gRPC load test results")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                        help="Confidence level of the bootstrap intervals (default: 0.95)")
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES,
+                        help="Bootstrap resamples per statistic")
+    return parser.parse_args()
+
+
 def main():
     """Main function"""
+    args = parse_args()
     if not os.path.exists(RESULTS_DIR):
         print(f"Results directory '{RESULTS_DIR}' not found.")
         print("Please run load tests first using run_tests.py")
@@ -269,15 +1607,37 @@ def main():
     
     print("Loading test results...")
     results = load_csv_results(RESULTS_DIR)
+    capacity = load_capacity_results(RESULTS_DIR)
+    serialization = load_serialization_results(RESULTS_DIR)
     
-    if not results:
+    if not results and not capacity and not serialization:
         print("No test results found.")
         return
     
     print(f"Found results for {len(results)} test scenarios")
+    
+    # Runs started by hand are added to the history too; known runs are skipped
+    with ResultsStore() as store:
+        added = store.ingest_tree(RESULTS_DIR)
+    if added:
+        print(f"Added {added} new run(s) to the results history")
     print("Generating comparison report...")
     
-    report = generate_comparison_report(results)
+    client_cpu = load_client_cpu(RESULTS_DIR)
+    histograms = load_histograms(RESULTS_DIR)
+    phases = load_phases(RESULTS_DIR)
+    server_resources = load_server_resources(RESULTS_DIR)
+    workloads = load_workloads(RESULTS_DIR)
+    history = load_history_analyses(RESULTS_DIR)
+    peak_users = history_peaks(history, "peak_users")
+    peak_rps = history_peaks(history, "peak_rps")
+    convergence = load_convergence(RESULTS_DIR)
+    network = load_network(RESULTS_DIR)
+    profiles = load_profiles(RESULTS_DIR)
+    significance = compute_significance(results, histograms, args.confidence, args.resamples)
+    report = generate_comparison_report(results, client_cpu, capacity, histograms, phases, serialization,
+                                        server_resources, peak_users, workloads, significance, args.confidence,
+                                        peak_rps, history, convergence, network, profiles)
     
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         f.write(report)
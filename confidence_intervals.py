@@ -0,0 +1,173 @@
+"""
+Bootstrap confidence intervals for REST vs gRPC comparisons
+
+A single difference between two point estimates says nothing about noise.
+Here every statistic is resampled instead:
+
+- latency (mean, p50, p95, p99): a two-level bootstrap. Each replicate picks
+  the trials (repeated runs of the scenario) with replacement and then
+  resamples the requests of every picked trial from its HDR histogram
+  (a multinomial draw over the histogram buckets), so both run-to-run and
+  request-to-request variation widen the interval. With a single run only
+  the second level is left: the intervals are still given, but they say
+  nothing about run-to-run noise, so significance is not assessed.
+- throughput (RPS): one value per trial, resampled across trials; a single
+  run has no interval.
+
+All replicates are computed with vectorized NumPy operations. The difference
+between the protocols is significant at the chosen level when the interval
+of the replicate differences (gRPC - REST) does not contain zero.
+"""
+import numpy as np
+
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_RESAMPLES = 1000
+
+# Latency statistics, as (name, percentile or None for the mean)
+LATENCY_STATISTICS = [
+    ("mean", None),
+    ("p50", 50),
+    ("p95", 95),
+    ("p99", 99),
+]
+
+
+def histogram_buckets(histogram):
+    """Recorded bucket values (ms) and counts of an HDR latency histogram (us)"""
+    values = []
+    counts = []
+    for item in histogram.get_recorded_iterator():
+        values.append(item.value_iterated_to / 1000)
+        counts.append(item.count_added_in_this_iter_step)
+    return np.array(values, dtype=float), np.array(counts, dtype=np.int64)
+
+
+def latency_replicates(trials, resamples, rng):
+    """Bootstrap replicates of the latency statistics
+
+    trials is a list of (values, counts) bucket arrays, one per run. Returns
+    {statistic: array of resamples values}.
+    """
+    grid = np.unique(np.concatenate([values for values, _ in trials]))
+    counts = np.zeros((len(trials), len(grid)), dtype=np.int64)
+    for index, (values, trial_counts) in enumerate(trials):
+        np.add.at(counts[index], np.searchsorted(grid, values), trial_counts)
+
+    # How many times each replicate picks each trial
+    picks = rng.multinomial(len(trials), np.full(len(trials), 1 / len(trials)), size=resamples)
+    pooled = np.zeros((resamples, len(grid)), dtype=np.int64)
+    for index, trial_counts in enumerate(counts):
+        total = trial_counts.sum()
+        if total == 0:
+            continue
+        # A trial picked k times contributes k independent resamples: one draw of k * total requests
+        pooled += rng.multinomial(picks[:, index] * total, trial_counts / total)
+
+    totals = pooled.sum(axis=1)
+    # A replicate that only picked empty trials has no requests
+    totals = np.where(totals == 0, 1, totals)
+    cumulative = np.cumsum(pooled, axis=1)
+    replicates = {}
+    for name, percentile in LATENCY_STATISTICS:
+        if percentile is None:
+            replicates[name] = pooled @ grid / totals
+        else:
+            # Same rank rule as HdrHistogram.get_value_at_percentile
+            rank = np.maximum(np.floor(totals * percentile / 100 + 0.5), 1)
+            replicates[name] = grid[np.argmax(cumulative >= rank[:, None], axis=1)]
+    return replicates
+
+
+def latency_estimates(trials):
+    """Point estimates of the latency statistics over all requests of all trials"""
+    values = np.concatenate([values for values, _ in trials])
+    counts = np.concatenate([counts for _, counts in trials])
+    order = np.argsort(values, kind="stable")
+    values, counts = values[order], counts[order]
+    total = counts.sum()
+    cumulative = np.cumsum(counts)
+    estimates = {}
+    for name, percentile in LATENCY_STATISTICS:
+        if percentile is None:
+            estimates[name] = float(values @ counts / total)
+        else:
+            rank = max(np.floor(total * percentile / 100 + 0.5), 1)
+            estimates[name] = float(values[np.argmax(cumulative >= rank)])
+    return estimates
+
+
+def mean_replicates(values, resamples, rng):
+    """Bootstrap replicates of the mean of per-trial values"""
+    values = np.asarray(values, dtype=float)
+    return values[rng.integers(0, len(values), size=(resamples, len(values)))].mean(axis=1)
+
+
+def interval(replicates, confidence):
+    """Percentile interval of bootstrap replicates"""
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(replicates, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def compare_runs(rest_trials, grpc_trials, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_RESAMPLES, seed=0):
+    """Estimates, confidence intervals and significance of gRPC - REST differences
+
+    rest_trials and grpc_trials are lists of per-run dicts with "buckets"
+    ((values, counts) of the latency histogram, or None) and "rps". Returns
+    {statistic: {"rest", "grpc", "rest_ci", "grpc_ci", "diff", "diff_ci",
+    "significant"}}; intervals are None where they cannot be computed and
+    "significant" is None with a single run per protocol.
+    """
+    rng = np.random.default_rng(seed)
+    comparison = {}
+
+    rest_buckets = [t["buckets"] for t in rest_trials if t.get("buckets") is not None]
+    grpc_buckets = [t["buckets"] for t in grpc_trials if t.get("buckets") is not None]
+    if rest_buckets and grpc_buckets:
+        rest_estimates = latency_estimates(rest_buckets)
+        grpc_estimates = latency_estimates(grpc_buckets)
+        rest_replicates = latency_replicates(rest_buckets, resamples, rng)
+        grpc_replicates = latency_replicates(grpc_buckets, resamples, rng)
+        for name, _ in LATENCY_STATISTICS:
+            comparison[name] = _compare(
+                rest_estimates[name], grpc_estimates[name],
+                rest_replicates[name], grpc_replicates[name], confidence,
+            )
+            if len(rest_buckets) < 2 or len(grpc_buckets) < 2:
+                # Within-run variation only: two runs differ by more than that
+                comparison[name]["significant"] = None
+
+    rest_rps = [t["rps"] for t in rest_trials if t.get("rps") is not None]
+    grpc_rps = [t["rps"] for t in grpc_trials if t.get("rps") is not None]
+    if rest_rps and grpc_rps:
+        if len(rest_rps) > 1 and len(grpc_rps) > 1:
+            comparison["rps"] = _compare(
+                float(np.mean(rest_rps)), float(np.mean(grpc_rps)),
+                mean_replicates(rest_rps, resamples, rng), mean_replicates(grpc_rps, resamples, rng),
+                confidence,
+            )
+        else:
+            # One run per protocol: no spread to resample
+            comparison["rps"] = {
+                "rest": float(np.mean(rest_rps)),
+                "grpc": float(np.mean(grpc_rps)),
+                "rest_ci": None,
+                "grpc_ci": None,
+                "diff": float(np.mean(grpc_rps) - np.mean(rest_rps)),
+                "diff_ci": None,
+                "significant": None,
+            }
+    return comparison
+
+
+def _compare(rest, grpc, rest_replicates, grpc_replicates, confidence):
+    diff_ci = interval(grpc_replicates - rest_replicates, confidence)
+    return {
+        "rest": rest,
+        "grpc": grpc,
+        "rest_ci": interval(rest_replicates, confidence),
+        "grpc_ci": interval(grpc_replicates, confidence),
+        "diff": grpc - rest,
+        "diff_ci": diff_ci,
+        "significant": diff_ci[0] > 0 or diff_ci[1] < 0,
+    }
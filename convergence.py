@@ -0,0 +1,199 @@
+"""
+Convergence-based early stopping for Locust runs
+
+A fixed --run-time keeps a scenario running long after its metrics have
+settled. In convergence mode every request is recorded into fixed-length
+batches (seconds of wall clock): an HDR latency histogram and a request
+count per batch. The batch means method turns the batches into confidence
+intervals:
+
+- p95: the 95th percentile of each batch, averaged over batches;
+- RPS: requests per second of each batch, averaged over batches.
+
+Batches of a few seconds are close to independent, so the half-width of
+the interval is t * s / sqrt(k) for k batches with standard deviation s.
+Once both half-widths, relative to their means, stay within the tolerance
+for a sustained window, the run is stopped. Measurement restarts whenever
+spawning completes (end of the ramp-up, or a step of a load shape), the
+run never stops before the minimum duration, and --run-time remains the
+maximum duration.
+
+In a distributed run the workers send their closed batches to the master,
+which merges them by batch index (batches are aligned to the wall clock)
+and makes the decision.
+"""
+import math
+from statistics import NormalDist
+
+from hdrh.histogram import HdrHistogram
+
+from latency_histogram import HIGHEST_US, LOWEST_US, new_histogram
+
+BATCH_SECONDS = 5.0
+
+# Fewer batches than this give no usable standard deviation
+MIN_BATCHES = 10
+
+DEFAULT_CONFIDENCE = 0.95
+
+
+def t_quantile(probability, degrees_of_freedom):
+    """Student's t quantile (Cornish-Fisher expansion of the normal quantile)"""
+    z = NormalDist().inv_cdf(probability)
+    v = degrees_of_freedom
+    return (z + (z ** 3 + z) / (4 * v) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * v ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * v ** 3))
+
+
+def batch_means_interval(values, confidence=DEFAULT_CONFIDENCE):
+    """(mean, relative half-width) of the confidence interval of the mean of batch values"""
+    k = len(values)
+    mean = sum(values) / k
+    variance = sum((v - mean) ** 2 for v in values) / (k - 1)
+    half_width = t_quantile(1 - (1 - confidence) / 2, k - 1) * math.sqrt(variance / k)
+    return mean, (half_width / mean if mean > 0 else math.inf)
+
+
+class BatchRecorder:
+    """Per-batch latency histograms and request counts of one process"""
+
+    def __init__(self, batch_seconds=BATCH_SECONDS):
+        self.batch_seconds = batch_seconds
+        self.batches = {}
+
+    def batch_index(self, timestamp):
+        return int(timestamp // self.batch_seconds)
+
+    def record(self, timestamp, response_time_ms):
+        """Record one request finished at timestamp (seconds since the epoch)"""
+        index = self.batch_index(timestamp)
+        batch = self.batches.get(index)
+        if batch is None:
+            batch = self.batches[index] = [0, new_histogram()]
+        batch[0] += 1
+        if response_time_ms is not None:
+            latency_us = int(round(response_time_ms * 1000))
+            batch[1].record_value(min(max(latency_us, LOWEST_US), HIGHEST_US))
+
+    def pop_closed(self, timestamp):
+        """Remove and return the batches that ended before timestamp, as {index: (count, histogram)}"""
+        current = self.batch_index(timestamp)
+        return {index: tuple(self.batches.pop(index)) for index in sorted(self.batches) if index < current}
+
+    @staticmethod
+    def to_payload(batches):
+        """JSON-serializable form of closed batches, to send to the master"""
+        return [[index, count, histogram.encode().decode("ascii")] for index, (count, histogram) in batches.items()]
+
+    @staticmethod
+    def from_payload(payload):
+        return {index: (count, HdrHistogram.decode(encoded.encode("ascii"))) for index, count, encoded in payload}
+
+
+class ConvergenceMonitor:
+    """Decides when the p95 and RPS estimates of a run have converged
+
+    tolerance is the largest relative half-width of both confidence
+    intervals, window the seconds it has to hold, min_duration the seconds
+    before the run may stop.
+    """
+
+    def __init__(self, tolerance, window, min_duration, confidence=DEFAULT_CONFIDENCE,
+                 batch_seconds=BATCH_SECONDS):
+        if tolerance <= 0:
+            raise ValueError("Convergence tolerance must be positive")
+        self.tolerance = tolerance
+        self.window = window
+        self.min_duration = min_duration
+        self.confidence = confidence
+        self.batch_seconds = batch_seconds
+        self.start_time = None
+        self.measure_from = None
+        self.pending = {}
+        self.p95 = []
+        self.rps = []
+        self.converged_since = None
+        self.estimates = None
+        self.stopped_early = False
+        self.stop_time = None
+
+    def start(self, timestamp):
+        """Anchor the run; measurement begins at once until spawning completes"""
+        self.start_time = self.measure_from = timestamp
+        self.pending.clear()
+        self.p95.clear()
+        self.rps.clear()
+        self.converged_since = None
+        self.estimates = None
+        self.stopped_early = False
+        self.stop_time = None
+
+    def restart_measurement(self, timestamp):
+        """Drop everything before timestamp (end of ramp-up or a load change)"""
+        self.measure_from = timestamp
+        self.p95.clear()
+        self.rps.clear()
+        self.converged_since = None
+        self.estimates = None
+
+    def add_batches(self, batches):
+        """Merge closed batches {index: (count, histogram)} of one process"""
+        for index, (count, histogram) in batches.items():
+            pending = self.pending.get(index)
+            if pending is None:
+                self.pending[index] = [count, histogram]
+            else:
+                pending[0] += count
+                pending[1].add(histogram)
+
+    def update(self, timestamp, lag=1):
+        """Finalize batches older than lag batches and check convergence; returns True to stop
+
+        lag leaves time for the batches of remote workers to arrive.
+        """
+        current = int(timestamp // self.batch_seconds)
+        for index in sorted(self.pending):
+            if index >= current - lag:
+                break
+            count, histogram = self.pending.pop(index)
+            # Only whole batches after the measurement start
+            if index * self.batch_seconds < self.measure_from:
+                continue
+            self.rps.append(count / self.batch_seconds)
+            self.p95.append(histogram.get_value_at_percentile(95) / 1000 if count else 0.0)
+
+        if len(self.p95) < MIN_BATCHES:
+            return False
+        p95_mean, p95_width = batch_means_interval(self.p95, self.confidence)
+        rps_mean, rps_width = batch_means_interval(self.rps, self.confidence)
+        self.estimates = {
+            "batches": len(self.p95),
+            "p95_ms": p95_mean,
+            "p95_relative_half_width": p95_width,
+            "rps": rps_mean,
+            "rps_relative_half_width": rps_width,
+        }
+        if p95_width > self.tolerance or rps_width > self.tolerance:
+            self.converged_since = None
+            return False
+        if self.converged_since is None:
+            self.converged_since = timestamp
+        if timestamp - self.converged_since < self.window or timestamp - self.start_time < self.min_duration:
+            return False
+        self.stopped_early = True
+        self.stop_time = timestamp
+        return True
+
+    def state(self, end_time):
+        """Convergence state of the run, written next to the results"""
+        return {
+            "tolerance": self.tolerance,
+            "window_s": self.window,
+            "min_duration_s": self.min_duration,
+            "confidence": self.confidence,
+            "batch_s": self.batch_seconds,
+            "converged": self.converged_since is not None,
+            "stopped_early": self.stopped_early,
+            "duration_s": (self.stop_time or end_time) - self.start_time,
+            "estimates": self.estimates,
+        }
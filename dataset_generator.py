@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset generator for the glossary SQLite database
+
+Replaces the contents of the terms table with N synthetic terms so that
+both APIs can be benchmarked from the original 15 terms up to millions of
+rows. The first keywords are the original sample terms; after that every
+term word is reused with a numeric suffix ("Vertex Shader 42"), so the
+search queries (term words) match a growing share of the table as it grows.
+
+Rows are inserted with executemany in batches inside a single transaction,
+so a million terms load in seconds. Descriptions have a fixed length and
+are deterministic for a given seed.
+
+Usage:
+    python dataset_generator.py --db path/to/glossary.db --terms 100000
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+
+# Term words: the original 15 terms of init_db.py come first
+TERM_WORDS = [
+    "WebGL", "WebGPU", "Vertex Shader", "Fragment Shader", "GPU",
+    "Shader", "Buffer", "Texture", "Render Pipeline", "Uniform",
+    "VBO", "FBO", "GLSL", "WGSL", "Compute Shader",
+]
+
+DESCRIPTION_WORDS = (
+    "graphics pipeline stage that transforms vertices into fragments using programmable "
+    "shaders running on the GPU with buffers textures and uniforms bound per draw call"
+).split()
+
+CREATED_AT = "2024-01-01 12:00:00"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    keyword TEXT UNIQUE NOT NULL,
+    description TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME
+)
+"""
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def synthetic_keyword(index):
+    """Unique keyword of the index-th generated term"""
+    word = TERM_WORDS[index % len(TERM_WORDS)]
+    round_number = index // len(TERM_WORDS)
+    return word if round_number == 0 else f"{word} {round_number}"
+
+
+def description_text(length, seed):
+    """Filler text long enough to cut every description from"""
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < length * 2 + 1:
+        word = rng.choice(DESCRIPTION_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def generate_rows(count, description_length, seed=0):
+    """(id, keyword, description, created_at) tuples of the synthetic terms"""
+    text = description_text(description_length, seed)
+    rng = random.Random(seed)
+    span = len(text) - description_length
+    for index in range(count):
+        # A random window of the filler text: descriptions differ but cost nothing to build
+        offset = rng.randrange(span)
+        yield index + 1, synthetic_keyword(index), text[offset:offset + description_length], CREATED_AT
+
+
+def batches(rows, batch_size):
+    """Split an iterable of rows into lists of at most batch_size"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_dataset(db_path, count, description_length=150, seed=0, batch_size=DEFAULT_BATCH_SIZE):
+    """Replace the terms table of db_path with count synthetic terms; returns seconds taken"""
+    start = time.perf_counter()
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Losing a half-written dataset in a crash is fine, it is regenerated anyway
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(SCHEMA)
+        connection.execute("BEGIN")
+        try:
+            connection.execute("DELETE FROM terms")
+            for batch in batches(generate_rows(count, description_length, seed), batch_size):
+                connection.executemany(
+                    "INSERT INTO terms (id, keyword, description, created_at) VALUES (?, ?, ?, ?)", batch
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.close()
+    return time.perf_counter() - start
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Fill the glossary terms table with synthetic terms")
+    parser.add_argument("--db", action="append", required=True,
+                        help="SQLite database to fill (repeatable, e.g. the REST and the gRPC database)")
+    parser.add_argument("--terms", type=int, required=True, help="Number of terms to generate")
+    parser.add_argument("--description-length", type=int, default=150, help="Description length in characters")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the description text")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per executemany call")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    if args.terms < 1 or args.description_length < 1:
+        print("--terms and --description-length must be positive")
+        return 1
+    for db_path in args.db:
+        seconds = generate_dataset(db_path, args.terms, args.description_length, args.seed, args.batch_size)
+        print(f"{db_path}: {args.terms} terms in {seconds:.2f}s ({args.terms / seconds:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Shared gRPC channel pool for Locust users
+
+By default gRPC Python shares subchannels (TCP connections) between channels
+created with identical arguments. Every channel created here uses a local
+subchannel pool, so N channels really means N HTTP/2 connections.
+"""
+import itertools
+from contextlib import nullcontext
+
+import grpc
+from gevent.lock import BoundedSemaphore
+
+
+PER_USER = "per-user"
+
+# Unlimited (grpcio's default is 4 MB)
+MAX_RECEIVE_MESSAGE_LENGTH = -1
+
+
+def parse_channel_mode(value):
+    """Parse a channel mode: "per-user" or a positive number of shared channels"""
+    if value is None or str(value).strip().lower() == PER_USER:
+        return PER_USER
+    size = int(value)
+    if size < 1:
+        raise ValueError(f"Channel pool size must be >= 1, got {size}")
+    return size
+
+
+def channel_options(keepalive_ms=0, keepalive_timeout_ms=20000):
+    """Build channel arguments for a pooled channel"""
+    options = [
+        ("grpc.use_local_subchannel_pool", 1),
+        # No 4 MB cap on responses: ListTerms grows with the terms created by large-payload runs,
+        # and the REST clients have no limit either
+        ("grpc.max_receive_message_length", MAX_RECEIVE_MESSAGE_LENGTH),
+    ]
+    if keepalive_ms:
+        options += [
+            ("grpc.keepalive_time_ms", keepalive_ms),
+            ("grpc.keepalive_timeout_ms", keepalive_timeout_ms),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+        ]
+    return options
+
+
+class PooledChannel:
+    """A gRPC channel with an optional client-side limit on concurrent streams"""
+
+    def __init__(self, target, options, max_concurrent_streams=0):
+        self.channel = grpc.insecure_channel(target, options=options)
+        self._streams = BoundedSemaphore(max_concurrent_streams) if max_concurrent_streams else None
+
+    def stream_slot(self):
+        """Context manager held for the duration of one RPC"""
+        return self._streams if self._streams is not None else nullcontext()
+
+    def close(self):
+        self.channel.close()
+
+
+class GrpcChannelPool:
+    """Fixed set of channels handed out round-robin to simulated users"""
+
+    def __init__(self, target, size, keepalive_ms=0, max_concurrent_streams=0):
+        options = channel_options(keepalive_ms)
+        self.channels = [
+            PooledChannel(target, options, max_concurrent_streams) for _ in range(size)
+        ]
+        self._cycle = itertools.cycle(self.channels)
+
+    def next(self):
+        """Return the next channel in round-robin order"""
+        return next(self._cycle)
+
+    def close(self):
+        for pooled in self.channels:
+            pooled.close()
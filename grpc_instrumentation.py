@@ -0,0 +1,145 @@
+"""
+gRPC client instrumentation: per-call phase timings and exact message sizes
+
+instrument_channel() wraps a channel in two layers:
+
+- a channel wrapper that times the request serializer and the response
+  deserializer the stub registers for each method;
+- a UnaryUnaryClientInterceptor that marks the call boundaries and records
+  the serialized request/response sizes with protobuf ByteSize().
+
+Each call yields these phases (milliseconds / bytes):
+
+- serialize_ms: request protobuf encoding
+- time_to_message_ms: end of serialization until the response message is
+  handed to the deserializer (network both ways + server processing). For
+  unary calls grpc receives response headers and the message in a single
+  batch, so time to headers is not observable separately from Python.
+- deserialize_ms: response protobuf decoding
+- client_overhead_ms: the rest of the call inside the grpc Python stack
+- request_bytes / response_bytes: protobuf ByteSize() of the messages
+
+Timings are stored greenlet-locally (threading.local is patched by gevent
+under Locust), so concurrent users do not mix up their calls. The phases of
+the most recent call are available from last_call_phases().
+"""
+import threading
+import time
+
+import grpc
+
+_local = threading.local()
+
+
+def _current_phases():
+    return getattr(_local, "phases", None)
+
+
+def last_call_phases():
+    """Phases of the most recent call made by the current greenlet, or None"""
+    return getattr(_local, "last_phases", None)
+
+
+def _timed_serializer(serializer):
+    def serialize(message):
+        start = time.perf_counter()
+        data = serializer(message) if serializer else message
+        end = time.perf_counter()
+        phases = _current_phases()
+        if phases is not None:
+            phases["serialize_ms"] += (end - start) * 1000
+            phases["_serialized_at"] = end
+        return data
+    return serialize
+
+
+def _timed_deserializer(deserializer):
+    def deserialize(data):
+        start = time.perf_counter()
+        message = deserializer(data) if deserializer else data
+        end = time.perf_counter()
+        phases = _current_phases()
+        if phases is not None:
+            phases["deserialize_ms"] += (end - start) * 1000
+            phases["_message_at"] = start
+        return message
+    return deserialize
+
+
+class _TimedSerializationChannel(grpc.Channel):
+    """Channel wrapper that times the serializers stubs register per method"""
+
+    def __init__(self, channel):
+        self._channel = channel
+
+    def unary_unary(self, method, request_serializer=None, response_deserializer=None, *args, **kwargs):
+        return self._channel.unary_unary(
+            method,
+            _timed_serializer(request_serializer),
+            _timed_deserializer(response_deserializer),
+            *args,
+            **kwargs,
+        )
+
+    def unary_stream(self, *args, **kwargs):
+        return self._channel.unary_stream(*args, **kwargs)
+
+    def stream_unary(self, *args, **kwargs):
+        return self._channel.stream_unary(*args, **kwargs)
+
+    def stream_stream(self, *args, **kwargs):
+        return self._channel.stream_stream(*args, **kwargs)
+
+    def subscribe(self, *args, **kwargs):
+        return self._channel.subscribe(*args, **kwargs)
+
+    def unsubscribe(self, *args, **kwargs):
+        return self._channel.unsubscribe(*args, **kwargs)
+
+    def close(self):
+        return self._channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class PhaseTimingInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Marks call boundaries and records message sizes of unary-unary calls"""
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        phases = {
+            "serialize_ms": 0.0,
+            "deserialize_ms": 0.0,
+            "request_bytes": request.ByteSize(),
+            "response_bytes": 0,
+        }
+        _local.phases = phases
+        start = time.perf_counter()
+        try:
+            outcome = continuation(client_call_details, request)
+        finally:
+            end = time.perf_counter()
+            _local.phases = None
+
+        if outcome.exception() is None:
+            phases["response_bytes"] = outcome.result().ByteSize()
+
+        serialized_at = phases.pop("_serialized_at", start)
+        message_at = phases.pop("_message_at", end)
+        phases["time_to_message_ms"] = (message_at - serialized_at) * 1000
+        phases["total_ms"] = (end - start) * 1000
+        phases["client_overhead_ms"] = max(
+            0.0,
+            phases["total_ms"] - phases["serialize_ms"] - phases["time_to_message_ms"] - phases["deserialize_ms"],
+        )
+        _local.last_phases = phases
+        return outcome
+
+
+def instrument_channel(channel):
+    """Wrap a channel so every unary call made through it records its phases"""
+    return grpc.intercept_channel(_TimedSerializationChannel(channel), PhaseTimingInterceptor())
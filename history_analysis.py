@@ -0,0 +1,208 @@
+"""
+Time-series analysis of Locust stats history
+
+Locust appends one row per second to results_stats_history.csv: the user
+count, the current request rate and the response time percentiles of the
+last few seconds, plus the cumulative totals. The final summary averages
+all of it, so warm-up, pauses and slow degradation disappear. Here the
+Aggregated rows are streamed in chunks and:
+
+- the warm-up window is trimmed: everything until the user count reaches
+  its peak (ramp-up), then the MSER-5 truncation point of the p95 and RPS
+  series (the start that minimizes the standard error of the remaining
+  mean, searched over the first half of the run);
+- rolling p95 and RPS are computed over a fixed window of seconds;
+- the steady window is tested for a trend with the Mann-Kendall test on
+  batch means (which also damps the autocorrelation of per-second values),
+  and Sen's slope gives its size. A significant p95 increase is reported as
+  latency drift, a significant RPS decrease as throughput decay, when the
+  change over the window is large enough to matter;
+- steady-state mean latency and RPS are exact, from the differences of the
+  cumulative totals at the trim point and at the end; steady-state p95 is
+  the median of the per-second p95 values.
+
+The peak user count and peak request rate of the whole run come from the
+same pass over the file.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+HISTORY_FILE = "results_stats_history.csv"
+
+HISTORY_COLUMNS = [
+    "Timestamp", "User Count", "Name", "Requests/s", "95%",
+    "Total Request Count", "Total Failure Count", "Total Average Response Time",
+]
+
+CHUNK_SIZE = 10000
+
+# MSER batch size (MSER-5)
+MSER_BATCH = 5
+
+# Rolling window of the p95/RPS series, in seconds
+ROLLING_SECONDS = 30
+
+# Trend test on batch means of this many seconds
+TREND_BATCH_SECONDS = 10
+TREND_ALPHA = 0.05
+
+# Smallest change over the steady window reported as drift or decay
+MIN_TREND_CHANGE = 0.10
+
+
+def read_history(filepath, chunksize=CHUNK_SIZE):
+    """Aggregated rows of a stats history CSV, read in chunks, with numeric columns"""
+    header = pd.read_csv(filepath, nrows=0).columns
+    usecols = [column for column in HISTORY_COLUMNS if column in header]
+    chunks = []
+    for chunk in pd.read_csv(filepath, usecols=usecols, chunksize=chunksize):
+        if "Name" in chunk.columns:
+            chunk = chunk[chunk["Name"] == "Aggregated"]
+        chunks.append(chunk.drop(columns=["Name"], errors="ignore"))
+    if not chunks:
+        return pd.DataFrame(columns=[c for c in usecols if c != "Name"])
+    history = pd.concat(chunks, ignore_index=True)
+    # Percentiles are "N/A" in seconds without requests
+    return history.apply(pd.to_numeric, errors="coerce")
+
+
+def mser_truncation(values, batch=MSER_BATCH):
+    """MSER truncation point (in samples) of a series: start of its steady part"""
+    values = np.asarray(values, dtype=float)
+    count = len(values) // batch
+    if count < 4:
+        return 0
+    means = values[:count * batch].reshape(count, batch).mean(axis=1)
+    # Sums of the remaining batch means for every truncation point d
+    remaining = np.arange(count, 0, -1)
+    sums = np.cumsum(means[::-1])[::-1]
+    squares = np.cumsum((means ** 2)[::-1])[::-1]
+    statistic = (squares - sums ** 2 / remaining) / remaining ** 2
+    # Truncating more than half of the run means it never settled
+    return int(np.argmin(statistic[:count // 2 + 1])) * batch
+
+
+def warmup_rows(history):
+    """Number of leading history rows that belong to ramp-up and warm-up"""
+    users = history["User Count"].to_numpy() if "User Count" in history.columns else np.array([])
+    ramp = int(np.argmax(users >= users.max())) if len(users) and users.max() > 0 else 0
+    settling = 0
+    for column in ("95%", "Requests/s"):
+        if column in history.columns:
+            # Seconds without requests carry no latency, reuse the previous value
+            series = history[column].iloc[ramp:].ffill().bfill().to_numpy()
+            if len(series) and not np.isnan(series).all():
+                settling = max(settling, mser_truncation(series))
+    return ramp + settling
+
+
+def batch_means(values, size):
+    """Means of consecutive batches of size values (the incomplete tail is dropped)"""
+    values = np.asarray(values, dtype=float)
+    count = len(values) // size
+    return values[:count * size].reshape(count, size).mean(axis=1)
+
+
+def mann_kendall(values):
+    """Mann-Kendall trend test: (z, two-sided p-value, Sen's slope per sample) or None"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n < 8:
+        return None
+    first, second = np.triu_indices(n, 1)
+    differences = values[second] - values[first]
+    s = np.sign(differences).sum()
+    _, ties = np.unique(values, return_counts=True)
+    variance = (n * (n - 1) * (2 * n + 5) - (ties * (ties - 1) * (2 * ties + 5)).sum()) / 18
+    if variance <= 0:
+        return 0.0, 1.0, 0.0
+    z = (s - np.sign(s)) / math.sqrt(variance)
+    p_value = math.erfc(abs(z) / math.sqrt(2))
+    slope = float(np.median(differences / (second - first)))
+    return float(z), p_value, slope
+
+
+def trend(values, interval, level):
+    """Trend of a steady-state series sampled every interval seconds
+
+    Returns {"slope_per_min", "change", "p_value", "significant"}, where
+    change is the fitted change over the series relative to level, or None
+    when the series is too short.
+    """
+    size = max(1, round(TREND_BATCH_SECONDS / interval))
+    result = mann_kendall(batch_means(values, size))
+    if result is None:
+        return None
+    _, p_value, slope = result
+    slope_per_second = slope / (size * interval)
+    change = float(slope_per_second * len(values) * interval / level) if level else 0.0
+    return {
+        "slope_per_min": slope_per_second * 60,
+        "change": change,
+        "p_value": p_value,
+        "significant": bool(p_value < TREND_ALPHA and abs(change) >= MIN_TREND_CHANGE),
+    }
+
+
+def window_metrics(start, end):
+    """Request rate and mean latency between two history rows, from their cumulative totals"""
+    seconds = end["Timestamp"] - start["Timestamp"]
+    requests = end["Total Request Count"] - start["Total Request Count"]
+    if seconds <= 0 or requests <= 0:
+        return None, None
+    latency_sum = (end["Total Average Response Time"] * end["Total Request Count"]
+                   - start["Total Average Response Time"] * start["Total Request Count"])
+    return float(requests / seconds), float(latency_sum / requests)
+
+
+def analyze_history(filepath):
+    """Peaks, warm-up, steady-state metrics, rolling extremes and trends of one run's stats history"""
+    history = read_history(filepath)
+    peak_users = history["User Count"].max() if "User Count" in history.columns else None
+    peak_rps = history["Requests/s"].max() if "Requests/s" in history.columns else None
+    history = history.dropna(subset=["Timestamp"])
+    # Rows before the first user do not belong to the run
+    if "User Count" in history.columns:
+        started = history["User Count"] > 0
+        if started.any():
+            history = history.loc[started.idxmax():]
+    history = history.reset_index(drop=True)
+    if len(history) < 2:
+        raise ValueError("stats history too short to analyze")
+
+    timestamps = history["Timestamp"].to_numpy(dtype=float)
+    interval = float(np.median(np.diff(timestamps))) or 1.0
+    trimmed = min(warmup_rows(history), len(history) - 2)
+    steady = history.iloc[trimmed:]
+
+    whole_rps, whole_latency = window_metrics(history.iloc[0], history.iloc[-1])
+    steady_rps, steady_latency = window_metrics(steady.iloc[0], steady.iloc[-1])
+
+    window = max(1, round(ROLLING_SECONDS / interval))
+    rolling_p95 = steady["95%"].rolling(window, min_periods=1).median()
+    rolling_rps = steady["Requests/s"].rolling(window, min_periods=1).mean()
+
+    steady_p95 = steady["95%"].median()
+    p95_trend = trend(steady["95%"].ffill().to_numpy(), interval, steady_p95)
+    rps_trend = trend(steady["Requests/s"].to_numpy(), interval, steady["Requests/s"].mean())
+
+    return {
+        "peak_users": 0 if pd.isna(peak_users) else int(peak_users),
+        "peak_rps": None if pd.isna(peak_rps) else float(peak_rps),
+        "duration_s": float(timestamps[-1] - timestamps[0]),
+        "warmup_s": float(timestamps[trimmed] - timestamps[0]),
+        "whole_rps": whole_rps,
+        "whole_avg_ms": whole_latency,
+        "steady_rps": steady_rps,
+        "steady_avg_ms": steady_latency,
+        "steady_p95_ms": None if pd.isna(steady_p95) else float(steady_p95),
+        "rolling_p95_ms": (float(rolling_p95.min()), float(rolling_p95.max())) if rolling_p95.notna().any() else None,
+        "rolling_rps": (float(rolling_rps.min()), float(rolling_rps.max())) if rolling_rps.notna().any() else None,
+        "p95_trend": p95_trend,
+        "rps_trend": rps_trend,
+        "latency_drift": bool(p95_trend and p95_trend["significant"] and p95_trend["change"] > 0),
+        "throughput_decay": bool(rps_trend and rps_trend["significant"] and rps_trend["change"] < 0),
+    }
@@ -0,0 +1,181 @@
+"""
+HTTP/2 REST client for Locust: httpx over h2 behind HttpSession's interface
+
+RestUser speaks HTTP/1.1 + JSON and GrpcUser HTTP/2 + protobuf, so the gap
+between them mixes transport and encoding. Http2Session sends the same JSON
+requests over HTTP/2 with prior knowledge (h2c, no HTTP/1.1 fallback: a
+server without HTTP/2 fails every request instead of silently measuring
+HTTP/1.1), so the REST tasks can run unchanged on it.
+
+It implements the part of Locust's HttpSession the REST tasks use: get()
+and post() with name, params, json, headers and catch_response, returning
+a response that is a context manager with success() / failure(). Requests
+are reported through events.request with the same request type and name
+as RestUser, with phases in the context like rest_instrumentation (ttfb_ms,
+body_read_ms, decode_ms added by decode_json, request_bytes, response_bytes).
+
+Users sharing an Http2Connection send their requests as concurrent streams
+of one HTTP/2 connection.
+"""
+import itertools
+import logging
+import ssl
+import time
+
+import httpx
+from locust.exception import CatchResponseError
+
+# httpx logs every request at INFO, which Locust would print and pay for per request
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Every httpx client otherwise loads the CA bundle into a new SSL context,
+# tens of milliseconds that block the other users while one starts
+SSL_CONTEXT = ssl.create_default_context()
+
+
+class Http2Connection:
+    """One HTTP/2 connection to the REST server (an httpx client capped at one connection)"""
+
+    def __init__(self, base_url, timeout=10.0):
+        self.client = httpx.Client(
+            base_url=base_url,
+            http1=False,
+            http2=True,
+            timeout=timeout,
+            verify=SSL_CONTEXT,
+            limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+        )
+
+    def close(self):
+        self.client.close()
+
+
+class Http2ConnectionPool:
+    """Fixed set of HTTP/2 connections handed out round-robin to simulated users"""
+
+    def __init__(self, base_url, size):
+        self.connections = [Http2Connection(base_url) for _ in range(size)]
+        self._cycle = itertools.cycle(self.connections)
+
+    def next(self):
+        """Return the next connection in round-robin order"""
+        return next(self._cycle)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+
+
+class Http2Response:
+    """Response of one request; as a context manager it is reported to Locust on exit"""
+
+    def __init__(self, session, request_meta, response=None, error=None, phases=None):
+        self._session = session
+        self._result = None
+        self.request_meta = request_meta
+        self.response = response
+        self.error = error
+        self.phases = phases
+        self.status_code = response.status_code if response is not None else 0
+
+    @property
+    def content(self):
+        return self.response.content if self.response is not None else b""
+
+    @property
+    def headers(self):
+        return self.response.headers if self.response is not None else {}
+
+    def json(self):
+        if self.response is None:
+            raise ValueError(f"No response: {self.error}")
+        return self.response.json()
+
+    def success(self):
+        self._result = True
+
+    def failure(self, exc):
+        self._result = exc if isinstance(exc, Exception) else CatchResponseError(exc)
+
+    def outcome(self):
+        """True for a success, else the exception the request is reported with"""
+        if self._result is not None:
+            return self._result
+        if self.error is not None:
+            return self.error
+        if self.status_code >= 400:
+            return CatchResponseError(f"Status code: {self.status_code}")
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Unexpected exceptions in the with-block propagate unreported, as with HttpSession
+        if exc is not None and self._result is None:
+            return False
+        self._session.report(self)
+        return exc is None
+
+
+class Http2Session:
+    """Sends the REST tasks' requests over an Http2Connection and reports them to Locust"""
+
+    def __init__(self, connection, request_event, user=None):
+        self.connection = connection
+        self.request_event = request_event
+        self.user = user
+
+    def request(self, method, url, name=None, params=None, json=None, headers=None, catch_response=False):
+        client = self.connection.client
+        request = client.build_request(method, url, params=params, json=json, headers=headers)
+        start_time = time.time()
+        start = time.perf_counter()
+        response = error = phases = None
+        try:
+            response = client.send(request, stream=True)
+            headers_at = time.perf_counter()
+            try:
+                response.read()
+            finally:
+                response.close()
+            phases = {
+                "ttfb_ms": (headers_at - start) * 1000,
+                "body_read_ms": (time.perf_counter() - headers_at) * 1000,
+                "decode_ms": 0.0,
+                "request_bytes": len(request.content),
+                "response_bytes": len(response.content),
+            }
+        except httpx.HTTPError as e:
+            response = None
+            error = e
+        request_meta = {
+            "request_type": method,
+            "name": name or url,
+            "start_time": start_time,
+            "response_time": (time.perf_counter() - start) * 1000,
+            "response_length": len(response.content) if response is not None else 0,
+            "url": str(request.url),
+        }
+        wrapped = Http2Response(self, request_meta, response, error, phases)
+        if not catch_response:
+            self.report(wrapped)
+        return wrapped
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def report(self, response):
+        """Fire events.request for a finished request"""
+        outcome = response.outcome()
+        context = self.user.context() if self.user is not None else {}
+        context["phases"] = response.phases
+        self.request_event.fire(
+            **response.request_meta,
+            response=response,
+            exception=None if outcome is True else outcome,
+            context=context,
+        )
@@ -0,0 +1,152 @@
+"""
+Key popularity models for lookups and searches
+
+A distribution spec selects how often each key of a ranked key universe is
+requested (rank 1 = first key = most popular):
+
+- "uniform": every key equally likely
+- "zipf:S": probability of rank r proportional to 1 / r**S (S > 0, ~1 for
+  typical web traffic)
+- "hotspot:F:P": the first F fraction of keys receives P of the requests,
+  the rest share 1 - P evenly (e.g. hotspot:0.1:0.9)
+
+Sampling uses Vose's alias method: the tables are built once in O(n), after
+which every draw costs two random numbers and one table lookup, whatever
+the size of the key universe.
+
+The key universe is loaded from a file: plain text (one key per line),
+JSON (a list of keys or of objects with a "keyword" field), JSONL or a
+SQLite database with a terms(keyword) table. The order of the file is the
+popularity rank. Search queries can be derived from the same universe:
+the words of its keywords, most common first.
+"""
+import json
+import math
+import random
+import re
+import sqlite3
+from collections import Counter
+
+DISTRIBUTIONS = ("uniform", "zipf", "hotspot")
+
+# Default key universe: keywords of the sample glossary and searches over them
+SAMPLE_KEYWORDS = [
+    "WebGL", "WebGPU", "Vertex Shader", "Fragment Shader", "GPU",
+    "Shader", "Buffer", "Texture", "Render Pipeline", "Uniform",
+    "VBO", "FBO", "GLSL", "WGSL", "Compute Shader"
+]
+SEARCH_QUERIES = ["Shader", "GPU", "Web", "Buffer", "Render", "Texture", "GL", "Pipeline"]
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def parse_distribution(spec):
+    """Split a distribution spec into (name, parameters); raises ValueError if invalid"""
+    name, *params = spec.strip().split(":")
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown key distribution {name!r}, expected one of {', '.join(DISTRIBUTIONS)}")
+    try:
+        params = [float(p) for p in params]
+    except ValueError:
+        raise ValueError(f"Invalid key distribution parameters: {spec!r}") from None
+    if name == "uniform" and params:
+        raise ValueError("uniform takes no parameters")
+    if name == "zipf" and (len(params) != 1 or params[0] <= 0):
+        raise ValueError("zipf needs one positive exponent, e.g. zipf:1.1")
+    if name == "hotspot" and (len(params) != 2 or not 0 < params[0] < 1 or not 0 <= params[1] <= 1):
+        raise ValueError("hotspot needs a key fraction in (0, 1) and a request share in [0, 1], e.g. hotspot:0.1:0.9")
+    return name, params
+
+
+def distribution_weights(spec, n):
+    """Relative request weight of each of n ranked keys"""
+    name, params = parse_distribution(spec)
+    if name == "zipf":
+        return [1.0 / (rank ** params[0]) for rank in range(1, n + 1)]
+    if name == "hotspot":
+        fraction, share = params
+        hot = min(max(1, math.ceil(n * fraction)), n)
+        if hot == n:
+            return [1.0] * n
+        return [share / hot] * hot + [(1.0 - share) / (n - hot)] * (n - hot)
+    return [1.0] * n
+
+
+class AliasTable:
+    """Vose's alias method: O(1) sampling from a fixed discrete distribution"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("Alias table needs at least one positive weight")
+        scaled = [w * n / total for w in weights]
+        self.probability = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left has probability 1 up to rounding error
+
+    def sample(self, rng):
+        """Index drawn with probability proportional to its weight"""
+        column = int(rng.random() * len(self.probability))
+        return column if rng.random() < self.probability[column] else self.alias[column]
+
+
+def seeded_random(seed, stream=0):
+    """Random generator for one stream of a seeded run (e.g. one worker process)"""
+    # String seeds are hashed, so neighbouring seeds and streams do not overlap
+    return random.Random(f"{seed}/{stream}")
+
+
+class KeySampler:
+    """Draws keys from a ranked key universe with a popularity distribution
+
+    rng is shared with other samplers of the process, so one seed fixes the
+    whole workload.
+    """
+
+    def __init__(self, keys, spec="uniform", rng=None):
+        if not keys:
+            raise ValueError("Key universe is empty")
+        self.keys = list(keys)
+        self.spec = spec
+        self.table = AliasTable(distribution_weights(spec, len(self.keys)))
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        """Next key"""
+        return self.keys[self.table.sample(self.rng)]
+
+
+def load_keys(path):
+    """Ranked, de-duplicated key universe from a text, JSON, JSONL or SQLite file"""
+    if path.endswith(SQLITE_SUFFIXES):
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            keys = [row[0] for row in connection.execute("SELECT keyword FROM terms ORDER BY id")]
+        finally:
+            connection.close()
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            keys = [item["keyword"] if isinstance(item, dict) else item for item in json.load(f)]
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            keys = [json.loads(line)["keyword"] for line in f if line.strip()]
+    else:
+        with open(path, encoding="utf-8") as f:
+            keys = [line.strip() for line in f if line.strip()]
+    # dict.fromkeys keeps the first occurrence, so the rank order survives
+    return list(dict.fromkeys(str(key) for key in keys if key))
+
+
+def search_queries(keys):
+    """Search queries from a key universe: words of its keywords, ranked by how many keys contain them"""
+    words = Counter(word for key in keys for word in set(re.findall(r"[^\W\d_]{2,}", key)))
+    return [word for word, _ in words.most_common()]
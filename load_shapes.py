@@ -0,0 +1,72 @@
+"""
+Open-loop (constant arrival rate) load shapes for Locust
+
+In the default closed-loop mode every user waits for its response and then
+sleeps 1-3 seconds, so a slow server automatically receives fewer requests
+and tail latency is understated (coordinated omission). In open-loop mode
+requests are scheduled at a target rate regardless of response times:
+
+- a shared ArrivalSchedule hands out intended start times at the target rate;
+- each user sleeps until its next slot (arrival_wait_time) and runs one task;
+- response time is measured from the intended start time, so a request that
+  had to wait for a free user includes that wait in its latency.
+
+The plan and the schedule itself live in arrival_schedule.
+"""
+import time
+
+from locust import LoadTestShape
+from locust.exception import StopUser
+
+from arrival_schedule import plan_duration
+
+
+def arrival_wait_time(schedule):
+    """Build a wait_time function that sleeps each user until its next slot"""
+
+    def wait_time(user):
+        slot = schedule.next_arrival()
+        if slot is None:
+            # Plan is over: no more arrivals, the shape stops the test shortly
+            raise StopUser()
+        user.intended_start = slot
+        return max(0.0, slot - time.time())
+
+    return wait_time
+
+
+def measure_from_intended_start(request_event):
+    """Make the request event report latency from each request's intended start
+
+    Users put their slot in the request context (User.context()); a request
+    that started late because no user was free gets the lag added, exactly
+    as a client that sent it on time would have observed.
+    """
+    original_fire = request_event.fire
+
+    def fire(**kwargs):
+        intended_start = (kwargs.get("context") or {}).get("intended_start")
+        if intended_start is not None and kwargs.get("response_time") is not None:
+            since_intended = (time.time() - intended_start) * 1000
+            kwargs["response_time"] = max(kwargs["response_time"], since_intended)
+        original_fire(**kwargs)
+
+    request_event.fire = fire
+
+
+class ArrivalRateShape(LoadTestShape):
+    """Keeps a fixed pool of users alive for the length of the rate plan
+
+    The user count is a concurrency budget, not the load level: the request
+    rate comes from the ArrivalSchedule. Abstract so that importing it does
+    not activate it; the locustfile subclasses it in open-loop mode.
+    """
+
+    abstract = True
+    steps = []
+    users = 1
+
+    def tick(self):
+        if self.get_run_time() >= plan_duration(self.steps):
+            return None
+        return self.users, self.users
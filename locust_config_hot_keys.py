@@ -0,0 +1,23 @@
+"""
+Skewed key popularity test configuration (hot keys)
+"""
+# Users: 100
+# Spawn rate: 10 users/sec
+# Duration: 5 minutes
+# Keys: Zipf(1.1) over the key universe, a few terms get most lookups
+
+USERS = 100
+SPAWN_RATE = 10
+DURATION = "5m"
+TEST_NAME = "hot_keys_load"
+
+# Key distribution: "uniform", "zipf:S" or "hotspot:F:P" (F of the keys get P of the requests)
+KEY_DISTRIBUTION = "zipf:1.1"
+# Seed of the key sequence (default: derived from TEST_NAME)
+KEY_SEED = 42
+# Ranked key universe: text (one keyword per line), JSON, JSONL or SQLite with a terms table;
+# None uses the built-in sample keywords
+KEYWORDS_FILE = None
+
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
@@ -10,3 +10,5 @@ SPAWN_RATE = 2
 DURATION = "2m"
 TEST_NAME = "light_load"
 
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
@@ -10,3 +10,5 @@ SPAWN_RATE = 10
 DURATION = "5m"
 TEST_NAME = "normal_load"
 
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
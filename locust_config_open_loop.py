@@ -0,0 +1,16 @@
+"""
+Open-loop workload test configuration (constant arrival rate)
+"""
+# Target rate: 50 -> 100 -> 200 requests/sec, 2 minutes per step
+# Users: concurrency budget, not load level (requests are sent on schedule)
+
+RPS_STEPS = [(50, "2m"), (100, "2m"), (200, "2m")]
+USERS = 400
+TEST_NAME = "open_loop_load"
+
+# Constant rate alternative: set TARGET_RPS and DURATION instead of RPS_STEPS
+# TARGET_RPS = 100
+# DURATION = "5m"
+
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
@@ -0,0 +1,14 @@
+"""
+Trace replay test configuration (recorded traffic)
+"""
+# Trace: JSONL file of recorded requests, see trace_replay.py for the format
+# Speed: 1.0 replays at the recorded timing, 2.0 twice as fast
+# Users: concurrency budget, not load level (requests are sent on the trace's schedule)
+
+TRACE_FILE = "traces/production.jsonl"
+TRACE_SPEEDUP = 1.0
+USERS = 200
+TEST_NAME = "trace_replay"
+
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
@@ -10,3 +10,5 @@ SPAWN_RATE = 5
 DURATION = "30m"
 TEST_NAME = "stability_load"
 
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
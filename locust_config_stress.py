@@ -10,3 +10,5 @@ SPAWN_RATE = 50
 DURATION = "10m"
 TEST_NAME = "stress_load"
 
+# gRPC channels: "per-user" or number of channels shared by all users
+GRPC_CHANNELS = "per-user"
@@ -1,12 +1,19 @@
 """
 Locust load testing file for comparing FastAPI REST and gRPC performance
 """
+import json
 import random
 import sys
 import os
 import time
-from locust import HttpUser, User, task, between, events
+from collections import Counter
+from urllib.parse import quote
+from locust import HttpUser, FastHttpUser, User, task, between, events
+from locust.runners import MasterRunner, WorkerRunner
+from locust.util.timespan import parse_timespan
+import gevent
 import grpc
+from grpc.experimental import gevent as grpc_gevent
 import requests
 
 # Add gRPC service path to sys.path
@@ -20,234 +27,819 @@ from glossary_pb2 import (
     AddTermRequest,
 )
 from glossary_pb2_grpc import GlossaryServiceStub
+from arrival_schedule import ArrivalSchedule, concurrency_budget, parse_rate_plan
+from convergence import BatchRecorder, ConvergenceMonitor
+from dataset_generator import description_text
+from grpc_channel_pool import GrpcChannelPool, PooledChannel, PER_USER, channel_options, parse_channel_mode
+from grpc_instrumentation import instrument_channel, last_call_phases
+from http2_client import Http2Connection, Http2ConnectionPool, Http2Session
+from key_distribution import SAMPLE_KEYWORDS, SEARCH_QUERIES, KeySampler, load_keys, search_queries, seeded_random
+from latency_histogram import LatencyHistograms
+from load_shapes import ArrivalRateShape, arrival_wait_time, measure_from_intended_start
+from request_phases import PhaseStats
+from rest_instrumentation import decode_json, instrument_session, pop_response_phases
+from trace_replay import TraceReplayShape, TraceSchedule, replay_event, trace_duration, trace_wait_time
 
-# Sample keywords from the database
-SAMPLE_KEYWORDS = [
-    "WebGL", "WebGPU", "Vertex Shader", "Fragment Shader", "GPU",
-    "Shader", "Buffer", "Texture", "Render Pipeline", "Uniform",
-    "VBO", "FBO", "GLSL", "WGSL", "Compute Shader"
-]
+# Make gRPC cooperate with gevent: without this every blocking stub call
+# stalls all other greenlets (simulated users) in the Locust process.
+# Must run before any channel is created.
+grpc_gevent.init_gevent()
 
-# Search queries for testing
-SEARCH_QUERIES = ["Shader", "GPU", "Web", "Buffer", "Render", "Texture", "GL", "Pipeline"]
+# Key popularity (see key_distribution): "uniform", "zipf:S" or "hotspot:F:P".
+# LOCUST_KEYWORDS_FILE replaces the sample keywords with a larger key universe,
+# ranked by popularity in file order, e.g. the generated database (see
+# dataset_generator); search queries are then the words of those keywords.
+# run_tests.py always passes a seed, so a run's keys can be reproduced;
+# without one a random seed is picked and recorded.
+KEY_DISTRIBUTION = os.getenv("LOCUST_KEY_DISTRIBUTION", "uniform")
+KEY_SEED = int(os.getenv("LOCUST_KEY_SEED") or random.randrange(2 ** 32))
+KEYWORDS_FILE = os.getenv("LOCUST_KEYWORDS_FILE")
+if KEYWORDS_FILE:
+    KEYWORDS = KeySampler(load_keys(KEYWORDS_FILE), KEY_DISTRIBUTION)
+    QUERIES = KeySampler(search_queries(KEYWORDS.keys), KEY_DISTRIBUTION)
+else:
+    KEYWORDS = KeySampler(SAMPLE_KEYWORDS, KEY_DISTRIBUTION)
+    QUERIES = KeySampler(SEARCH_QUERIES, KEY_DISTRIBUTION)
 
-# REST API base URL
-REST_BASE_URL = "http://localhost:8000"
+# REST API base URL and gRPC server address; run_tests.py points them at the
+# network emulator (network_emulator.py) when a network profile is used
+REST_BASE_URL = os.getenv("LOCUST_REST_URL", "http://localhost:8000")
+GRPC_SERVER = os.getenv("LOCUST_GRPC_TARGET", "localhost:50051")
+
+# Description length of created terms in characters, from a few bytes to hundreds
+# of KB (set by run_tests.py from DESCRIPTION_SIZE or --description-sizes);
+# 0 keeps the short "Test description for TestTerm_NNNNN" text
+DESCRIPTION_SIZE = int(os.getenv("LOCUST_DESCRIPTION_SIZE", "0"))
+DESCRIPTION_TEXT = description_text(DESCRIPTION_SIZE, KEY_SEED) if DESCRIPTION_SIZE > 0 else None
+
+# Wire compression (set by run_tests.py from COMPRESSION or --compression):
+# "none", "gzip" or "deflate". The two protocols compress opposite directions:
+# REST asks for compressed responses with Accept-Encoding (the server decides
+# whether to compress, see RESPONSE_ENCODINGS), gRPC compresses each call's
+# request. Unset keeps the clients' defaults.
+COMPRESSION = os.getenv("LOCUST_COMPRESSION") or None
+ACCEPT_ENCODINGS = {"none": "identity", "gzip": "gzip", "deflate": "deflate"}
+GRPC_COMPRESSIONS = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+if COMPRESSION is not None and COMPRESSION not in ACCEPT_ENCODINGS:
+    raise ValueError(f"Unknown LOCUST_COMPRESSION {COMPRESSION!r}, expected one of {', '.join(ACCEPT_ENCODINGS)}")
+# Per request: FastHttpSession adds its own Accept-Encoding to requests without one
+REST_HEADERS = {"Accept-Encoding": ACCEPT_ENCODINGS[COMPRESSION]} if COMPRESSION else None
+GRPC_COMPRESSION = GRPC_COMPRESSIONS.get(COMPRESSION)
+
+# gRPC channel mode: "per-user" (one channel per simulated user) or the number
+# of channels shared round-robin by all users in this process
+GRPC_CHANNELS = parse_channel_mode(os.getenv("GRPC_CHANNELS", PER_USER))
+# Keepalive ping interval for each channel (0 disables keepalive pings)
+GRPC_KEEPALIVE_MS = int(os.getenv("GRPC_KEEPALIVE_MS", "0"))
+# Client-side cap on concurrent RPCs per channel (0 means unlimited)
+GRPC_MAX_CONCURRENT_STREAMS = int(os.getenv("GRPC_MAX_CONCURRENT_STREAMS", "0"))
+
+# HTTP/2 REST connection mode, same values as GRPC_CHANNELS; defaults to the
+# gRPC channel mode so both HTTP/2 clients multiplex users the same way
+HTTP2_CONNECTIONS = parse_channel_mode(os.getenv("HTTP2_CONNECTIONS", os.getenv("GRPC_CHANNELS", PER_USER)))
+
+# Number of worker processes in a distributed run (set by run_tests.py --workers),
+# 0 for a single Locust process
+LOCUST_WORKERS = int(os.getenv("LOCUST_WORKERS", "0"))
+
+# Open-loop mode: JSON rate plan [[rps, seconds], ...] built by run_tests.py
+# from TARGET_RPS / RPS_STEPS in the scenario config. Unset means closed-loop.
+RPS_PLAN = os.getenv("LOCUST_RPS_PLAN")
+OPEN_LOOP = bool(RPS_PLAN)
+
+# Trace replay: JSONL trace of recorded requests (see trace_replay), replayed
+# at its original timing divided by LOCUST_TRACE_SPEEDUP. Set by run_tests.py
+# from TRACE_FILE / TRACE_SPEEDUP in the scenario config.
+TRACE_FILE = os.getenv("LOCUST_TRACE")
+TRACE_REPLAY = bool(TRACE_FILE)
+TRACE_SPEEDUP = float(os.getenv("LOCUST_TRACE_SPEEDUP", "1.0"))
+
+if OPEN_LOOP and TRACE_REPLAY:
+    raise ValueError("LOCUST_RPS_PLAN and LOCUST_TRACE are mutually exclusive")
+
+# Requests are sent at scheduled times rather than after each response
+SCHEDULED = OPEN_LOOP or TRACE_REPLAY
+
+# Convergence mode: stop once the p95 and RPS confidence intervals are within
+# LOCUST_CONVERGE_TOLERANCE (relative half-width) for LOCUST_CONVERGE_WINDOW,
+# but not before LOCUST_CONVERGE_MIN_TIME; --run-time stays the maximum.
+# Set by run_tests.py --converge. Unset or 0 runs for the full --run-time.
+CONVERGE_TOLERANCE = float(os.getenv("LOCUST_CONVERGE_TOLERANCE") or 0)
+CONVERGE = CONVERGE_TOLERANCE > 0
+CONVERGE_WINDOW = parse_timespan(os.getenv("LOCUST_CONVERGE_WINDOW", "30s"))
+CONVERGE_MIN_TIME = parse_timespan(os.getenv("LOCUST_CONVERGE_MIN_TIME", "1m"))
+
+if CONVERGE and TRACE_REPLAY:
+    raise ValueError("LOCUST_CONVERGE_TOLERANCE cannot shorten a trace replay")
+
+if OPEN_LOOP:
+    RATE_STEPS = parse_rate_plan(RPS_PLAN)
+    # Every worker runs its own schedule, so each takes an equal share of the rate
+    ARRIVALS = ArrivalSchedule([(rps / max(LOCUST_WORKERS, 1), seconds) for rps, seconds in RATE_STEPS])
+    WAIT_TIME = arrival_wait_time(ARRIVALS)  # Sleep until the next scheduled arrival
+elif TRACE_REPLAY:
+    TRACE = TraceSchedule(TRACE_FILE, TRACE_SPEEDUP)
+    WAIT_TIME = trace_wait_time(TRACE)  # Sleep until the next event of the trace
+else:
+    WAIT_TIME = between(1, 3)  # Wait 1-3 seconds between requests
+
+
+def replayable(user_class):
+    """In trace replay mode, run only replay_trace instead of the weighted task mix"""
+    if TRACE_REPLAY:
+        user_class.tasks = [user_class.replay_trace]
+    return user_class
+
+
+class InFlightCounter:
+    """Tracks how many calls are in flight at once (current and peak)"""
+    
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+    
+    def __enter__(self):
+        self.current += 1
+        if self.current > self.peak:
+            self.peak = self.current
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.current -= 1
+        return False
+
+
+GRPC_IN_FLIGHT = InFlightCounter()
+
+# Shared channel pool, created lazily by the first gRPC user
+_grpc_channel_pool = None
+
+
+def get_grpc_channel_pool():
+    """Return the process-wide gRPC channel pool"""
+    global _grpc_channel_pool
+    if _grpc_channel_pool is None:
+        _grpc_channel_pool = GrpcChannelPool(
+            GRPC_SERVER,
+            GRPC_CHANNELS,
+            keepalive_ms=GRPC_KEEPALIVE_MS,
+            max_concurrent_streams=GRPC_MAX_CONCURRENT_STREAMS,
+        )
+    return _grpc_channel_pool
+
+
+# Shared HTTP/2 connections, created lazily by the first Http2RestUser
+_http2_connection_pool = None
+
+
+def get_http2_connection_pool(base_url):
+    """Return the process-wide HTTP/2 connection pool"""
+    global _http2_connection_pool
+    if _http2_connection_pool is None:
+        _http2_connection_pool = Http2ConnectionPool(base_url, HTTP2_CONNECTIONS)
+    return _http2_connection_pool
+
+
+def new_term_payload():
+    """Payload of a term to create: a unique keyword and a DESCRIPTION_SIZE description"""
+    # Generate unique keyword to avoid conflicts
+    keyword = f"TestTerm_{random.randint(10000, 99999)}"
+    if DESCRIPTION_TEXT is None:
+        return {"keyword": keyword, "description": f"Test description for {keyword}"}
+    # A random window of filler text: compresses like text, costs nothing to build
+    offset = random.randrange(len(DESCRIPTION_TEXT) - DESCRIPTION_SIZE)
+    return {"keyword": keyword, "description": DESCRIPTION_TEXT[offset:offset + DESCRIPTION_SIZE]}
+
+
+def results_file(environment, suffix):
+    """Path of a per-run side file next to Locust's CSVs, or None without --csv"""
+    options = environment.parsed_options
+    csv_prefix = getattr(options, "csv_prefix", None) if options else None
+    if not csv_prefix:
+        return None
+    return f"{csv_prefix}_{suffix}"
+
+
+# Per-endpoint HDR latency histograms of this run
+LATENCY_HISTOGRAMS = LatencyHistograms()
+
+
+@events.request.add_listener
+def record_latency_histogram(request_type, name, response_time, **kwargs):
+    """Record every request's latency at microsecond precision"""
+    if response_time is not None:
+        LATENCY_HISTOGRAMS.record(request_type, name, response_time)
+
+
+# Per-endpoint phase timings and payload sizes of this run
+PHASE_STATS = PhaseStats()
+
+
+@events.request.add_listener
+def record_request_phases(request_type, name, context=None, **kwargs):
+    """Aggregate the phase breakdown users attach to a request's context"""
+    phases = (context or {}).get("phases")
+    if phases:
+        PHASE_STATS.record(request_type, name, phases)
+
+
+# Content-Encoding of the REST responses of this run while COMPRESSION is set:
+# shows whether the server compressed them at all
+RESPONSE_ENCODINGS = Counter()
+
+
+def count_response_encoding(response):
+    """Count the Content-Encoding of a REST response (identity when absent)"""
+    if COMPRESSION is None or not response.status_code:
+        return
+    encoding = response.headers.get("Content-Encoding") or "identity"
+    RESPONSE_ENCODINGS[encoding.lower()] += 1
+
+
+# Client process CPU and wall clock at test start, and requests made since
+_client_clock = {}
+
+# Results received from workers in a distributed run, by worker id
+_worker_results = {}
+# Peak gRPC calls in flight of each worker, by worker id
+_worker_in_flight = {}
+
+# Saturation threshold of a load generator process (fraction of one core)
+CLIENT_CPU_LIMIT = 0.9
+
+
+@events.test_start.add_listener
+def start_client_cpu_clock(environment, **kwargs):
+    """Remember client CPU time at test start"""
+    _client_clock["cpu"] = time.process_time()
+    _client_clock["wall"] = time.time()
+    _client_clock["requests"] = 0
+    _client_clock["users"] = 0
+    _worker_results.clear()
+    _worker_in_flight.clear()
+    RESPONSE_ENCODINGS.clear()
+
+
+@events.spawning_complete.add_listener
+def count_spawned_users(user_count, **kwargs):
+    """Remember the most users running at once (on the master: over all workers)"""
+    _client_clock["users"] = max(_client_clock.get("users", 0), user_count)
+
+
+@events.test_start.add_listener
+def seed_key_samplers(environment, **kwargs):
+    """Restart the key sequence from the seed; each worker gets its own stream"""
+    runner = environment.runner
+    stream = runner.worker_index if isinstance(runner, WorkerRunner) else 0
+    KEYWORDS.rng = QUERIES.rng = seeded_random(KEY_SEED, stream)
+
+
+def workload_settings():
+    """Settings that reproduce this run's key sequence"""
+    return {
+        "key_distribution": KEY_DISTRIBUTION,
+        "key_seed": KEY_SEED,
+        # Worker n draws from stream n of the seed (0 for a single process)
+        "key_streams": max(LOCUST_WORKERS, 1),
+        "keywords_file": KEYWORDS_FILE,
+        "keywords": len(KEYWORDS.keys),
+        "search_queries": len(QUERIES.keys),
+        "trace_file": TRACE_FILE,
+        "description_size": DESCRIPTION_SIZE,
+        "compression": COMPRESSION,
+    }
+
+
+@events.request.add_listener
+def count_client_request(**kwargs):
+    """Count requests made by this process (worker stats are reset on every report)"""
+    _client_clock["requests"] = _client_clock.get("requests", 0) + 1
+
+
+def client_cpu_usage():
+    """CPU cost of this process since test start"""
+    cpu_seconds = time.process_time() - _client_clock["cpu"]
+    wall_seconds = time.time() - _client_clock["wall"]
+    requests_made = _client_clock["requests"]
+    return {
+        "cpu_seconds": cpu_seconds,
+        "wall_seconds": wall_seconds,
+        "requests": requests_made,
+        "cpu_ms_per_request": cpu_seconds * 1000 / requests_made if requests_made else None,
+        "cpu_utilization": cpu_seconds / wall_seconds if wall_seconds > 0 else None,
+    }
+
+
+def combine_worker_cpu(workers):
+    """Client CPU totals of a distributed run from per-worker usage"""
+    cpu_seconds = sum(w["cpu_seconds"] for w in workers.values())
+    requests_made = sum(w["requests"] for w in workers.values())
+    utilizations = [w["cpu_utilization"] for w in workers.values() if w["cpu_utilization"] is not None]
+    return {
+        "cpu_seconds": cpu_seconds,
+        "wall_seconds": max(w["wall_seconds"] for w in workers.values()),
+        "requests": requests_made,
+        "cpu_ms_per_request": cpu_seconds * 1000 / requests_made if requests_made else None,
+        # The busiest worker decides whether the client side was saturated
+        "cpu_utilization": max(utilizations) if utilizations else None,
+        "workers": workers,
+    }
+
+
+def grpc_concurrency_check(environment, peak_in_flight):
+    """Self-check: peak number of RPCs in flight at the same time against the users spawned
+    
+    peak_in_flight is summed over the workers of a distributed run. With more
+    than one user, a peak of 1 means the client serialized its calls.
+    """
+    users = _client_clock.get("users") or getattr(environment.parsed_options, "num_users", None)
+    serialized = bool(users and users > 1 and peak_in_flight <= 1)
+    print(f"gRPC concurrency check: peak in-flight calls = {peak_in_flight}, users = {users}, "
+          f"channels = {GRPC_CHANNELS}")
+    if serialized:
+        print("  WARNING: gRPC calls are not overlapping, the client is serializing requests")
+    return {"peak_in_flight": peak_in_flight, "users": users, "channels": GRPC_CHANNELS, "serialized": serialized}
+
+
+def save_client_results(environment, client_cpu, grpc_peak_in_flight=0):
+    """Save histograms, phases, workload settings and client CPU cost of the run next to Locust's CSVs
+    
+    If the client spends close to a full core, measured latencies include
+    client-side queueing and reflect the load generator, not the server.
+    gRPC runs also get the concurrency self-check (grpc_concurrency_check).
+    """
+    if client_cpu["cpu_ms_per_request"] is not None:
+        print(f"Client CPU: {client_cpu['cpu_ms_per_request']:.3f} ms per request, "
+              f"{client_cpu['cpu_utilization'] * 100:.0f}% of one core"
+              + (" (busiest worker)" if "workers" in client_cpu else ""))
+    for worker_id, usage in client_cpu.get("workers", {"local": client_cpu}).items():
+        if usage["cpu_utilization"] is not None and usage["cpu_utilization"] > CLIENT_CPU_LIMIT:
+            name = "load generator" if worker_id == "local" else f"worker {worker_id}"
+            print(f"  WARNING: {name} is CPU bound ({usage['cpu_utilization'] * 100:.0f}%), "
+                  "results reflect the client, not the server")
+    
+    if USER_CLASS in ["GrpcUser", "all"]:
+        client_cpu = {**client_cpu, "grpc_concurrency": grpc_concurrency_check(environment, grpc_peak_in_flight)}
+    
+    path = results_file(environment, "client_cpu.json")
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"user_class": USER_CLASS, **client_cpu}, f, indent=2)
+    path = results_file(environment, "workload.json")
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**workload_settings(), "response_encodings": dict(RESPONSE_ENCODINGS)}, f, indent=2)
+    path = results_file(environment, "histograms.json")
+    if path and LATENCY_HISTOGRAMS.histograms:
+        LATENCY_HISTOGRAMS.save(path)
+    path = results_file(environment, "phases.json")
+    if path and PHASE_STATS.endpoints:
+        PHASE_STATS.save(path)
+
+
+@events.init.add_listener
+def register_worker_results(environment, **kwargs):
+    """On the master, merge the client-side results every worker sends at test stop
+    
+    At the end of a headless run the master fires test_stop before it tells
+    the workers to quit, and then waits briefly for their final reports, so
+    the merged results are saved when the master process quits.
+    """
+    if not isinstance(environment.runner, MasterRunner):
+        return
+    
+    def receive_worker_results(environment, msg, **kwargs):
+        _worker_results[msg.node_id] = msg.data["client_cpu"]
+        _worker_in_flight[msg.node_id] = msg.data.get("grpc_peak_in_flight", 0)
+        LATENCY_HISTOGRAMS.merge(LatencyHistograms.from_payload(msg.data["histograms"]))
+        PHASE_STATS.merge_payload(msg.data["phases"])
+        RESPONSE_ENCODINGS.update(msg.data.get("response_encodings", {}))
+    
+    def save_merged_results(**kwargs):
+        if not _worker_results:
+            print("WARNING: no client results received from workers")
+            return
+        save_client_results(environment, combine_worker_cpu(dict(_worker_results)), sum(_worker_in_flight.values()))
+    
+    environment.runner.register_message("client_results", receive_worker_results)
+    environment.events.quit.add_listener(save_merged_results)
+
+
+@events.test_stop.add_listener
+def report_client_results(environment, **kwargs):
+    """Save this process's results, or send them to the master from a worker"""
+    if "cpu" not in _client_clock:
+        return
+    runner = environment.runner
+    if isinstance(runner, WorkerRunner):
+        runner.send_message("client_results", {
+            "client_cpu": client_cpu_usage(),
+            "histograms": LATENCY_HISTOGRAMS.to_payload(),
+            "phases": PHASE_STATS.to_payload(),
+            "response_encodings": dict(RESPONSE_ENCODINGS),
+            "grpc_peak_in_flight": GRPC_IN_FLIGHT.peak,
+        })
+    elif not isinstance(runner, MasterRunner):
+        save_client_results(environment, client_cpu_usage(), GRPC_IN_FLIGHT.peak)
 
-# gRPC server address
-GRPC_SERVER = "localhost:50051"
 
 # Select user class based on environment variable
-# Set LOCUST_USER_CLASS to "RestUser" or "GrpcUser" to test specific protocol
+# Set LOCUST_USER_CLASS to "RestUser", "FastRestUser", "Http2RestUser" or "GrpcUser" to test specific protocol
 USER_CLASS = os.getenv("LOCUST_USER_CLASS", "RestUser")
 
 
+@replayable
+class RestUserBase(User):
+    """Shared tasks and weights of the REST user classes
+    
+    Abstract: concrete classes combine it with an HTTP client user class
+    (HttpUser, FastHttpUser) so every REST client runs the same workload.
+    """
+    
+    abstract = True
+    host = REST_BASE_URL
+    wait_time = WAIT_TIME
+    # Task method for each trace operation
+    trace_methods = {
+        "list": "get_all_terms",
+        "get": "get_term_by_keyword",
+        "search": "search_terms",
+        "add": "create_term",
+    }
+    
+    def on_start(self):
+        """Called when a user starts"""
+        if SCHEDULED:
+            self.wait()  # First request also waits for its slot
+    
+    def context(self):
+        """Per-request context passed to events.request"""
+        return {"intended_start": getattr(self, "intended_start", None)}
+    
+    def replay_trace(self):
+        """Send the trace event this user was scheduled for"""
+        replay_event(self, self.trace_event, self.trace_methods)
+    
+    @task(6)
+    def get_all_terms(self):
+        """GET /terms - Light operation, returns all terms"""
+        with self.client.get("/terms", headers=REST_HEADERS, catch_response=True) as response:
+            decode_json(response)
+            count_response_encoding(response)
+            if response.status_code == 200:
+                response.success()
+            else:
+                response.failure(f"Status code: {response.status_code}")
+    
+    @task(6)
+    def get_term_by_keyword(self, keyword=None):
+        """GET /terms/{keyword} - Light operation, single term lookup"""
+        keyword = keyword or KEYWORDS.sample()
+        # Quoted for geventhttpclient, which sends the path as is ("Vertex Shader");
+        # one stats entry for all keywords, however large the key universe
+        with self.client.get(f"/terms/{quote(keyword, safe='')}", name="/terms/{keyword}",
+                             headers=REST_HEADERS, catch_response=True) as response:
+            decode_json(response)
+            count_response_encoding(response)
+            if response.status_code == 200:
+                response.success()
+            elif response.status_code == 404:
+                response.success()  # 404 is expected for some random keywords
+            else:
+                response.failure(f"Status code: {response.status_code}")
+    
+    @task(3)
+    def search_terms(self, query=None):
+        """GET /terms/search?q={query} - Medium operation, LIKE query"""
+        query = query or QUERIES.sample()
+        with self.client.get("/terms/search", params={"q": query}, name="/terms/search?q={query}",
+                             headers=REST_HEADERS, catch_response=True) as response:
+            decode_json(response)
+            count_response_encoding(response)
+            if response.status_code == 200:
+                response.success()
+            else:
+                response.failure(f"Status code: {response.status_code}")
+    
+    @task(1)
+    def create_term(self, payload=None):
+        """POST /terms - Medium operation, database write"""
+        payload = payload or new_term_payload()
+        with self.client.post("/terms", json=payload, headers=REST_HEADERS, catch_response=True) as response:
+            decode_json(response)
+            count_response_encoding(response)
+            if response.status_code == 201:
+                response.success()
+            elif response.status_code == 400:
+                # Term already exists, this is acceptable
+                response.success()
+            else:
+                response.failure(f"Status code: {response.status_code}")
+
+
 # Conditionally define user classes based on environment variable
 if USER_CLASS in ["RestUser", "all"]:
-    class RestUser(HttpUser):
-        """Locust user class for testing FastAPI REST API"""
+    class RestUser(RestUserBase, HttpUser):
+        """Locust user class for testing FastAPI REST API (requests client)
         
-        host = REST_BASE_URL
-        wait_time = between(1, 3)  # Wait 1-3 seconds between requests
+        Reports per-request phase timings (connect, TTFB, body read, JSON
+        decode) in the request context, see rest_instrumentation.
+        """
         
         def on_start(self):
             """Called when a user starts"""
-            self.keywords = SAMPLE_KEYWORDS.copy()
-            random.shuffle(self.keywords)
+            instrument_session(self.client)
+            super().on_start()
         
-        @task(6)
-        def get_all_terms(self):
-            """GET /terms - Light operation, returns all terms"""
-            with self.client.get("/terms", catch_response=True) as response:
-                if response.status_code == 200:
-                    response.success()
-                else:
-                    response.failure(f"Status code: {response.status_code}")
+        def context(self):
+            """Per-request context passed to events.request
+            
+            HttpSession asks for the context after the response arrives, so
+            the phases recorded by the response hook belong to this request.
+            """
+            context = super().context()
+            context["phases"] = pop_response_phases()
+            return context
+
+
+if USER_CLASS in ["FastRestUser", "all"]:
+    class FastRestUser(RestUserBase, FastHttpUser):
+        """Locust user class for testing FastAPI REST API (geventhttpclient client)
         
-        @task(6)
-        def get_term_by_keyword(self):
-            """GET /terms/{keyword} - Light operation, single term lookup"""
-            keyword = random.choice(self.keywords)
-            with self.client.get(f"/terms/{keyword}", catch_response=True) as response:
-                if response.status_code == 200:
-                    response.success()
-                elif response.status_code == 404:
-                    response.success()  # 404 is expected for some random keywords
-                else:
-                    response.failure(f"Status code: {response.status_code}")
+        Costs far less client CPU per request than RestUser, so the load
+        generator saturates later than the server under test.
+        """
+
+
+if USER_CLASS in ["Http2RestUser", "all"]:
+    class Http2RestUser(RestUserBase):
+        """Locust user class for testing FastAPI REST API over HTTP/2 (httpx client)
         
-        @task(3)
-        def search_terms(self):
-            """GET /terms/search?q={query} - Medium operation, LIKE query"""
-            query = random.choice(SEARCH_QUERIES)
-            with self.client.get(f"/terms/search?q={query}", catch_response=True) as response:
-                if response.status_code == 200:
-                    response.success()
-                else:
-                    response.failure(f"Status code: {response.status_code}")
+        Same JSON requests as RestUser on GrpcUser's transport: compared with
+        RestUser it shows the effect of HTTP/2, compared with GrpcUser the
+        effect of JSON vs protobuf. Users share connections like gRPC
+        channels (HTTP2_CONNECTIONS). Needs a server speaking HTTP/2 without
+        TLS, e.g. hypercorn; uvicorn only speaks HTTP/1.1.
+        """
         
-        @task(1)
-        def create_term(self):
-            """POST /terms - Medium operation, database write"""
-            # Generate unique keyword to avoid conflicts
-            unique_keyword = f"TestTerm_{random.randint(10000, 99999)}"
-            payload = {
-                "keyword": unique_keyword,
-                "description": f"Test description for {unique_keyword}"
-            }
-            with self.client.post("/terms", json=payload, catch_response=True) as response:
-                if response.status_code == 201:
-                    response.success()
-                elif response.status_code == 400:
-                    # Term already exists, this is acceptable
-                    response.success()
-                else:
-                    response.failure(f"Status code: {response.status_code}")
+        def on_start(self):
+            """Called when a user starts"""
+            if HTTP2_CONNECTIONS == PER_USER:
+                self.connection = Http2Connection(self.host)
+            else:
+                self.connection = get_http2_connection_pool(self.host).next()
+            self.client = Http2Session(self.connection, self.environment.events.request, user=self)
+            super().on_start()
+        
+        def on_stop(self):
+            """Called when a user stops"""
+            # Shared connections stay open for the other users
+            if HTTP2_CONNECTIONS == PER_USER and hasattr(self, 'connection'):
+                self.connection.close()
+    
+    
+    @events.quitting.add_listener
+    def close_http2_connection_pool(environment, **kwargs):
+        """Close shared HTTP/2 connections when Locust exits"""
+        if _http2_connection_pool is not None:
+            _http2_connection_pool.close()
 
 
 if USER_CLASS in ["GrpcUser", "all"]:
+    @replayable
     class GrpcUser(User):
         """Locust user class for testing gRPC API"""
         
-        wait_time = between(1, 3)  # Wait 1-3 seconds between requests
+        wait_time = WAIT_TIME
+        # Task method for each trace operation
+        trace_methods = {
+            "list": "list_terms",
+            "get": "get_term",
+            "search": "search_terms",
+            "add": "add_term",
+        }
         
         def on_start(self):
             """Called when a user starts"""
-            # Create gRPC channel and stub
-            self.channel = grpc.insecure_channel(GRPC_SERVER)
-            self.stub = GlossaryServiceStub(self.channel)
-            self.keywords = SAMPLE_KEYWORDS.copy()
-            random.shuffle(self.keywords)
+            # Create or borrow a gRPC channel and build a stub on it; the
+            # instrumented view records per-call phase timings and sizes
+            if GRPC_CHANNELS == PER_USER:
+                self.pooled = PooledChannel(
+                    GRPC_SERVER,
+                    channel_options(GRPC_KEEPALIVE_MS),
+                    GRPC_MAX_CONCURRENT_STREAMS,
+                )
+            else:
+                self.pooled = get_grpc_channel_pool().next()
+            self.stub = GlossaryServiceStub(instrument_channel(self.pooled.channel))
+            if SCHEDULED:
+                # Connect with an unreported call before taking a slot, so
+                # connection setup is not charged to the first scheduled request.
+                # (grpc.channel_ready_future is avoided: its connectivity polling
+                # stalls the gevent loop in 200 ms steps.)
+                try:
+                    self.stub.ListTerms(ListTermsRequest(), timeout=10)
+                except grpc.RpcError:
+                    pass
+                self.wait()  # First request also waits for its slot
+        
+        def context(self):
+            """Per-request context passed to events.request"""
+            return {"intended_start": getattr(self, "intended_start", None)}
+        
+        def replay_trace(self):
+            """Send the trace event this user was scheduled for"""
+            replay_event(self, self.trace_event, self.trace_methods)
         
         def on_stop(self):
             """Called when a user stops"""
-            if hasattr(self, 'channel'):
-                self.channel.close()
+            # Shared channels stay open for the other users
+            if GRPC_CHANNELS == PER_USER and hasattr(self, 'pooled'):
+                self.pooled.close()
+        
+        def _call(self, name, method, request, accepted_codes=()):
+            """Invoke a unary RPC and report it to Locust via events.request"""
+            context = self.context()
+            start_time = time.perf_counter()
+            exception = None
+            try:
+                with self.pooled.stream_slot(), GRPC_IN_FLIGHT:
+                    method(request, timeout=10, compression=GRPC_COMPRESSION)
+            except grpc.RpcError as e:
+                # Some status codes are expected outcomes, not failures
+                if e.code() not in accepted_codes:
+                    exception = e
+            response_time = (time.perf_counter() - start_time) * 1000
+            phases = last_call_phases()
+            context["phases"] = phases
+            events.request.fire(
+                request_type="gRPC",
+                name=name,
+                response_time=response_time,
+                response_length=phases["response_bytes"] if phases else 0,
+                exception=exception,
+                context=context,
+            )
         
         @task(6)
         def list_terms(self):
             """ListTerms - Light operation, returns all terms"""
-            start_time = time.time()
-            try:
-                request = ListTermsRequest()
-                response = self.stub.ListTerms(request, timeout=10)
-                response_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="gRPC",
-                    name="ListTerms",
-                    response_time=response_time,
-                    response_length=0,
-                    exception=None,
-                )
-            except grpc.RpcError as e:
-                response_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="gRPC",
-                    name="ListTerms",
-                    response_time=response_time,
-                    response_length=0,
-                    exception=e,
-                )
+            self._call("ListTerms", self.stub.ListTerms, ListTermsRequest())
         
         @task(6)
-        def get_term(self):
+        def get_term(self, keyword=None):
             """GetTerm - Light operation, single term lookup"""
-            start_time = time.time()
-            try:
-                keyword = random.choice(self.keywords)
-                request = GetTermRequest(keyword=keyword)
-                response = self.stub.GetTerm(request, timeout=10)
-                response_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="gRPC",
-                    name="GetTerm",
-                    response_time=response_time,
-                    response_length=0,
-                    exception=None,
-                )
-            except grpc.RpcError as e:
-                response_time = int((time.time() - start_time) * 1000)
-                # NOT_FOUND is acceptable for random keywords
-                if e.code() == grpc.StatusCode.NOT_FOUND:
-                    events.request.fire(
-                        request_type="gRPC",
-                        name="GetTerm",
-                        response_time=response_time,
-                        response_length=0,
-                        exception=None,
-                    )
-                else:
-                    events.request.fire(
-                        request_type="gRPC",
-                        name="GetTerm",
-                        response_time=response_time,
-                        response_length=0,
-                        exception=e,
-                    )
+            keyword = keyword or KEYWORDS.sample()
+            # NOT_FOUND is acceptable for random keywords
+            self._call(
+                "GetTerm",
+                self.stub.GetTerm,
+                GetTermRequest(keyword=keyword),
+                accepted_codes=(grpc.StatusCode.NOT_FOUND,),
+            )
         
         @task(3)
-        def search_terms(self):
+        def search_terms(self, query=None):
             """SearchTerms - Medium operation, LIKE query"""
-            start_time = time.time()
-            try:
-                query = random.choice(SEARCH_QUERIES)
-                request = SearchTermsRequest(query=query)
-                response = self.stub.SearchTerms(request, timeout=10)
-                response_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="gRPC",
-                    name="SearchTerms",
-                    response_time=response_time,
-                    response_length=0,
-                    exception=None,
-                )
-            except grpc.RpcError as e:
-                response_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="gRPC",
-                    name="SearchTerms",
-                    response_time=response_time,
-                    response_length=0,
-                    exception=e,
-                )
+            query = query or QUERIES.sample()
+            self._call("SearchTerms", self.stub.SearchTerms, SearchTermsRequest(query=query))
         
         @task(1)
-        def add_term(self):
+        def add_term(self, payload=None):
             """AddTerm - Medium operation, database write"""
-            start_time = time.time()
-            try:
-                # Generate unique keyword to avoid conflicts
-                unique_keyword = f"TestTerm_{random.randint(10000, 99999)}"
-                request = AddTermRequest(
-                    keyword=unique_keyword,
-                    description=f"Test description for {unique_keyword}"
-                )
-                response = self.stub.AddTerm(request, timeout=10)
-                response_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="gRPC",
-                    name="AddTerm",
-                    response_time=response_time,
-                    response_length=0,
-                    exception=None,
-                )
-            except grpc.RpcError as e:
-                response_time = int((time.time() - start_time) * 1000)
-                # ALREADY_EXISTS is acceptable
-                if e.code() == grpc.StatusCode.ALREADY_EXISTS:
-                    events.request.fire(
-                        request_type="gRPC",
-                        name="AddTerm",
-                        response_time=response_time,
-                        response_length=0,
-                        exception=None,
-                    )
-                else:
-                    events.request.fire(
-                        request_type="gRPC",
-                        name="AddTerm",
-                        response_time=response_time,
-                        response_length=0,
-                        exception=e,
-                    )
+            payload = payload or new_term_payload()
+            request = AddTermRequest(keyword=payload["keyword"], description=payload.get("description", ""))
+            # ALREADY_EXISTS is acceptable
+            self._call(
+                "AddTerm",
+                self.stub.AddTerm,
+                request,
+                accepted_codes=(grpc.StatusCode.ALREADY_EXISTS,),
+            )
+    
+    
+    @events.quitting.add_listener
+    def close_grpc_channel_pool(environment, **kwargs):
+        """Close shared channels when Locust exits"""
+        if _grpc_channel_pool is not None:
+            _grpc_channel_pool.close()
+
+
+if OPEN_LOOP:
+    class OpenLoopShape(ArrivalRateShape):
+        """Constant or stepped arrival rate from LOCUST_RPS_PLAN"""
+        
+        steps = RATE_STEPS
+        # Concurrency budget: enough users to keep the rate when responses slow down
+        users = int(os.getenv("LOCUST_OPEN_LOOP_USERS") or concurrency_budget(RATE_STEPS))
+
+
+if TRACE_REPLAY:
+    class TraceShape(TraceReplayShape):
+        """Fixed user pool for the length of the trace at replay speed"""
+        
+        users = int(os.getenv("LOCUST_TRACE_USERS", "100"))
+        duration = trace_duration(TRACE_FILE) / TRACE_SPEEDUP
+    
+    
+    @events.test_start.add_listener
+    def partition_trace(environment, **kwargs):
+        """Give each worker of a distributed run every N-th event of the trace"""
+        if isinstance(environment.runner, WorkerRunner) and LOCUST_WORKERS > 1:
+            TRACE.partition(environment.runner.worker_index, LOCUST_WORKERS)
+    
+    
+    @events.test_stop.add_listener
+    def report_trace_progress(environment, **kwargs):
+        """Self-check: how much of the trace this process sent"""
+        if isinstance(environment.runner, MasterRunner):
+            return
+        print(f"Trace replay: {TRACE.dispatched} events dispatched"
+              + (f", {TRACE.invalid} invalid lines skipped" if TRACE.invalid else ""))
+
+
+if SCHEDULED:
+    @events.init.add_listener
+    def enable_intended_start_latency(environment, **kwargs):
+        """Report latency from intended start times (no coordinated omission)"""
+        measure_from_intended_start(environment.events.request)
+
 
+if CONVERGE:
+    # Closed batches of this process; the master (or single process) decides
+    CONVERGENCE_BATCHES = BatchRecorder()
+    CONVERGENCE = ConvergenceMonitor(CONVERGE_TOLERANCE, CONVERGE_WINDOW, CONVERGE_MIN_TIME)
+    _convergence_watcher = {}
+    
+    
+    @events.request.add_listener
+    def record_convergence_batch(response_time, **kwargs):
+        """Count every request and its latency into the current batch"""
+        CONVERGENCE_BATCHES.record(time.time(), response_time)
+    
+    
+    @events.init.add_listener
+    def register_convergence_batches(environment, **kwargs):
+        """On the master, merge the batches the workers send"""
+        if isinstance(environment.runner, MasterRunner):
+            environment.runner.register_message(
+                "convergence_batches",
+                lambda environment, msg, **kw: CONVERGENCE.add_batches(BatchRecorder.from_payload(msg.data)),
+            )
+    
+    
+    def watch_convergence(environment):
+        """Every batch: hand closed batches on (worker) or check convergence and stop the run"""
+        runner = environment.runner
+        while True:
+            gevent.sleep(CONVERGENCE_BATCHES.batch_seconds)
+            now = time.time()
+            closed = CONVERGENCE_BATCHES.pop_closed(now)
+            if isinstance(runner, WorkerRunner):
+                if closed:
+                    runner.send_message("convergence_batches", BatchRecorder.to_payload(closed))
+                continue
+            CONVERGENCE.add_batches(closed)
+            # Worker batches arrive up to one batch late
+            if CONVERGENCE.update(now, lag=2 if isinstance(runner, MasterRunner) else 0):
+                estimates = CONVERGENCE.estimates
+                print(f"Converged after {now - CONVERGENCE.start_time:.0f}s: "
+                      f"p95 {estimates['p95_ms']:.2f} ms ±{estimates['p95_relative_half_width'] * 100:.1f}%, "
+                      f"{estimates['rps']:.1f} rps ±{estimates['rps_relative_half_width'] * 100:.1f}%")
+                # quit() fires test_stop, which kills this greenlet: run it in its own
+                gevent.spawn(runner.quit)
+                return
+    
+    
+    @events.test_start.add_listener
+    def start_convergence_watch(environment, **kwargs):
+        CONVERGENCE_BATCHES.batches.clear()
+        CONVERGENCE.start(time.time())
+        _convergence_watcher["greenlet"] = gevent.spawn(watch_convergence, environment)
+    
+    
+    @events.spawning_complete.add_listener
+    def restart_convergence_measurement(user_count, **kwargs):
+        """Measure only at the final load: from the end of ramp-up or of the last shape step"""
+        CONVERGENCE.restart_measurement(time.time())
+    
+    
+    @events.test_stop.add_listener
+    def save_convergence_state(environment, **kwargs):
+        """Write the actual duration and convergence state next to the results"""
+        watcher = _convergence_watcher.pop("greenlet", None)
+        if watcher is not None:
+            watcher.kill(block=False)
+        if isinstance(environment.runner, WorkerRunner) or CONVERGENCE.start_time is None:
+            return
+        state = CONVERGENCE.state(time.time())
+        if not state["stopped_early"]:
+            print(f"Not converged within {state['duration_s']:.0f}s (tolerance ±{CONVERGE_TOLERANCE * 100:g}%)")
+        path = results_file(environment, "convergence.json")
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Network condition emulator: an asyncio TCP proxy with latency, bandwidth and loss
+
+Client and servers share one machine, so every request crosses loopback
+with no delay and HTTP/1.1 vs HTTP/2 differences (connection reuse, header
+size, multiplexing, head-of-line blocking) barely show. The emulator
+listens on its own ports, forwards to the servers and shapes each
+direction (up = client to server, down = server to client) like a link:
+
+- bandwidth: chunks queue behind each other on a link shared by all
+  connections of the route, taking size / bandwidth to transmit;
+- latency and jitter: one-way propagation delay, normally distributed
+  jitter on top (never negative);
+- loss: each TCP segment (MSS bytes) of a chunk is lost with the given
+  probability, which stalls the chunk by a retransmission timeout.
+
+Chunks of one connection are delivered in order, so a stall delays
+everything behind it on that connection, as it does in TCP. Bytes, chunks
+and stalls per route and direction are counted and saved with the results.
+
+Usage (standalone, for manual Locust runs with LOCUST_REST_URL and
+LOCUST_GRPC_TARGET pointed at the emulator ports):
+    python network_emulator.py --profile mobile
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+from contextlib import contextmanager
+
+# One-way link parameters per direction; "direct" only counts the bytes
+PROFILES = {
+    "direct": {"up": {}, "down": {}},
+    "lan": {
+        "up": {"latency_ms": 0.25, "jitter_ms": 0.05, "bandwidth_mbps": 1000, "loss": 0.0},
+        "down": {"latency_ms": 0.25, "jitter_ms": 0.05, "bandwidth_mbps": 1000, "loss": 0.0},
+    },
+    "cross-region": {
+        "up": {"latency_ms": 35, "jitter_ms": 3, "bandwidth_mbps": 200, "loss": 0.0005},
+        "down": {"latency_ms": 35, "jitter_ms": 3, "bandwidth_mbps": 200, "loss": 0.0005},
+    },
+    "mobile": {
+        "up": {"latency_ms": 40, "jitter_ms": 15, "bandwidth_mbps": 5, "loss": 0.005},
+        "down": {"latency_ms": 40, "jitter_ms": 15, "bandwidth_mbps": 20, "loss": 0.005},
+    },
+}
+
+# Profile that only counts the bytes, used by run_tests.py for payload runs
+# without a network profile. The proxy still adds a hop to every request, so
+# latency and CPU of such runs are not comparable with runs made without it
+BYTE_COUNTING_PROFILE = "direct"
+
+LINK_DEFAULTS = {"latency_ms": 0.0, "jitter_ms": 0.0, "bandwidth_mbps": 0, "loss": 0.0}
+
+# Emulator ports in front of the REST and gRPC servers
+ROUTES = {
+    "rest": (18000, "localhost", 8000),
+    "grpc": (15051, "localhost", 50051),
+}
+
+STATS_FILE = "network_emulator.json"
+
+CHUNK_SIZE = 64 * 1024
+MSS = 1460
+# Linux minimum retransmission timeout
+RTO_MS = 200.0
+# Chunks buffered per connection direction before the sender is held back
+QUEUE_CHUNKS = 64
+
+
+def resolve_profile(profile):
+    """Profile {"up": {...}, "down": {...}} from a name or a dict; raises ValueError if invalid"""
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown network profile {profile!r}, expected one of {', '.join(PROFILES)}")
+        profile = PROFILES[profile]
+    resolved = {}
+    for direction in ("up", "down"):
+        link = {**LINK_DEFAULTS, **profile.get(direction, {})}
+        unknown = set(link) - set(LINK_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown link parameters: {', '.join(sorted(unknown))}")
+        if min(link.values()) < 0 or link["loss"] >= 1:
+            raise ValueError(f"Invalid {direction} link: {link}")
+        resolved[direction] = link
+    return resolved
+
+
+def profile_name(profile):
+    return profile if isinstance(profile, str) else "custom"
+
+
+class Link:
+    """One direction of a route: transmission queue, propagation delay and loss"""
+
+    def __init__(self, latency_ms, jitter_ms, bandwidth_mbps, loss, rng):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.bytes_per_second = bandwidth_mbps * 1e6 / 8
+        self.loss = loss
+        self.rng = rng
+        self.free_at = 0.0
+        self.bytes = 0
+        self.chunks = 0
+        self.stalls = 0
+
+    def delivery_time(self, size, now):
+        """When a chunk of size bytes sent at now reaches the other side"""
+        self.bytes += size
+        self.chunks += 1
+        start = max(now, self.free_at)
+        self.free_at = start + (size / self.bytes_per_second if self.bytes_per_second else 0.0)
+        delay = self.latency + (max(0.0, self.rng.gauss(0.0, self.jitter)) if self.jitter else 0.0)
+        if self.loss:
+            segments = math.ceil(size / MSS)
+            if self.rng.random() < 1 - (1 - self.loss) ** segments:
+                self.stalls += 1
+                delay += RTO_MS / 1000
+        return self.free_at + delay
+
+    def stats(self):
+        return {"bytes": self.bytes, "chunks": self.chunks, "stalls": self.stalls}
+
+
+class Route:
+    """Listening port forwarded to a server through an up and a down link"""
+
+    def __init__(self, name, listen_port, target_host, target_port, profile, rng):
+        self.name = name
+        self.listen_port = listen_port
+        self.target_host = target_host
+        self.target_port = target_port
+        self.up = Link(rng=rng, **profile["up"])
+        self.down = Link(rng=rng, **profile["down"])
+        self.connections = 0
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            server_reader, server_writer = await asyncio.open_connection(self.target_host, self.target_port)
+        except OSError:
+            client_writer.close()
+            return
+        self.connections += 1
+        try:
+            await asyncio.gather(
+                pump(client_reader, server_writer, self.up),
+                pump(server_reader, client_writer, self.down),
+            )
+        except (OSError, asyncio.CancelledError):
+            # Reset by a peer, or the emulator is stopping
+            pass
+        finally:
+            for writer in (client_writer, server_writer):
+                writer.close()
+
+    def stats(self):
+        return {
+            "listen_port": self.listen_port,
+            "target": f"{self.target_host}:{self.target_port}",
+            "connections": self.connections,
+            "up": self.up.stats(),
+            "down": self.down.stats(),
+        }
+
+
+async def pump(reader, writer, link):
+    """Forward one direction of a connection, delivering each chunk at its link delivery time"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(QUEUE_CHUNKS)
+
+    async def deliver():
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            at, data = item
+            delay = at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    delivery = asyncio.create_task(deliver())
+    last = 0.0
+    try:
+        while True:
+            data = await reader.read(CHUNK_SIZE)
+            if not data:
+                break
+            # In order: a stalled chunk holds back the rest of the connection
+            last = max(link.delivery_time(len(data), loop.time()), last)
+            await queue.put((last, data))
+        await queue.put(None)
+        await delivery
+    finally:
+        delivery.cancel()
+
+
+class NetworkEmulator:
+    """Proxies the REST and gRPC servers through emulated links"""
+
+    def __init__(self, profile, routes=None, seed=None):
+        self.name = profile_name(profile)
+        self.profile = resolve_profile(profile)
+        self.routes_config = routes or ROUTES
+        self.seed = seed
+        self.routes = {}
+
+    def endpoint(self, name):
+        """host:port the clients should use instead of a server"""
+        return f"localhost:{self.routes_config[name][0]}"
+
+    async def _serve(self, started, stop):
+        rng = random.Random(self.seed)
+        self.routes = {
+            name: Route(name, listen_port, host, port, self.profile, rng)
+            for name, (listen_port, host, port) in self.routes_config.items()
+        }
+        servers = [
+            await asyncio.start_server(route.handle, "localhost", route.listen_port)
+            for route in self.routes.values()
+        ]
+        started.set()
+        await stop.wait()
+        for server in servers:
+            server.close()
+        # Connections still open (keep-alive, gRPC channels) end with the emulator
+        connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "profile": self.name,
+            "links": self.profile,
+            "routes": {name: route.stats() for name, route in self.routes.items()},
+        }
+
+    @contextmanager
+    def running(self, output_dir=None):
+        """Run the proxy in a background thread while the block runs; saves stats into output_dir"""
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        stop = asyncio.Event()
+        failure = []
+
+        def run():
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self._serve(started, stop))
+            except OSError as e:
+                failure.append(e)
+                started.set()
+            finally:
+                loop.close()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        started.wait()
+        if failure:
+            raise failure[0]
+        try:
+            yield self
+        finally:
+            loop.call_soon_threadsafe(stop.set)
+            thread.join()
+            if output_dir:
+                with open(os.path.join(output_dir, STATS_FILE), "w", encoding="utf-8") as f:
+                    json.dump(self.stats(), f, indent=2)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="TCP proxy emulating network latency, bandwidth and loss")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="lan", help="Network profile")
+    parser.add_argument("--seed", type=int, help="Seed of jitter and loss")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    emulator = NetworkEmulator(args.profile, seed=args.seed)
+    for name, (listen_port, host, port) in ROUTES.items():
+        print(f"{name}: localhost:{listen_port} -> {host}:{port} ({args.profile})")
+    with emulator.running():
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    print(json.dumps(emulator.stats()["routes"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
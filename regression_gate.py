@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Performance regression gate
+
+Compares the latest run of a scenario against its baseline in the results
+history (results_store.py) endpoint by endpoint, separately for every user
+class (RestUser, FastRestUser, Http2RestUser and GrpcUser measure different
+client stacks), and exits non-zero when anything got worse than allowed:
+
+- p99 latency more than p99_increase above the baseline (default +10%);
+- RPS more than rps_drop below the baseline (default -5%);
+- error rate above max_error_rate (default 0.1%, absolute).
+
+The baseline is the set of runs pinned with the "pin" command, or else the
+runs before the checked one. With several baseline runs their spread is
+noise: the limit is widened by NOISE_SIGMAS standard deviations, so a
+scenario that varies a lot between identical runs does not fail on noise.
+p99 of endpoints with fewer than MIN_REQUESTS requests is not checked, it
+is little more than the slowest request.
+
+Thresholds can be changed per endpoint with a JSON file:
+
+    {"default": {"p99_increase": 0.10, "rps_drop": 0.05, "max_error_rate": 0.001},
+     "endpoints": {"POST /terms": {"p99_increase": 0.25}}}
+
+Usage:
+    python regression_gate.py pin --scenario light_load --runs 3
+    python regression_gate.py check --scenario light_load
+    python regression_gate.py check --scenario light_load --user-class FastRestUser
+"""
+import argparse
+import json
+import statistics
+import sys
+
+from results_store import STORE_FILE, ResultsStore
+
+DEFAULT_THRESHOLDS = {
+    "p99_increase": 0.10,
+    "rps_drop": 0.05,
+    "max_error_rate": 0.001,
+}
+
+NOISE_SIGMAS = 2.0
+
+MIN_REQUESTS = 100
+
+DEFAULT_BASELINE_RUNS = 5
+
+PROTOCOLS = ("rest", "grpc")
+
+# Exit codes
+PASSED = 0
+REGRESSED = 1
+NO_DATA = 2
+
+
+def load_thresholds(source=None, overrides=None):
+    """Thresholds {"default": {...}, "endpoints": {endpoint: {...}}} from a JSON file path or dict
+
+    A flat dict of threshold values applies to every endpoint; overrides
+    (e.g. from the command line) replace the defaults.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            source = json.load(f)
+    source = source or {}
+    if "default" not in source and "endpoints" not in source:
+        source = {"default": source}
+    default = {**DEFAULT_THRESHOLDS, **source.get("default", {}), **(overrides or {})}
+    unknown = set(default) - set(DEFAULT_THRESHOLDS)
+    if unknown:
+        raise ValueError(f"Unknown thresholds: {', '.join(sorted(unknown))}")
+    return {"default": default, "endpoints": source.get("endpoints", {})}
+
+
+def endpoint_thresholds(thresholds, endpoint):
+    return {**thresholds["default"], **thresholds["endpoints"].get(endpoint, {})}
+
+
+def error_rate(stats):
+    return stats["failures"] / stats["requests"] if stats["requests"] else 0.0
+
+
+def baseline_band(values):
+    """(mean, standard deviation) of a metric over the baseline runs; no spread for one run"""
+    mean = statistics.fmean(values)
+    return mean, statistics.stdev(values) if len(values) > 1 else 0.0
+
+
+def compare_endpoint(endpoint, candidate, baseline, limits):
+    """Check rows (endpoint, metric, baseline, candidate, limit, status) of one endpoint
+
+    candidate is the endpoint's stats in the checked run or None if it
+    disappeared; baseline is its stats in each baseline run.
+    """
+    if candidate is None:
+        return [(endpoint, "requests", statistics.fmean(s["requests"] for s in baseline), 0, None, "FAIL")]
+    checks = []
+
+    p99_values = [s["p99_ms"] for s in baseline if s["p99_ms"] is not None]
+    if p99_values and candidate["p99_ms"] is not None:
+        mean, spread = baseline_band(p99_values)
+        limit = mean * (1 + limits["p99_increase"]) + NOISE_SIGMAS * spread
+        if candidate["requests"] < MIN_REQUESTS:
+            status = "SKIP"
+        else:
+            status = "FAIL" if candidate["p99_ms"] > limit else "PASS"
+        checks.append((endpoint, "p99 ms", mean, candidate["p99_ms"], limit, status))
+
+    rps_values = [s["rps"] for s in baseline if s["rps"] is not None]
+    if rps_values and candidate["rps"] is not None:
+        mean, spread = baseline_band(rps_values)
+        limit = max(0.0, mean * (1 - limits["rps_drop"]) - NOISE_SIGMAS * spread)
+        checks.append((endpoint, "rps", mean, candidate["rps"], limit,
+                       "FAIL" if candidate["rps"] < limit else "PASS"))
+
+    rate = error_rate(candidate)
+    checks.append((endpoint, "error %", statistics.fmean(error_rate(s) for s in baseline) * 100, rate * 100,
+                   limits["max_error_rate"] * 100, "FAIL" if rate > limits["max_error_rate"] else "PASS"))
+    return checks
+
+
+def check_user_class(store, scenario, user_class, thresholds, baseline_runs=DEFAULT_BASELINE_RUNS):
+    """Compare the latest run of a scenario and user class with its baseline
+
+    Returns (candidate run, baseline runs, check rows), or None when there is
+    no run to check or nothing to compare it with.
+    """
+    latest = store.latest_runs(scenario, user_class, 1)
+    if not latest:
+        return None
+    candidate_id = latest[0]
+    baseline_ids = [run_id for run_id in store.baseline_runs(scenario, user_class) if run_id != candidate_id]
+    if not baseline_ids:
+        baseline_ids = store.latest_runs(scenario, user_class, baseline_runs, before=candidate_id)
+    if not baseline_ids:
+        return None
+
+    stats = store.endpoint_stats([candidate_id, *baseline_ids])
+    candidate = stats[candidate_id]
+    baseline_endpoints = sorted({endpoint for run_id in baseline_ids for endpoint in stats[run_id]},
+                                key=lambda endpoint: (endpoint != "Aggregated", endpoint))
+    rows = []
+    for endpoint in baseline_endpoints:
+        baseline = [stats[run_id][endpoint] for run_id in baseline_ids if endpoint in stats[run_id]]
+        rows += compare_endpoint(endpoint, candidate.get(endpoint), baseline,
+                                 endpoint_thresholds(thresholds, endpoint))
+    return store.runs([candidate_id])[0], store.runs(baseline_ids), rows
+
+
+def format_checks(scenario, candidate, baseline, rows):
+    """Compact pass/fail table of one scenario and user class"""
+    commits = sorted({(run["git_commit"] or "unknown")[:8] for run in baseline})
+    lines = [
+        f"{scenario} {candidate['protocol'].upper()} ({candidate['user_class']}) "
+        f"at {(candidate['git_commit'] or 'unknown')[:8]}"
+        f"{'*' if candidate['git_dirty'] else ''} vs baseline of {len(baseline)} run(s) at {', '.join(commits)}",
+        f"  {'endpoint':<28}  {'metric':<8}  {'baseline':>9}  {'current':>9}  {'change':>8}  {'limit':>9}  result",
+    ]
+    for endpoint, metric, base, current, limit, status in rows:
+        change = f"{(current - base) / base * 100:+.1f}%" if base else ""
+        limit_text = "" if limit is None else f"{limit:.2f}"
+        lines.append(f"  {endpoint[:28]:<28}  {metric:<8}  {base:>9.2f}  {current:>9.2f}  {change:>8}  "
+                     f"{limit_text:>9}  {status}")
+    return "\n".join(lines)
+
+
+def run_gate(store, scenarios, thresholds, user_classes=None, protocol=None, baseline_runs=DEFAULT_BASELINE_RUNS,
+             since=None):
+    """Check every scenario and user class, print the tables; returns the exit code
+
+    user_classes defaults to every user class stored for a scenario (of
+    protocol, if given). With since (a timestamp), a latest run started
+    before it fails the gate: the run expected since then is missing.
+    """
+    checked = 0
+    failed = 0
+    for scenario in scenarios:
+        for user_class in user_classes or store.user_classes(scenario, protocol):
+            result = check_user_class(store, scenario, user_class, thresholds, baseline_runs)
+            if result is None:
+                print(f"{scenario} {user_class}: no run or no baseline to compare with\n")
+                continue
+            candidate, baseline, rows = result
+            print(format_checks(scenario, candidate, baseline, rows) + "\n")
+            if since is not None and candidate["started_at"] < since:
+                print(f"{scenario} {user_class}: FAIL, the latest stored run is older than this check, "
+                      "the run made for it is missing\n")
+                failed += 1
+            checked += 1
+            failed += sum(1 for row in rows if row[-1] == "FAIL")
+    if failed:
+        print(f"REGRESSION: {failed} check(s) failed")
+        return REGRESSED
+    if not checked:
+        print("Nothing checked")
+        return NO_DATA
+    print("No regressions")
+    return PASSED
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Fail when a run regressed against its baseline")
+    parser.add_argument("--store", default=STORE_FILE, help=f"SQLite results history (default: {STORE_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pin = commands.add_parser("pin", help="Pin the latest runs of a scenario as its baseline")
+    pin.add_argument("--scenario", required=True, action="append", help="Scenario (test name), repeatable")
+    pin.add_argument("--protocol", choices=PROTOCOLS, help="Only this protocol")
+    pin.add_argument("--user-class", action="append", help="Only this user class, repeatable")
+    pin.add_argument("--runs", type=int, default=1, help="Number of latest runs to pin (more runs give noise bands)")
+
+    check = commands.add_parser("check", help="Compare the latest run of a scenario with its baseline")
+    check.add_argument("--scenario", required=True, action="append", help="Scenario (test name), repeatable")
+    check.add_argument("--protocol", choices=PROTOCOLS, help="Only this protocol")
+    check.add_argument("--user-class", action="append", help="Only this user class, repeatable")
+    check.add_argument("--thresholds", help="JSON file with default and per-endpoint thresholds")
+    check.add_argument("--max-p99-increase", type=float, help="Allowed relative p99 increase (default: 0.10)")
+    check.add_argument("--max-rps-drop", type=float, help="Allowed relative RPS drop (default: 0.05)")
+    check.add_argument("--max-error-rate", type=float, help="Allowed error rate (default: 0.001)")
+    check.add_argument("--baseline-runs", type=int, default=DEFAULT_BASELINE_RUNS,
+                       help="Runs before the checked one used as baseline when none is pinned")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    with ResultsStore(args.store) as store:
+        if args.command == "pin":
+            for scenario in args.scenario:
+                for user_class in args.user_class or store.user_classes(scenario, args.protocol):
+                    run_ids = store.latest_runs(scenario, user_class, args.runs)
+                    if run_ids:
+                        store.pin_baseline(scenario, user_class, run_ids)
+                        print(f"{scenario} {user_class}: pinned {len(run_ids)} run(s) as baseline")
+                    else:
+                        print(f"{scenario} {user_class}: no runs to pin")
+            return PASSED
+        overrides = {
+            key: value for key, value in (
+                ("p99_increase", args.max_p99_increase),
+                ("rps_drop", args.max_rps_drop),
+                ("max_error_rate", args.max_error_rate),
+            ) if value is not None
+        }
+        thresholds = load_thresholds(args.thresholds, overrides)
+        return run_gate(store, args.scenario, thresholds, args.user_class, args.protocol, args.baseline_runs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
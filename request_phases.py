@@ -0,0 +1,77 @@
+"""
+Per-endpoint aggregation of request phase timings and payload sizes
+
+User classes attach a dict of phases to each request's context under
+"phases" (e.g. {"serialize_ms": 0.01, "response_bytes": 412}; boolean
+flags such as connection_reused average to the fraction of requests); the
+locustfile feeds them into PhaseStats, which keeps running sums per endpoint
+so that memory does not grow with run length. Sums and counts are mergeable
+across workers and runs; means are derived when saving.
+"""
+import json
+
+
+class PhaseStats:
+    """Running sums of phase values per endpoint ("<request type> <name>")"""
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def record(self, request_type, name, phases):
+        key = f"{request_type} {name}"
+        entry = self.endpoints.get(key)
+        if entry is None:
+            entry = self.endpoints[key] = {"count": 0, "sums": {}, "max": {}}
+        entry["count"] += 1
+        for phase, value in phases.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                # Flags are counted as occurrences
+                entry["sums"][phase] = entry["sums"].get(phase, 0) + int(value)
+                continue
+            entry["sums"][phase] = entry["sums"].get(phase, 0) + value
+            entry["max"][phase] = max(entry["max"].get(phase, value), value)
+
+    def merge_payload(self, payload):
+        """Add sums from another PhaseStats payload"""
+        for key, other in payload.items():
+            entry = self.endpoints.setdefault(key, {"count": 0, "sums": {}, "max": {}})
+            entry["count"] += other["count"]
+            for phase, value in other["sums"].items():
+                entry["sums"][phase] = entry["sums"].get(phase, 0) + value
+            for phase, value in other["max"].items():
+                entry["max"][phase] = max(entry["max"].get(phase, value), value)
+
+    def to_payload(self):
+        return self.endpoints
+
+    def means(self):
+        """Mean value of every phase per endpoint"""
+        return {
+            key: {phase: total / entry["count"] for phase, total in entry["sums"].items()}
+            for key, entry in self.endpoints.items()
+            if entry["count"]
+        }
+
+    def overall(self):
+        """Request-weighted mean of every phase across all endpoints"""
+        count = sum(entry["count"] for entry in self.endpoints.values())
+        if not count:
+            return {}
+        sums = {}
+        for entry in self.endpoints.values():
+            for phase, total in entry["sums"].items():
+                sums[phase] = sums.get(phase, 0) + total
+        return {phase: total / count for phase, total in sums.items()}
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"endpoints": self.endpoints, "means": self.means()}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        stats = cls()
+        with open(path, encoding="utf-8") as f:
+            stats.merge_payload(json.load(f)["endpoints"])
+        return stats
@@ -0,0 +1,129 @@
+"""
+REST client instrumentation: per-request phase timings for requests sessions
+
+instrument_session() hooks a requests.Session (Locust's HttpSession) so that
+every request yields these phases (milliseconds / bytes):
+
+- connection_reused: True when no new TCP connection was opened
+- connect_ms: TCP connection setup (0 when the connection was reused)
+- ttfb_ms: from the request being sent on an open connection until the
+  response headers are parsed (network both ways + server processing)
+- body_read_ms: reading the response body after the headers
+- decode_ms: JSON decoding of the body, added by decode_json()
+- request_bytes / response_bytes: request and response body sizes
+
+Connection setup is timed by urllib3 connection and pool subclasses installed
+into the session's pool manager (the pool resets the timing when a request
+starts); headers and body are timed from a "response" hook, which requests
+runs before it reads the body. Timings are stored greenlet-locally (threading.local is patched by gevent under Locust).
+"""
+import threading
+import time
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_local = threading.local()
+
+
+def _record_connect(seconds):
+    _local.connect_ms = getattr(_local, "connect_ms", 0.0) + seconds * 1000
+    _local.connected = True
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+def _start_request():
+    # A connect that failed without a response must not be charged to the next request
+    _local.connect_ms = 0.0
+    _local.connected = False
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+    def urlopen(self, *args, **kwargs):
+        _start_request()
+        return super().urlopen(*args, **kwargs)
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+    def urlopen(self, *args, **kwargs):
+        _start_request()
+        return super().urlopen(*args, **kwargs)
+
+
+def _record_response(response, *args, **kwargs):
+    """requests "response" hook: runs after the headers, before the body is read"""
+    connect_ms = getattr(_local, "connect_ms", 0.0)
+    connected = getattr(_local, "connected", False)
+    _start_request()
+
+    start = time.perf_counter()
+    body = response.content
+    body_read_ms = (time.perf_counter() - start) * 1000
+
+    request_body = response.request.body if response.request is not None else None
+    phases = {
+        "connection_reused": not connected,
+        "connect_ms": connect_ms,
+        "ttfb_ms": max(0.0, response.elapsed.total_seconds() * 1000 - connect_ms),
+        "body_read_ms": body_read_ms,
+        "decode_ms": 0.0,
+        "request_bytes": len(request_body or b""),
+        "response_bytes": len(body or b""),
+    }
+    response.phases = phases
+    _local.last_phases = phases
+
+
+def instrument_session(session):
+    """Install connection timing and the response hook into a requests session"""
+    for adapter in session.adapters.values():
+        poolmanager = getattr(adapter, "poolmanager", None)
+        if poolmanager is None:
+            continue
+        poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+        poolmanager.clear()
+    session.hooks["response"].append(_record_response)
+
+
+def pop_response_phases():
+    """Phases of the current greenlet's latest response, or None; each response is returned once"""
+    phases = getattr(_local, "last_phases", None)
+    _local.last_phases = None
+    return phases
+
+
+def decode_json(response):
+    """Decode a JSON response body, adding the decode time to its phases"""
+    start = time.perf_counter()
+    try:
+        return response.json()
+    except ValueError:
+        return None
+    finally:
+        phases = getattr(response, "phases", None)
+        if phases is not None:
+            phases["decode_ms"] += (time.perf_counter() - start) * 1000
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Append-only store of load test results across runs
+
+run_test() writes every run into load_test_results/{test}_{user_class}/ and
+the next run of the same scenario overwrites it. To keep the history, each
+run is ingested into a SQLite database as soon as it finishes (and
+compare_results.py ingests whatever is on disk):
+
+- runs: one row per run, with the git commit it was made at, its start
+  time, scenario, user class and protocol;
+- endpoint_stats: one row per endpoint of a run (plus "Aggregated") with
+  request and failure counts, RPS and latency; percentiles come from the
+  HDR histograms when the run has them, otherwise from Locust's CSV;
+- baselines: runs pinned as the reference of a scenario and user class
+  (the latest pinning wins), used by regression_gate.py. Runs are compared
+  per user class, not per protocol: RestUser, FastRestUser and
+  Http2RestUser are all REST but measure different client stacks.
+
+A run is identified by the SHA-256 of its results_stats.csv, so ingesting
+the same directory again is a no-op and only new runs are added. Rows are
+never updated or deleted.
+
+Usage:
+    python results_store.py ingest
+    python results_store.py trend --scenario light_load --metric p95
+    python results_store.py trend --scenario light_load --endpoint "gRPC GetTerm" --protocol grpc
+    python results_store.py trend --scenario light_load --user-class FastRestUser
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from latency_histogram import LatencyHistograms, summarize
+
+STORE_FILE = "load_test_history.db"
+RESULTS_DIR = "load_test_results"
+STATS_FILE = "results_stats.csv"
+HISTOGRAMS_FILE = "results_histograms.json"
+
+# Run metadata written by run_tests.py next to the results
+RUN_FILE = "results_run.json"
+
+# Results directories that hold searches rather than scenario runs
+SKIPPED_DIRS = {"capacity_search"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT UNIQUE NOT NULL,
+    git_commit TEXT,
+    git_dirty INTEGER,
+    started_at REAL NOT NULL,
+    scenario TEXT NOT NULL,
+    user_class TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    results_dir TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS endpoint_stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    endpoint TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    rps REAL,
+    avg_ms REAL,
+    p50_ms REAL,
+    p95_ms REAL,
+    p99_ms REAL,
+    exact_percentiles INTEGER NOT NULL,
+    PRIMARY KEY (run_id, endpoint)
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    scenario TEXT NOT NULL,
+    user_class TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    pinned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS baselines_by_user_class ON baselines (scenario, user_class, pinned_at);
+CREATE INDEX IF NOT EXISTS runs_by_scenario ON runs (scenario, protocol, started_at);
+CREATE INDEX IF NOT EXISTS runs_by_user_class ON runs (scenario, user_class, started_at);
+CREATE INDEX IF NOT EXISTS runs_by_commit ON runs (git_commit);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (started_at);
+CREATE INDEX IF NOT EXISTS endpoint_stats_by_endpoint ON endpoint_stats (endpoint, run_id);
+"""
+
+# Metrics the trend command can show, as (column, label, higher is better)
+TREND_METRICS = {
+    "p50": ("p50_ms", "p50 ms", False),
+    "p95": ("p95_ms", "p95 ms", False),
+    "p99": ("p99_ms", "p99 ms", False),
+    "avg": ("avg_ms", "avg ms", False),
+    "rps": ("rps", "rps", True),
+}
+
+
+def git_revision(path="."):
+    """(commit, dirty) of the git checkout at path, or (None, None) outside git"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=path, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=path,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def write_run_metadata(output_dir, test_name, user_class):
+    """Record the git commit and start time of a run about to write into output_dir"""
+    commit, dirty = git_revision()
+    with open(os.path.join(output_dir, RUN_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "test_name": test_name,
+            "user_class": user_class,
+            "git_commit": commit,
+            "git_dirty": dirty,
+            "started_at": time.time(),
+        }, f, indent=2)
+
+
+def protocol_of(user_class):
+    return "grpc" if user_class.startswith("Grpc") else "rest"
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def endpoint_rows(run_dir):
+    """Per-endpoint stats of a run: Locust's CSV, percentiles from HDR histograms if saved"""
+    with open(os.path.join(run_dir, STATS_FILE), newline="", encoding="utf-8") as f:
+        records = list(csv.DictReader(f))
+    histograms = None
+    histograms_path = os.path.join(run_dir, HISTOGRAMS_FILE)
+    if os.path.exists(histograms_path):
+        histograms = LatencyHistograms.load(histograms_path)
+
+    rows = []
+    for record in records:
+        name = record.get("Name")
+        if not name:
+            continue
+        endpoint = "Aggregated" if name == "Aggregated" else f"{record.get('Type', '')} {name}".strip()
+        row = {
+            "endpoint": endpoint,
+            "requests": int(_number(record.get("Request Count")) or 0),
+            "failures": int(_number(record.get("Failure Count")) or 0),
+            "rps": _number(record.get("Requests/s")),
+            "avg_ms": _number(record.get("Average Response Time")),
+            "p50_ms": _number(record.get("50%")),
+            "p95_ms": _number(record.get("95%")),
+            "p99_ms": _number(record.get("99%")),
+            "exact_percentiles": 0,
+        }
+        if histograms is not None:
+            if endpoint == "Aggregated":
+                histogram = histograms.combined() if histograms.histograms else None
+            else:
+                histogram = histograms.histograms.get(endpoint)
+            if histogram is not None and histogram.get_total_count():
+                summary = summarize(histogram)
+                row.update(avg_ms=summary["mean"], p50_ms=summary["p50"], p95_ms=summary["p95"],
+                           p99_ms=summary["p99"], exact_percentiles=1)
+        rows.append(row)
+    return rows
+
+
+def fingerprint(run_dir):
+    """Identity of a run: hash of its stats CSV, which every new run rewrites"""
+    with open(os.path.join(run_dir, STATS_FILE), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ResultsStore:
+    """SQLite store of runs and their per-endpoint stats"""
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def ingest_run(self, run_dir):
+        """Add one run directory; returns its run id, or None if it was already ingested"""
+        run_fingerprint = fingerprint(run_dir)
+        if self.connection.execute("SELECT 1 FROM runs WHERE fingerprint = ?", (run_fingerprint,)).fetchone():
+            return None
+
+        dir_name = os.path.basename(os.path.normpath(run_dir))
+        test_name, _, user_class = dir_name.rpartition("_")
+        metadata = {}
+        metadata_path = os.path.join(run_dir, RUN_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = json.load(f)
+        # Runs made before run metadata existed: the CSV's modification time
+        started_at = metadata.get("started_at") or os.path.getmtime(os.path.join(run_dir, STATS_FILE))
+        user_class = metadata.get("user_class") or user_class
+        dirty = metadata.get("git_dirty")
+
+        rows = endpoint_rows(run_dir)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (fingerprint, git_commit, git_dirty, started_at, scenario, user_class, protocol, "
+                "results_dir, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_fingerprint, metadata.get("git_commit"), None if dirty is None else int(dirty), started_at,
+                 metadata.get("test_name") or test_name, user_class, protocol_of(user_class),
+                 os.path.abspath(run_dir), time.time()),
+            )
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO endpoint_stats (run_id, endpoint, requests, failures, rps, avg_ms, p50_ms, p95_ms, "
+                "p99_ms, exact_percentiles) VALUES (:run_id, :endpoint, :requests, :failures, :rps, :avg_ms, "
+                ":p50_ms, :p95_ms, :p99_ms, :exact_percentiles)",
+                [{"run_id": run_id, **row} for row in rows],
+            )
+        return run_id
+
+    def ingest_tree(self, results_dir=RESULTS_DIR):
+        """Add every run under results_dir that is not in the store yet; returns the number added"""
+        added = 0
+        for root, dirs, files in os.walk(results_dir):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+            if STATS_FILE not in files or "_" not in os.path.basename(root):
+                continue
+            try:
+                if self.ingest_run(root) is not None:
+                    added += 1
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error ingesting {root}: {e}")
+        return added
+
+    def trend(self, scenario, endpoint="Aggregated", protocol=None, limit=None, user_class=None):
+        """Runs of a scenario's endpoint in time order, as dicts with run and endpoint fields"""
+        query = (
+            "SELECT r.id, r.git_commit, r.git_dirty, r.started_at, r.protocol, r.user_class, "
+            "s.endpoint, s.requests, s.failures, s.rps, s.avg_ms, s.p50_ms, s.p95_ms, s.p99_ms "
+            "FROM runs r JOIN endpoint_stats s ON s.run_id = r.id "
+            "WHERE r.scenario = ? AND s.endpoint = ?"
+        )
+        params = [scenario, endpoint]
+        if protocol:
+            query += " AND r.protocol = ?"
+            params.append(protocol)
+        if user_class:
+            query += " AND r.user_class = ?"
+            params.append(user_class)
+        query += " ORDER BY r.started_at"
+        self.connection.row_factory = sqlite3.Row
+        try:
+            rows = [dict(row) for row in self.connection.execute(query, params)]
+        finally:
+            self.connection.row_factory = None
+        if limit:
+            # The latest runs of each user class
+            by_user_class = {}
+            for row in rows:
+                by_user_class.setdefault(row["user_class"], []).append(row)
+            rows = sorted((row for runs in by_user_class.values() for row in runs[-limit:]),
+                          key=lambda row: row["started_at"])
+        return rows
+
+    def latest_runs(self, scenario, user_class, limit, before=None):
+        """Ids of the latest runs of a scenario and user class, newest first, optionally older than a run"""
+        query = "SELECT id FROM runs WHERE scenario = ? AND user_class = ?"
+        params = [scenario, user_class]
+        if before is not None:
+            query += " AND started_at < (SELECT started_at FROM runs WHERE id = ?)"
+            params.append(before)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def pin_baseline(self, scenario, user_class, run_ids):
+        """Make run_ids the baseline of a scenario and user class (earlier pinnings are kept)"""
+        pinned_at = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO baselines (scenario, user_class, run_id, pinned_at) VALUES (?, ?, ?, ?)",
+                [(scenario, user_class, run_id, pinned_at) for run_id in run_ids],
+            )
+
+    def baseline_runs(self, scenario, user_class):
+        """Run ids of the latest pinned baseline of a scenario and user class (empty if none)"""
+        return [row[0] for row in self.connection.execute(
+            "SELECT run_id FROM baselines WHERE scenario = ? AND user_class = ? AND pinned_at = "
+            "(SELECT MAX(pinned_at) FROM baselines WHERE scenario = ? AND user_class = ?)",
+            (scenario, user_class, scenario, user_class),
+        )]
+
+    def user_classes(self, scenario, protocol=None):
+        """User classes with runs of a scenario, optionally of one protocol"""
+        query = "SELECT DISTINCT user_class FROM runs WHERE scenario = ?"
+        params = [scenario]
+        if protocol:
+            query += " AND protocol = ?"
+            params.append(protocol)
+        return [row[0] for row in self.connection.execute(query + " ORDER BY user_class", params)]
+
+    def runs(self, run_ids):
+        """Run rows by id, as dicts"""
+        placeholders = ", ".join("?" * len(run_ids))
+        self.connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in self.connection.execute(
+                f"SELECT * FROM runs WHERE id IN ({placeholders}) ORDER BY started_at", list(run_ids))]
+        finally:
+            self.connection.row_factory = None
+
+    def endpoint_stats(self, run_ids):
+        """{run_id: {endpoint: stats dict}} of the given runs"""
+        placeholders = ", ".join("?" * len(run_ids))
+        stats = {run_id: {} for run_id in run_ids}
+        self.connection.row_factory = sqlite3.Row
+        try:
+            for row in self.connection.execute(
+                    f"SELECT * FROM endpoint_stats WHERE run_id IN ({placeholders})", list(run_ids)):
+                stats[row["run_id"]][row["endpoint"]] = dict(row)
+        finally:
+            self.connection.row_factory = None
+        return stats
+
+    def scenarios(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT scenario FROM runs ORDER BY scenario")]
+
+
+def format_trend(rows, metric):
+    """Console table of a metric across runs, per user class, with the change from the previous run"""
+    column, label, higher_is_better = TREND_METRICS[metric]
+    lines = []
+    for user_class in sorted({row["user_class"] for row in rows}):
+        runs = [row for row in rows if row["user_class"] == user_class]
+        lines.append(f"{runs[-1]['protocol'].upper()} ({user_class})")
+        lines.append(f"  {'started (UTC)':<19}  {'commit':<9}  {label:>10}  {'change':>8}  {'requests':>9}  {'err %':>6}")
+        previous = None
+        for row in runs:
+            value = row[column]
+            started = datetime.fromtimestamp(row["started_at"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            commit = (row["git_commit"] or "unknown")[:8] + ("*" if row["git_dirty"] else "")
+            change = ""
+            if value is not None and previous:
+                change = f"{(value - previous) / previous * 100:+.1f}%"
+                worse = value < previous if higher_is_better else value > previous
+                if worse and abs(value - previous) / previous >= 0.1:
+                    change += " !"
+            error_rate = row["failures"] / row["requests"] * 100 if row["requests"] else 0.0
+            shown = "N/A" if value is None else f"{value:.2f}"
+            lines.append(f"  {started:<19}  {commit:<9}  {shown:>10}  {change:>8}  {row['requests']:>9}  {error_rate:>6.2f}")
+            previous = value if value else previous
+        lines.append("")
+    return "\n".join(lines)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Append-only history of load test results")
+    parser.add_argument("--store", default=STORE_FILE, help=f"SQLite store (default: {STORE_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Add runs that are not in the store yet")
+    ingest.add_argument("--results-dir", default=RESULTS_DIR, help="Results directory to scan")
+    trend = commands.add_parser("trend", help="Show a metric of one endpoint across runs")
+    trend.add_argument("--scenario", help="Scenario (test name), e.g. light_load; lists scenarios if omitted")
+    trend.add_argument("--endpoint", default="Aggregated", help="Endpoint, e.g. 'GET /terms' or 'gRPC GetTerm'")
+    trend.add_argument("--protocol", choices=["rest", "grpc"], help="Only this protocol")
+    trend.add_argument("--user-class", help="Only this user class, e.g. FastRestUser")
+    trend.add_argument("--metric", choices=sorted(TREND_METRICS), default="p95", help="Metric to show")
+    trend.add_argument("--limit", type=int, help="Only the latest N runs per user class")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    with ResultsStore(args.store) as store:
+        if args.command == "ingest":
+            added = store.ingest_tree(args.results_dir)
+            print(f"Ingested {added} new run(s) into {args.store}")
+            return 0
+        if not args.scenario:
+            print("Scenarios in the store: " + (", ".join(store.scenarios()) or "none"))
+            return 0
+        rows = store.trend(args.scenario, args.endpoint, args.protocol, args.limit, args.user_class)
+        if not rows:
+            print(f"No runs of {args.scenario} / {args.endpoint} in {args.store}")
+            return 1
+        print(f"{args.scenario} / {args.endpoint}: {TREND_METRICS[args.metric][1]} across runs "
+              "(! = 10% or more worse than the previous run, * = uncommitted changes)\n")
+        print(format_trend(rows, args.metric))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,10 +4,18 @@ Python script to run all load test scenarios for both REST and gRPC
 Cross-platform alternative to shell scripts
 """
 import os
+import re
 import sys
+import json
+import argparse
+import itertools
 import subprocess
+import time
+import zlib
 import importlib.util
+from contextlib import nullcontext
 import requests
+import httpx
 import grpc
 
 # Add gRPC service path
@@ -16,11 +24,27 @@ sys.path.insert(0, grpc_service_path)
 
 from glossary_pb2 import ListTermsRequest
 from glossary_pb2_grpc import GlossaryServiceStub
+from dataset_generator import TERM_WORDS, generate_dataset
+from grpc_channel_pool import channel_options
+from network_emulator import BYTE_COUNTING_PROFILE, PROFILES, NetworkEmulator, profile_name
+from regression_gate import REGRESSED, load_thresholds, run_gate
+from results_store import STATS_FILE, ResultsStore, protocol_of, write_run_metadata
+from server_profiler import DEFAULT_RATE as PROFILE_RATE, ServerProfiler
+from server_sampler import ServerSampler
 
 # Create results directory
 RESULTS_DIR = "load_test_results"
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
+# Port the Locust master listens on for local workers
+MASTER_PORT = 5557
+
+# Client CPU utilization (fraction of one core) above which a load generator counts as saturated
+CLIENT_CPU_LIMIT = 0.9
+
+# Wire compression modes of the payload sweep (see locustfile COMPRESSION)
+COMPRESSION_MODES = ["none", "gzip", "deflate"]
+
 # Test configurations
 CONFIGS = [
     "locust_config_light",
@@ -31,55 +55,361 @@ CONFIGS = [
 
 
 def load_config(config_name):
-    """Load configuration from a config file"""
+    """Load configuration module from a config file"""
     spec = importlib.util.spec_from_file_location(config_name, f"{config_name}.py")
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
-    return module.USERS, module.SPAWN_RATE, module.DURATION, module.TEST_NAME
+    return module
+
+
+def duration_seconds(value):
+    """Convert a Locust timespan such as '90s', '5m' or '1h30m' to seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"h": 3600, "m": 60, "s": 1, "": 1}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r"(\d+(?:\.\d+)?)([hms]?)", value))
+
+
+def rate_plan(config):
+    """Open-loop rate plan [[rps, seconds], ...] from a config, or None for closed-loop
+    
+    A config declares either TARGET_RPS (constant rate for DURATION) or
+    RPS_STEPS, a list of (rps, duration) steps.
+    """
+    if getattr(config, "RPS_STEPS", None):
+        return [[float(rps), duration_seconds(duration)] for rps, duration in config.RPS_STEPS]
+    if getattr(config, "TARGET_RPS", None):
+        return [[float(config.TARGET_RPS), duration_seconds(config.DURATION)]]
+    return None
+
+
+def key_settings(config):
+    """Key distribution, seed and key universe of a scenario
+    
+    Without KEY_SEED the seed is derived from the test name, so every
+    scenario is reproducible and REST and gRPC draw the same keys.
+    """
+    seed = getattr(config, "KEY_SEED", None)
+    if seed is None:
+        seed = zlib.crc32(config.TEST_NAME.encode("utf-8"))
+    return getattr(config, "KEY_DISTRIBUTION", "uniform"), seed, getattr(config, "KEYWORDS_FILE", None)
+
+
+def convergence_settings(config, convergence):
+    """Convergence stop settings of a scenario: (tolerance, window, min time) or None
+    
+    CONVERGE_TOLERANCE, CONVERGE_WINDOW and CONVERGE_MIN_TIME in a config
+    override the run_tests.py --converge options; a tolerance of 0 keeps
+    the scenario at its full DURATION.
+    """
+    tolerance, window, min_time = convergence or (0, "30s", "1m")
+    tolerance = getattr(config, "CONVERGE_TOLERANCE", tolerance)
+    if not tolerance:
+        return None
+    return tolerance, getattr(config, "CONVERGE_WINDOW", window), getattr(config, "CONVERGE_MIN_TIME", min_time)
+
 
+def report_convergence(output_dir):
+    """Print how long a convergence-mode run took and whether it converged"""
+    path = os.path.join(output_dir, "results_convergence.json")
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    outcome = "converged, stopped early" if state["stopped_early"] else "did not converge, ran to the limit"
+    print(f"  Convergence: {outcome} after {state['duration_s']:.0f}s")
 
-def run_test(config_name, user_class, protocol_name):
-    """Run a single test scenario"""
-    users, spawn_rate, duration, test_name = load_config(config_name)
+
+def network_settings(config, network):
+    """Network profile of a scenario (name or {"up": {...}, "down": {...}}) or None
+    
+    NETWORK_PROFILE in a config overrides the run_tests.py --network-profile option.
+    """
+    return getattr(config, "NETWORK_PROFILE", network)
+
+
+def describe_link(link):
+    """One direction of a network profile, for the run log"""
+    bandwidth = f"{link['bandwidth_mbps']:g} Mbit/s" if link["bandwidth_mbps"] else "unlimited bandwidth"
+    return f"{link['latency_ms']:g}±{link['jitter_ms']:g} ms, {bandwidth}, loss {link['loss'] * 100:g}%"
+
+
+def network_test_name(test_name, profile):
+    """Test name of a run made through the network emulator"""
+    return f"{test_name}_net-{profile_name(profile)}" if profile else test_name
+
+
+def payload_settings(config, payload):
+    """(description size, compression) of a scenario; a payload sweep value overrides the config
     
-    output_dir = os.path.join(RESULTS_DIR, f"{test_name}_{user_class}")
+    DESCRIPTION_SIZE and COMPRESSION in a config set the description length of
+    created terms and the wire compression mode; None keeps the defaults.
+    """
+    description_size, compression = payload or (None, None)
+    if description_size is None:
+        description_size = getattr(config, "DESCRIPTION_SIZE", None)
+    if compression is None:
+        compression = getattr(config, "COMPRESSION", None)
+    return description_size, compression
+
+
+def payload_test_name(test_name, payload):
+    """Test name of a run of the payload sweep"""
+    description_size, compression = payload or (None, None)
+    if description_size is not None:
+        test_name = f"{test_name}_desc-{description_size}"
+    if compression is not None:
+        test_name = f"{test_name}_comp-{compression}"
+    return test_name
+
+
+def check_client_cpu(output_dir):
+    """Warn when the load generator or any of its workers was CPU bound, or gRPC calls did not overlap"""
+    path = os.path.join(output_dir, "results_client_cpu.json")
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        client_cpu = json.load(f)
+    processes = client_cpu.get("workers") or {"load generator": client_cpu}
+    for name, usage in processes.items():
+        utilization = usage.get("cpu_utilization")
+        if utilization is not None and utilization > CLIENT_CPU_LIMIT:
+            label = name if name == "load generator" else f"worker {name}"
+            print(f"  WARNING: {label} used {utilization * 100:.0f}% of a core, "
+                  "results may reflect the client, not the server. Use more --workers")
+    concurrency = client_cpu.get("grpc_concurrency")
+    if concurrency:
+        print(f"  gRPC concurrency: peak {concurrency['peak_in_flight']} calls in flight, "
+              f"{concurrency['users']} users")
+        if concurrency["serialized"]:
+            print("  WARNING: gRPC calls did not overlap, the client serialized its requests")
+
+
+def store_run(output_dir):
+    """Add a run to the results history if Locust wrote its stats, failed or not"""
+    # The next run of the scenario overwrites the directory: keep this one in the history
+    if os.path.exists(os.path.join(output_dir, STATS_FILE)):
+        with ResultsStore() as store:
+            store.ingest_run(output_dir)
+
+
+def run_test(config_name, user_class, protocol_name, grpc_channels=None, grpc_options=None, output_dir=None,
+             server_sampler=None, workers=0, dataset=None, trial=None, convergence=None, network=None,
+             payload=None, server_profiler=None, databases=None):
+    """Run a single test scenario
+    
+    config_name is a config module name or an already loaded config object.
+    grpc_channels overrides the config's GRPC_CHANNELS; when given, the
+    channel mode is added to the result directory name so that runs with
+    different channel modes do not overwrite each other. output_dir
+    overrides the default load_test_results/{test}_{user_class} location.
+    server_sampler (a ServerSampler) records server resources for the
+    duration of the run into the output directory, server_profiler (a
+    ServerProfiler) the stacks of the server under test. With workers > 0 the
+    load is generated by that many local worker processes under a master,
+    which writes the merged CSV/HTML output; worker logs are kept as
+    worker_{n}.log in the output directory. dataset is (number of terms,
+    database path) of a generated dataset: the number is added to the result
+    directory name and the keyword pool is read from the database. trial
+    numbers repeated runs of the same scenario (_trial-N in the name).
+    convergence is (tolerance, window, min time): the run stops once its p95
+    and RPS estimates converge, DURATION becomes the maximum. network is a
+    network profile (see network_emulator): the clients reach the servers
+    through the emulator proxy and _net-{profile} is added to the name.
+    payload is (description size, compression) of a payload sweep, either
+    may be None; _desc-{size} and _comp-{mode} are added to the name. Runs
+    with a description size or compression always go through the emulator
+    (a byte-counting profile without one), which records the on-wire bytes.
+    databases is (database paths, number of terms, description length): runs
+    with a description size refill them first, so the terms created by
+    earlier runs do not grow every later ListTerms response.
+    """
+    config = load_config(config_name) if isinstance(config_name, str) else config_name
+    test_name = config.TEST_NAME
+    plan = rate_plan(config)
+    
+    description_size, compression = payload_settings(config, payload)
+    if description_size and databases:
+        db_paths, terms, description_length = databases
+        for db_path in db_paths:
+            generate_dataset(db_path, terms, description_length)
+        print(f"  Databases refilled with {terms} terms")
+    elif description_size:
+        print("  Warning: created terms stay in the server database and grow ListTerms responses "
+              "(pass --db to refill it before each run)")
+    profile = network_settings(config, network)
+    if not profile and (description_size or compression):
+        profile = BYTE_COUNTING_PROFILE
+    
+    # Markers in the order the report splits them off: the rest of the name is the scenario
+    test_name = payload_test_name(network_test_name(test_name, profile), payload)
+    if dataset is not None:
+        test_name = f"{test_name}_terms-{dataset[0]}"
+    if trial is not None:
+        test_name = f"{test_name}_trial-{trial}"
+    if grpc_channels is not None:
+        test_name = f"{test_name}_channels-{grpc_channels}"
+    else:
+        grpc_channels = getattr(config, "GRPC_CHANNELS", "per-user")
+    
+    if output_dir is None:
+        output_dir = os.path.join(RESULTS_DIR, f"{test_name}_{user_class}")
     os.makedirs(output_dir, exist_ok=True)
     
     print(f"Running {test_name} test for {user_class} ({protocol_name})...")
-    print(f"  Users: {users}, Spawn rate: {spawn_rate}, Duration: {duration}")
+    write_run_metadata(output_dir, test_name, user_class)
     
     # Build locust command with environment variable for user class selection
     env = os.environ.copy()
     env["LOCUST_USER_CLASS"] = user_class
+    env["GRPC_CHANNELS"] = str(grpc_channels)
+    for key, value in (grpc_options or {}).items():
+        env[key] = str(value)
+    
+    distribution, seed, keywords_file = key_settings(config)
+    if dataset is not None:
+        keywords_file = dataset[1]
+    env["LOCUST_KEY_DISTRIBUTION"] = distribution
+    env["LOCUST_KEY_SEED"] = str(seed)
+    if keywords_file:
+        env["LOCUST_KEYWORDS_FILE"] = os.path.abspath(keywords_file)
+    else:
+        env.pop("LOCUST_KEYWORDS_FILE", None)
+    print(f"  Keys: {distribution}, seed {seed}" + (f", from {keywords_file}" if keywords_file else ""))
+    
+    env.pop("LOCUST_CONVERGE_TOLERANCE", None)
+    settings = convergence_settings(config, convergence)
+    if settings and not getattr(config, "TRACE_FILE", None):
+        tolerance, window, min_time = settings
+        env["LOCUST_CONVERGE_TOLERANCE"] = str(tolerance)
+        env["LOCUST_CONVERGE_WINDOW"] = str(window)
+        env["LOCUST_CONVERGE_MIN_TIME"] = str(min_time)
+        print(f"  Convergence stop: ±{float(tolerance) * 100:g}% for {window}, after at least {min_time}")
+    
+    for name, value in (("LOCUST_DESCRIPTION_SIZE", description_size), ("LOCUST_COMPRESSION", compression)):
+        if value is None:
+            env.pop(name, None)
+        else:
+            env[name] = str(value)
+    if description_size is not None or compression is not None:
+        print(f"  Payload: description {description_size or 'default'} chars, compression {compression or 'default'}")
+    
+    emulator = None
+    rest_url = "http://localhost:8000"
+    env.pop("LOCUST_GRPC_TARGET", None)
+    if profile:
+        emulator = NetworkEmulator(profile)
+        rest_url = f"http://{emulator.endpoint('rest')}"
+        env["LOCUST_GRPC_TARGET"] = emulator.endpoint("grpc")
+        links = ", ".join(f"{direction} {describe_link(link)}" for direction, link in emulator.profile.items())
+        print(f"  Network: {emulator.name} ({links})")
+    env["LOCUST_REST_URL"] = rest_url
+    
+    env.pop("LOCUST_TRACE", None)
+    if getattr(config, "TRACE_FILE", None):
+        # Trace replay: the locustfile's load shape runs for the length of the trace
+        env.pop("LOCUST_RPS_PLAN", None)
+        env["LOCUST_TRACE"] = os.path.abspath(config.TRACE_FILE)
+        env["LOCUST_TRACE_SPEEDUP"] = str(getattr(config, "TRACE_SPEEDUP", 1.0))
+        if getattr(config, "USERS", None):
+            env["LOCUST_TRACE_USERS"] = str(config.USERS)
+        print(f"  Trace replay: {config.TRACE_FILE} at {env['LOCUST_TRACE_SPEEDUP']}x speed")
+        load_args = []
+    elif plan:
+        # Open-loop: the locustfile's load shape drives the request rate
+        env["LOCUST_RPS_PLAN"] = json.dumps(plan)
+        if getattr(config, "USERS", None):
+            env["LOCUST_OPEN_LOOP_USERS"] = str(config.USERS)
+        steps = ", ".join(f"{rps:g} rps x {seconds:g}s" for rps, seconds in plan)
+        print(f"  Open-loop rate plan: {steps}")
+        load_args = []
+    else:
+        env.pop("LOCUST_RPS_PLAN", None)
+        print(f"  Users: {config.USERS}, Spawn rate: {config.SPAWN_RATE}, Duration: {config.DURATION}")
+        load_args = [
+            "--users", str(config.USERS),
+            "--spawn-rate", str(config.SPAWN_RATE),
+            "--run-time", config.DURATION,
+        ]
     
     # Build locust command
     cmd = [
         "locust",
         "--headless",
-        "--users", str(users),
-        "--spawn-rate", str(spawn_rate),
-        "--run-time", duration,
-        "--host", "http://localhost:8000",
+        *load_args,
+        "--host", rest_url,
         "-f", "locustfile.py",
         "--html", os.path.join(output_dir, "report.html"),
         "--csv", os.path.join(output_dir, "results"),
-        "--loglevel", "INFO"
+        "--loglevel", "INFO",
+        # Failed requests are results, not a failed run: they are stored and checked by --check
+        "--exit-code-on-error", "0",
     ]
     
+    if workers:
+        print(f"  Workers: {workers}")
+        env["LOCUST_WORKERS"] = str(workers)
+        cmd += [
+            "--master",
+            "--master-bind-port", str(MASTER_PORT),
+            "--expect-workers", str(workers),
+            "--expect-workers-max-wait", "60",
+        ]
+    else:
+        env.pop("LOCUST_WORKERS", None)
+    
+    worker_processes = []
+    worker_logs = []
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
+        # Workers connect to the servers through the emulator, it has to run first
+        with emulator.running(output_dir) if emulator else nullcontext():
+            for index in range(workers):
+                log = open(os.path.join(output_dir, f"worker_{index}.log"), "w", encoding="utf-8")
+                worker_logs.append(log)
+                worker_processes.append(subprocess.Popen(
+                    ["locust", "-f", "locustfile.py", "--worker", "--master-port", str(MASTER_PORT),
+                     "--loglevel", "INFO"],
+                    stdout=log, stderr=subprocess.STDOUT, env=env,
+                ))
+            profiling = server_profiler.recording(output_dir, protocol_of(user_class)) if server_profiler \
+                else nullcontext()
+            with server_sampler.recording(output_dir) if server_sampler else nullcontext(), profiling:
+                result = subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
         print(f"  Test completed. Results saved to {output_dir}")
+        check_client_cpu(output_dir)
+        report_convergence(output_dir)
+        store_run(output_dir)
         print()
         return True
     except subprocess.CalledProcessError as e:
         print(f"  Error running test: {e}")
         print(f"  stderr: {e.stderr}")
+        store_run(output_dir)
         print()
         return False
+    finally:
+        # Workers quit with the master; make sure none is left behind
+        for process in worker_processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for log in worker_logs:
+            log.close()
 
 
-def check_servers():
-    """Check if both servers are running"""
+def check_http2(url="http://localhost:8000/"):
+    """True if the REST server speaks HTTP/2 without TLS (h2c with prior knowledge)"""
+    try:
+        with httpx.Client(http1=False, http2=True, timeout=2) as client:
+            return client.get(url).http_version == "HTTP/2"
+    except httpx.HTTPError:
+        return False
+
+
+def check_servers(http2=False):
+    """Check if both servers are running (and the REST server speaks HTTP/2 if http2)"""
     print("Checking if servers are running...")
     
     # Check REST server
@@ -91,7 +421,7 @@ def check_servers():
     
     # Check gRPC server
     try:
-        channel = grpc.insecure_channel("localhost:50051")
+        channel = grpc.insecure_channel("localhost:50051", options=channel_options())
         stub = GlossaryServiceStub(channel)
         request = ListTermsRequest()
         stub.ListTerms(request, timeout=2)
@@ -108,6 +438,11 @@ def check_servers():
         print("✗ gRPC server (localhost:50051) is not running")
         print("  Start it with: cd rpc-grpc-protobuf/glossary_grpc_project/glossary_service && python glossary.py")
     
+    if rest_ok and http2 and not check_http2():
+        rest_ok = False
+        print("✗ REST API server (localhost:8000) does not speak HTTP/2 without TLS")
+        print("  Serve it with hypercorn: cd fastapi-swagger && hypercorn main:app --bind localhost:8000")
+    
     if rest_ok and grpc_ok:
         print("✓ Both servers are running")
         return True
@@ -116,29 +451,194 @@ def check_servers():
         return False
 
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Run REST and gRPC load test scenarios")
+    parser.add_argument(
+        "--config",
+        action="append",
+        help="Config module to run (repeatable), e.g. locust_config_open_loop. Defaults to all closed-loop configs",
+    )
+    parser.add_argument(
+        "--rest-user",
+        choices=["RestUser", "FastRestUser", "Http2RestUser"],
+        default="RestUser",
+        help="REST user class: requests-based RestUser, geventhttpclient-based FastRestUser "
+             "or httpx-based Http2RestUser (HTTP/2)",
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Also run every scenario with Http2RestUser (JSON over HTTP/2) to separate the effect "
+             "of the transport from the effect of the encoding. Needs an HTTP/2 REST server (hypercorn)",
+    )
+    parser.add_argument(
+        "--grpc-channels",
+        help="Comma-separated gRPC channel modes to compare, e.g. '1,8,per-user'. "
+             "Each mode is run as an extra GrpcUser pass for every scenario",
+    )
+    parser.add_argument("--grpc-keepalive-ms", type=int, default=0,
+                        help="Keepalive ping interval for gRPC channels (0 disables)")
+    parser.add_argument("--grpc-max-streams", type=int, default=0,
+                        help="Client-side limit of concurrent RPCs per gRPC channel (0 = unlimited)")
+    parser.add_argument("--rest-pid", type=int, help="REST server PID (default: found by port 8000)")
+    parser.add_argument("--grpc-pid", type=int, help="gRPC server PID (default: found by port 50051)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Local Locust worker processes (default: one per core, 0 = single process)")
+    parser.add_argument("--sample-interval", type=float, default=1.0,
+                        help="Server resource sampling interval in seconds (0 disables sampling)")
+    parser.add_argument("--profile-servers", action="store_true",
+                        help="Profile the server under test with py-spy during every run; the collapsed "
+                             "stacks are saved as server_profile.txt and summarized in the report")
+    parser.add_argument("--profile-rate", type=int, default=PROFILE_RATE,
+                        help=f"py-spy samples per second (default: {PROFILE_RATE})")
+    parser.add_argument("--profile-idle", action="store_true",
+                        help="Also sample threads that are not running, e.g. waiting for the SQLite lock "
+                             "(idle worker threads are sampled too)")
+    parser.add_argument("--trials", type=int, default=1,
+                        help="Repeat every scenario this many times, alternating REST and gRPC, "
+                             "for confidence intervals in the report")
+    parser.add_argument("--dataset-sizes", type=int, nargs="+",
+                        help="Run every scenario over synthetic datasets of these numbers of terms, "
+                             "e.g. 15 1000 100000 1000000 (requires --db)")
+    parser.add_argument("--db", action="append",
+                        help="SQLite database the servers read, refilled for each dataset size (repeatable)")
+    parser.add_argument("--description-length", type=int, default=150,
+                        help="Description length of generated terms in characters")
+    parser.add_argument("--converge", type=float, default=0, metavar="TOLERANCE",
+                        help="Stop each scenario once the p95 and RPS confidence intervals are within this "
+                             "relative half-width (e.g. 0.05); DURATION becomes the maximum (0 = full duration)")
+    parser.add_argument("--converge-window", default="30s",
+                        help="How long the estimates must stay within the tolerance (default: 30s)")
+    parser.add_argument("--converge-min-time", default="1m",
+                        help="Shortest run in convergence mode (default: 1m)")
+    parser.add_argument("--network-profile", choices=list(PROFILES),
+                        help="Reach the servers through the network emulator with this profile "
+                             "(latency, bandwidth, loss); NETWORK_PROFILE in a config overrides it")
+    parser.add_argument("--description-sizes", type=int, nargs="+",
+                        help="Payload sweep: description lengths of created terms in characters, e.g. 64 4096 262144")
+    parser.add_argument("--compression", nargs="+", choices=COMPRESSION_MODES,
+                        help="Payload sweep: wire compression modes, e.g. none gzip")
+    parser.add_argument("--check", action="store_true",
+                        help="After the runs, compare each scenario with its baseline in the results history "
+                             "and exit non-zero on a regression (see regression_gate.py)")
+    parser.add_argument("--thresholds", help="JSON file with regression thresholds for --check")
+    return parser.parse_args()
+
+
 def main():
     """Main function to run all tests"""
+    args = parse_args()
+    started_at = time.time()
+    if args.dataset_sizes and not args.db:
+        print("--dataset-sizes needs the servers' databases: pass --db for each")
+        sys.exit(1)
+    if args.check and (args.dataset_sizes or args.trials > 1 or args.description_sizes or args.compression):
+        print("--check compares plain scenario runs, it cannot be combined with --dataset-sizes, --trials, "
+              "--description-sizes or --compression")
+        sys.exit(1)
+    configs = args.config or CONFIGS
+    # Every combination of description size and compression; (None, None) is a plain run
+    payloads = list(itertools.product(args.description_sizes or [None], args.compression or [None]))
+    convergence = (args.converge, args.converge_window, args.converge_min_time)
+    grpc_options = {
+        "GRPC_KEEPALIVE_MS": args.grpc_keepalive_ms,
+        "GRPC_MAX_CONCURRENT_STREAMS": args.grpc_max_streams,
+    }
+    
     # Check servers first
-    if not check_servers():
+    if not check_servers(http2=args.http2 or args.rest_user == "Http2RestUser"):
         print("\nUse 'python check_servers.py' for detailed server status.")
         sys.exit(1)
     
+    sampler = None
+    if args.sample_interval > 0:
+        sampler = ServerSampler.create(args.rest_pid, args.grpc_pid, args.sample_interval)
+    profiler = None
+    if args.profile_servers:
+        profiler = ServerProfiler.create(args.rest_pid, args.grpc_pid, args.profile_rate, args.profile_idle)
+    
     print("\nStarting load testing...")
     print(f"Results will be saved to: {RESULTS_DIR}")
     print()
     
-    # Run tests for REST
-    print("=== Testing REST API (FastAPI) ===")
-    for config in CONFIGS:
-        run_test(config, "RestUser", "REST")
-    
-    # Run tests for gRPC
-    print("=== Testing gRPC API ===")
-    for config in CONFIGS:
-        run_test(config, "GrpcUser", "gRPC")
+    for size in args.dataset_sizes or [None]:
+        dataset = None
+        if size is not None:
+            # Every database gets the same data; the first one is the keyword source
+            print(f"=== Dataset: {size} terms ===")
+            for db_path in args.db:
+                seconds = generate_dataset(db_path, size, args.description_length)
+                print(f"  {db_path}: {size} terms generated in {seconds:.2f}s")
+            print()
+            dataset = (size, args.db[0])
+        # Payload runs start from this data (or the original terms) instead of what earlier runs created
+        databases = (args.db, size or len(TERM_WORDS), args.description_length) if args.db else None
+        
+        for payload in payloads:
+            if payload == (None, None):
+                payload = None
+            else:
+                print(f"=== Payload: description {payload[0] or 'default'} chars, "
+                      f"compression {payload[1] or 'default'} ===")
+            
+            # Repeated runs alternate the protocols, so slow drift affects both alike
+            for trial in range(1, args.trials + 1) if args.trials > 1 else [None]:
+                if trial is not None:
+                    print(f"=== Trial {trial} of {args.trials} ===")
+                
+                # Run tests for REST
+                print("=== Testing REST API (FastAPI) ===")
+                for config in configs:
+                    run_test(config, args.rest_user, "REST", server_sampler=sampler, server_profiler=profiler,
+                             workers=args.workers, dataset=dataset, trial=trial, convergence=convergence,
+                             network=args.network_profile, payload=payload, databases=databases)
+                
+                # Same JSON requests over HTTP/2
+                if args.http2 and args.rest_user != "Http2RestUser":
+                    print("=== Testing REST API over HTTP/2 ===")
+                    for config in configs:
+                        run_test(config, "Http2RestUser", "REST", server_sampler=sampler,
+                                 server_profiler=profiler, workers=args.workers, dataset=dataset, trial=trial,
+                                 convergence=convergence, network=args.network_profile, payload=payload,
+                                 databases=databases)
+                
+                # Run tests for gRPC
+                print("=== Testing gRPC API ===")
+                for config in configs:
+                    run_test(config, "GrpcUser", "gRPC", grpc_options=grpc_options, server_sampler=sampler,
+                             server_profiler=profiler, workers=args.workers, dataset=dataset, trial=trial,
+                             convergence=convergence, network=args.network_profile, payload=payload,
+                             databases=databases)
+        
+        # Compare gRPC channel modes
+        if args.grpc_channels:
+            print("=== Comparing gRPC channel modes ===")
+            for config in configs:
+                for mode in args.grpc_channels.split(","):
+                    run_test(config, "GrpcUser", "gRPC", grpc_channels=mode.strip(), grpc_options=grpc_options,
+                             server_sampler=sampler, server_profiler=profiler, workers=args.workers,
+                             dataset=dataset, convergence=convergence, network=args.network_profile)
     
     print("All tests completed!")
     print("Run 'python compare_results.py' to analyze and compare results.")
+    
+    if args.check:
+        print("\n=== Regression check ===")
+        scenarios = [
+            network_test_name(config.TEST_NAME, network_settings(config, args.network_profile))
+            for config in map(load_config, configs)
+        ]
+        user_classes = [args.rest_user, "GrpcUser"]
+        if args.http2 and args.rest_user != "Http2RestUser":
+            user_classes.insert(1, "Http2RestUser")
+        # A scenario whose latest stored run predates this invocation lost its run: that fails the check
+        with ResultsStore() as store:
+            outcome = run_gate(store, scenarios, load_thresholds(args.thresholds), user_classes,
+                               since=started_at)
+        # The first runs only build the history, they have nothing to regress against
+        if outcome == REGRESSED:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
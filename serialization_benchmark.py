@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Serialization microbenchmark: protobuf Term messages vs JSON
+
+Encodes and decodes a list of glossary terms the way each side of the
+comparison does it:
+
+- protobuf: ListTermsResponse from glossary_pb2 (SerializeToString/FromString)
+- pydantic: list of Term response models (TypeAdapter.dump_json/validate_json,
+  the path FastAPI takes for response models)
+- json: plain dicts with the stdlib json module
+- orjson: plain dicts with orjson (if installed)
+
+The sweep covers list sizes and description lengths. For every point it
+reports encode/decode time per operation (median of --repeat runs after
+--warmup runs, each run looping until --min-time), the encoded size in bytes
+and memory allocated per operation (tracemalloc peak, and the blocks still
+held by the decoded object). tracemalloc only sees the Python allocator, so
+memory the protobuf C extension allocates natively is not counted. Results
+are saved as JSON to load_test_results/serialization_benchmark.json for
+compare_results.py.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Optional
+
+# Add gRPC service path
+grpc_service_path = os.path.join(os.path.dirname(__file__), "rpc-grpc-protobuf", "glossary_grpc_project", "glossary_service")
+sys.path.insert(0, grpc_service_path)
+
+from glossary_pb2 import ListTermsResponse, Term
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from pydantic import BaseModel, TypeAdapter
+except ImportError:
+    BaseModel = None
+
+RESULTS_DIR = "load_test_results"
+OUTPUT_FILE = os.path.join(RESULTS_DIR, "serialization_benchmark.json")
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000, 100000]
+DEFAULT_DESCRIPTION_LENGTHS = [32, 256, 2048]
+
+CREATED_AT = datetime(2024, 1, 1, 12, 0, 0)
+
+if BaseModel is not None:
+    class TermModel(BaseModel):
+        """Term as returned by the FastAPI server"""
+        id: int
+        keyword: str
+        description: str
+        created_at: datetime
+        updated_at: Optional[datetime] = None
+
+
+def make_terms(size, description_length):
+    """Plain term dicts, shaped like the REST API's JSON"""
+    description = ("Web Graphics Library " * (description_length // 21 + 1))[:description_length]
+    return [
+        {
+            "id": i + 1,
+            "keyword": f"Term_{i + 1}",
+            "description": description,
+            "created_at": CREATED_AT.isoformat(),
+            "updated_at": None,
+        }
+        for i in range(size)
+    ]
+
+
+def make_codecs(terms):
+    """Return {format: (encode, decode)} with inputs prepared outside the timed calls"""
+    codecs = {}
+
+    message = ListTermsResponse(terms=[
+        Term(id=t["id"], keyword=t["keyword"], description=t["description"]) for t in terms
+    ])
+    codecs["protobuf"] = (message.SerializeToString, ListTermsResponse.FromString)
+
+    if BaseModel is not None:
+        adapter = TypeAdapter(list[TermModel])
+        models = adapter.validate_python(terms)
+        codecs["pydantic"] = (lambda: adapter.dump_json(models), adapter.validate_json)
+
+    codecs["json"] = (lambda: json.dumps(terms).encode("utf-8"), json.loads)
+
+    if orjson is not None:
+        codecs["orjson"] = (lambda: orjson.dumps(terms), orjson.loads)
+
+    return codecs
+
+
+def time_per_op(func, warmup, repeat, min_time):
+    """Median nanoseconds per call of func() over repeat timed runs"""
+    for _ in range(warmup):
+        func()
+
+    # Calibrate the loop count so one run lasts at least min_time
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9:
+            break
+        loops = max(loops * 2, int(loops * min_time * 1e9 / max(elapsed, 1)))
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter_ns() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return statistics.median(samples), samples
+
+
+def measure_allocations(func):
+    """Peak bytes allocated during one call and blocks held by its result"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+    return peak - baseline, blocks
+
+
+def benchmark_point(size, description_length, args):
+    """Benchmark every format at one list size and description length"""
+    terms = make_terms(size, description_length)
+    points = []
+    for fmt, (encode, decode) in make_codecs(terms).items():
+        data = encode()
+        encode_ns, encode_samples = time_per_op(encode, args.warmup, args.repeat, args.min_time)
+        decode_ns, decode_samples = time_per_op(lambda: decode(data), args.warmup, args.repeat, args.min_time)
+        encode_alloc, _ = measure_allocations(encode)
+        decode_alloc, decode_blocks = measure_allocations(lambda: decode(data))
+        points.append({
+            "format": fmt,
+            "size": size,
+            "description_length": description_length,
+            "bytes": len(data),
+            "encode_ns": encode_ns,
+            "decode_ns": decode_ns,
+            "encode_stdev_ns": statistics.pstdev(encode_samples),
+            "decode_stdev_ns": statistics.pstdev(decode_samples),
+            "encode_alloc_bytes": encode_alloc,
+            "decode_alloc_bytes": decode_alloc,
+            "decode_alloc_blocks": decode_blocks,
+        })
+    return points
+
+
+def format_ns(ns):
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} us"
+    return f"{ns:.0f} ns"
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark protobuf vs JSON serialization of glossary terms")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of terms per message")
+    parser.add_argument("--description-lengths", type=int, nargs="+", default=DEFAULT_DESCRIPTION_LENGTHS,
+                        help="Description lengths in characters")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed calls before measuring")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per operation (median is reported)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timed run")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Where to save the JSON results")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    formats = ["protobuf"] + (["pydantic"] if BaseModel is not None else []) + ["json"]
+    formats += ["orjson"] if orjson is not None else []
+    print(f"Formats: {', '.join(formats)}")
+    if BaseModel is None or orjson is None:
+        print("(install pydantic and orjson to benchmark all formats)")
+
+    results = []
+    for description_length in args.description_lengths:
+        for size in args.sizes:
+            print(f"\n{size} terms, {description_length}-char descriptions")
+            for point in benchmark_point(size, description_length, args):
+                results.append(point)
+                print(f"  {point['format']:<9} encode {format_ns(point['encode_ns']):>10}  "
+                      f"decode {format_ns(point['decode_ns']):>10}  {point['bytes']:>10} bytes  "
+                      f"alloc {point['encode_alloc_bytes']:>9}/{point['decode_alloc_bytes']:>9} B")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {"warmup": args.warmup, "repeat": args.repeat, "min_time": args.min_time},
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults saved to: {args.output}")
+    print("Run 'python compare_results.py' to include them in the report.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
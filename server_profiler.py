@@ -0,0 +1,169 @@
+"""
+Sampling profiler for the servers under test
+
+Attaches py-spy to the server of the protocol under test (found by listening
+port or given by PID, as in server_sampler, children included) for the length
+of a run. py-spy reads the Python stacks from outside the process, so the
+servers need no code changes or restart, and with --nonblocking it does not
+pause them to take a sample. Samples are written as collapsed stacks, one
+"frame;frame;...;leaf count" line per distinct stack (the input of
+flamegraph.pl, inferno or speedscope), to server_profile.txt in the run's
+output directory.
+
+summarize_profile() reduces such a file to self time per function and to time
+per component (Pydantic, protobuf, SQLAlchemy, ...): the innermost frame of a
+known library on each stack. Without native unwinding, time in C code (SQLite,
+the protobuf runtime) is charged to the Python frame that called it, so SQLite
+queries show up under SQLAlchemy's execute. py-spy skips threads that are not
+running; a thread waiting for the SQLite file lock is one of them, so lock
+waits are only seen with idle=True, which also samples idle worker threads.
+
+Attaching to another process needs ptrace permission on Linux: run as root
+(sudo) or set kernel.yama.ptrace_scope to 0.
+"""
+import os
+import re
+import shutil
+import signal
+import subprocess
+from collections import Counter
+from contextlib import contextmanager
+
+from server_sampler import GRPC_PORT, REST_PORT, find_pid_by_port, psutil
+
+# File names of the collapsed stacks and of py-spy's output inside a run's output directory
+PROFILE_FILE = "server_profile.txt"
+PROFILE_LOG = "server_profile.log"
+
+# Samples per second
+DEFAULT_RATE = 100
+
+# Component of a frame by its file path; the innermost matching frame of a stack
+# decides where the sample's time went
+COMPONENTS = [
+    ("Pydantic", ("pydantic/", "pydantic_core/")),
+    ("protobuf", ("google/protobuf/",)),
+    ("SQLAlchemy / SQLite", ("sqlalchemy/", "sqlite3/")),
+    ("JSON", ("json/", "orjson/")),
+    ("FastAPI / Starlette", ("fastapi/", "starlette/")),
+    ("HTTP server", ("uvicorn/", "hypercorn/", "h11/", "h2/", "httptools/")),
+    ("gRPC runtime", ("grpc/",)),
+    ("asyncio / threads", ("asyncio/", "concurrent/futures/", "threading.py", "selectors.py", "queue.py")),
+]
+OTHER_COMPONENT = "other"
+
+# py-spy writes its output when interrupted. On Windows send_signal() only
+# delivers console events, and CTRL_BREAK_EVENT only to a process group of
+# its own, so py-spy is started in one there
+if os.name == "nt":
+    STOP_SIGNAL = signal.CTRL_BREAK_EVENT
+    POPEN_FLAGS = subprocess.CREATE_NEW_PROCESS_GROUP
+else:
+    STOP_SIGNAL = signal.SIGINT
+    POPEN_FLAGS = 0
+
+# "function (path/file.py:line)", as py-spy names frames
+FRAME_PATTERN = re.compile(r"^(?P<function>.*) \((?P<file>[^()]*?)(?::\d+)?\)$")
+
+
+def parse_frame(frame):
+    """(function, file) of a py-spy frame; file is "" for process and thread frames"""
+    match = FRAME_PATTERN.match(frame)
+    if match is None:
+        return frame, ""
+    return match["function"], match["file"]
+
+
+def component_of(file):
+    """Component a source file belongs to, or None"""
+    path = file.replace("\\", "/")
+    for component, markers in COMPONENTS:
+        if any(marker in path for marker in markers):
+            return component
+    return None
+
+
+def summarize_profile(path, top=10):
+    """Samples, top self-time functions and samples per component of a collapsed stack file"""
+    total = 0
+    self_samples = Counter()
+    components = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if not stack or not count.isdigit():
+                continue
+            count = int(count)
+            frames = [parse_frame(frame) for frame in stack.split(";")]
+            total += count
+            function, file = frames[-1]
+            self_samples[f"{function} ({file})" if file else function] += count
+            innermost = (component_of(file) for _, file in reversed(frames) if file)
+            components[next((component for component in innermost if component), OTHER_COMPONENT)] += count
+    return {
+        "samples": total,
+        "self": dict(self_samples.most_common(top)),
+        "components": dict(components.most_common()),
+    }
+
+
+class ServerProfiler:
+    """Profiles the server under test with py-spy during each test run"""
+
+    def __init__(self, servers, rate=DEFAULT_RATE, idle=False, executable="py-spy"):
+        # servers: {"rest": pid, "grpc": pid}
+        self.servers = servers
+        self.rate = rate
+        self.idle = idle
+        self.executable = executable
+
+    @classmethod
+    def create(cls, rest_pid=None, grpc_pid=None, rate=DEFAULT_RATE, idle=False):
+        """Profiler for the REST and gRPC servers, PIDs found by port unless given
+
+        Returns None (with a warning) when py-spy is missing or no server
+        process can be found.
+        """
+        executable = shutil.which("py-spy")
+        if executable is None:
+            print("Warning: py-spy is not installed, servers will not be profiled (pip install py-spy)")
+            return None
+        servers = {}
+        for name, pid, port in (("rest", rest_pid, REST_PORT), ("grpc", grpc_pid, GRPC_PORT)):
+            pid = pid or (find_pid_by_port(port) if psutil is not None else None)
+            if pid:
+                servers[name] = pid
+            else:
+                print(f"Warning: {name} server process not found (port {port}), pass its PID to profile it")
+        if not servers:
+            return None
+        return cls(servers, rate, idle, executable)
+
+    @contextmanager
+    def recording(self, output_dir, server):
+        """Profile one server ("rest" or "grpc") into output_dir/server_profile.txt while the block runs"""
+        pid = self.servers.get(server)
+        if pid is None:
+            yield
+            return
+        path = os.path.join(output_dir, PROFILE_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+        cmd = [self.executable, "record", "--pid", str(pid), "--rate", str(self.rate), "--format", "raw",
+               "--output", path, "--nonblocking", "--subprocesses"]
+        if self.idle:
+            cmd.append("--idle")
+        with open(os.path.join(output_dir, PROFILE_LOG), "w", encoding="utf-8") as log:
+            process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, creationflags=POPEN_FLAGS)
+            try:
+                yield
+            finally:
+                process.send_signal(STOP_SIGNAL)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+        if not os.path.exists(path):
+            print(f"  Warning: py-spy could not profile the {server} server (PID {pid}), "
+                  f"see {os.path.join(output_dir, PROFILE_LOG)}")
@@ -0,0 +1,202 @@
+"""
+Server-side resource sampler for load test runs
+
+Samples the FastAPI and gRPC server processes (found by listening port or
+given by PID, children included, e.g. uvicorn workers) at a fixed interval
+while a test runs. Each sample records CPU%, cumulative CPU seconds, RSS,
+thread count, context switches and open file descriptors; samples are
+written as they are taken to server_resources.csv in the run's output
+directory, one row per server per sample.
+"""
+import csv
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REST_PORT = 8000
+GRPC_PORT = 50051
+
+# File name of the time series inside a run's output directory
+SAMPLES_FILE = "server_resources.csv"
+
+SAMPLE_FIELDS = [
+    "timestamp",
+    "elapsed",
+    "server",
+    "pid",
+    "processes",
+    "cpu_percent",
+    "cpu_seconds",
+    "rss_bytes",
+    "threads",
+    "ctx_switches_voluntary",
+    "ctx_switches_involuntary",
+    "open_fds",
+]
+
+
+def find_pid_by_port(port):
+    """PID of the process listening on a local TCP port, or None"""
+    try:
+        connections = psutil.net_connections(kind="tcp")
+    except psutil.AccessDenied:
+        return None
+    for conn in connections:
+        if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+            return conn.pid
+    return None
+
+
+def _process_tree(pid):
+    process = psutil.Process(pid)
+    try:
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return [process]
+
+
+def _open_fds(process):
+    if hasattr(process, "num_fds"):
+        return process.num_fds()
+    return process.num_handles()
+
+
+def sample_process_tree(pid):
+    """Resource counters summed over a process and its children"""
+    totals = {
+        "processes": 0,
+        "cpu_seconds": 0.0,
+        "rss_bytes": 0,
+        "threads": 0,
+        "ctx_switches_voluntary": 0,
+        "ctx_switches_involuntary": 0,
+        "open_fds": 0,
+    }
+    for process in _process_tree(pid):
+        try:
+            with process.oneshot():
+                cpu = process.cpu_times()
+                ctx = process.num_ctx_switches()
+                totals["cpu_seconds"] += cpu.user + cpu.system
+                totals["rss_bytes"] += process.memory_info().rss
+                totals["threads"] += process.num_threads()
+                totals["ctx_switches_voluntary"] += ctx.voluntary
+                totals["ctx_switches_involuntary"] += ctx.involuntary
+                totals["open_fds"] += _open_fds(process)
+                totals["processes"] += 1
+        except psutil.Error:
+            # A worker exited between listing and sampling
+            continue
+    return totals
+
+
+class ServerSampler:
+    """Samples server process trees in a background thread during a test run"""
+
+    def __init__(self, servers, interval=1.0):
+        # servers: {"rest": pid, "grpc": pid}
+        self.servers = servers
+        self.interval = interval
+
+    @classmethod
+    def create(cls, rest_pid=None, grpc_pid=None, interval=1.0):
+        """Sampler for the REST and gRPC servers, PIDs found by port unless given
+
+        Returns None (with a warning) when psutil is missing or no server
+        process can be found.
+        """
+        if psutil is None:
+            print("Warning: psutil is not installed, server resources will not be sampled")
+            return None
+        servers = {}
+        for name, pid, port in (("rest", rest_pid, REST_PORT), ("grpc", grpc_pid, GRPC_PORT)):
+            pid = pid or find_pid_by_port(port)
+            if pid and psutil.pid_exists(pid):
+                servers[name] = pid
+            else:
+                print(f"Warning: {name} server process not found (port {port}), pass its PID to sample it")
+        if not servers:
+            return None
+        return cls(servers, interval)
+
+    def _run(self, path, stop):
+        start = time.time()
+        previous = {}
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=SAMPLE_FIELDS)
+            writer.writeheader()
+            stopping = False
+            while True:
+                now = time.time()
+                for name, pid in self.servers.items():
+                    try:
+                        totals = sample_process_tree(pid)
+                    except psutil.Error:
+                        continue
+                    # CPU% of the whole tree over the last interval (100% = one core)
+                    last = previous.get(name)
+                    cpu_percent = 0.0
+                    if last and now > last[0]:
+                        cpu_percent = (totals["cpu_seconds"] - last[1]) / (now - last[0]) * 100
+                    previous[name] = (now, totals["cpu_seconds"])
+                    writer.writerow({
+                        "timestamp": f"{now:.3f}",
+                        "elapsed": f"{now - start:.3f}",
+                        "server": name,
+                        "pid": pid,
+                        "cpu_percent": f"{max(cpu_percent, 0.0):.1f}",
+                        **totals,
+                        "cpu_seconds": f"{totals['cpu_seconds']:.3f}",
+                    })
+                f.flush()
+                if stopping:
+                    break
+                stopping = stop.wait(self.interval)
+
+    @contextmanager
+    def recording(self, output_dir):
+        """Sample the servers into output_dir/server_resources.csv while the block runs"""
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._run, args=(os.path.join(output_dir, SAMPLES_FILE), stop), daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            # The final sample is taken after the test so cumulative counters cover all of it
+            stop.set()
+            thread.join()
+
+
+def summarize_samples(path):
+    """Per-server totals and peaks from a server_resources.csv file"""
+    rows_by_server = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            rows_by_server.setdefault(row["server"], []).append(row)
+
+    summary = {}
+    for server, rows in rows_by_server.items():
+        first, last = rows[0], rows[-1]
+        summary[server] = {
+            "samples": len(rows),
+            "duration_seconds": float(last["elapsed"]) - float(first["elapsed"]),
+            "cpu_seconds": float(last["cpu_seconds"]) - float(first["cpu_seconds"]),
+            "peak_cpu_percent": max(float(r["cpu_percent"]) for r in rows),
+            "peak_rss_bytes": max(int(r["rss_bytes"]) for r in rows),
+            "baseline_rss_bytes": int(first["rss_bytes"]),
+            "peak_threads": max(int(r["threads"]) for r in rows),
+            "peak_open_fds": max(int(r["open_fds"]) for r in rows),
+            "ctx_switches": (
+                int(last["ctx_switches_voluntary"]) - int(first["ctx_switches_voluntary"])
+                + int(last["ctx_switches_involuntary"]) - int(first["ctx_switches_involuntary"])
+            ),
+        }
+    return summary
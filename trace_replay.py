@@ -0,0 +1,198 @@
+"""
+Trace-driven workload replay for Locust
+
+A trace is a JSONL file with one request per line, in timestamp order:
+
+    {"timestamp": 1718000000.125, "operation": "get", "keyword": "WebGL"}
+    {"timestamp": 1718000000.310, "operation": "search", "query": "Shader"}
+    {"timestamp": 1718000000.402, "operation": "list"}
+    {"timestamp": 1718000001.007, "operation": "add",
+     "payload": {"keyword": "Mipmap", "description": "Pre-filtered texture levels"}}
+
+timestamp is in seconds (epoch or relative) or an ISO 8601 string;
+operation is list/get/search/add (gRPC method names ListTerms, GetTerm,
+SearchTerms and AddTerm are accepted too). The file is streamed line by
+line, so traces of any size replay in constant memory.
+
+A TraceSchedule hands the events of the process out to users at their
+original offsets from the first event, divided by the speedup factor
+(2.0 replays twice as fast). As in open-loop mode, latency is measured from
+each event's intended start. In a distributed run every worker replays
+every N-th event of the trace, so the workers together send it once.
+"""
+import json
+import time
+from datetime import datetime
+
+from locust import LoadTestShape
+from locust.exception import StopUser
+
+# Canonical operation names and the trace field passed to the user's method
+OPERATIONS = {
+    "list": None,
+    "get": "keyword",
+    "search": "query",
+    "add": "payload",
+}
+
+OPERATION_ALIASES = {
+    "ListTerms": "list",
+    "GetTerm": "get",
+    "SearchTerms": "search",
+    "AddTerm": "add",
+}
+
+# Time for in-flight requests to finish after the last event is sent
+DRAIN_SECONDS = 10.0
+
+
+def parse_timestamp(value):
+    """Seconds from a numeric timestamp or an ISO 8601 string"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def parse_event(line):
+    """Normalized trace event from one JSONL line; raises ValueError if invalid"""
+    record = json.loads(line)
+    operation = OPERATION_ALIASES.get(record.get("operation"), record.get("operation"))
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {record.get('operation')!r}")
+    field = OPERATIONS[operation]
+    if field and not record.get(field):
+        raise ValueError(f"Operation {operation!r} needs {field!r}")
+    return {
+        "timestamp": parse_timestamp(record["timestamp"]),
+        "operation": operation,
+        "keyword": record.get("keyword"),
+        "query": record.get("query"),
+        "payload": record.get("payload"),
+    }
+
+
+def iter_trace(path, part=0, parts=1):
+    """Stream valid events of a trace, keeping every parts-th one starting at part
+
+    Invalid lines are skipped; their count is available as the generator's
+    return value via StopIteration.value.
+    """
+    invalid = 0
+    index = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                event = parse_event(line)
+            except (ValueError, KeyError, TypeError):
+                invalid += 1
+                continue
+            if index % parts == part:
+                yield event
+            index += 1
+    return invalid
+
+
+def trace_duration(path):
+    """Seconds between the first and the last event of a trace (one streaming pass)"""
+    first = last = None
+    for event in iter_trace(path):
+        if first is None:
+            first = event["timestamp"]
+        last = event["timestamp"]
+    if first is None:
+        raise ValueError(f"Trace {path} contains no valid events")
+    return last - first
+
+
+class TraceSchedule:
+    """Hands out trace events with their intended start times
+
+    Shared by all users of the process and anchored lazily on the first
+    event. Not thread-safe, but gevent only switches greenlets on I/O, so
+    next_event() is never interleaved.
+    """
+
+    def __init__(self, path, speedup=1.0):
+        if speedup <= 0:
+            raise ValueError("Trace speedup must be positive")
+        self.path = path
+        self.speedup = speedup
+        self.part = 0
+        self.parts = 1
+        self.start_time = None
+        self.first_timestamp = None
+        self.dispatched = 0
+        self.invalid = 0
+        self._events = None
+
+    def partition(self, part, parts):
+        """Replay only every parts-th event starting at part (before the first event)"""
+        self.part = part
+        self.parts = parts
+
+    def next_event(self):
+        """Reserve the next event; returns (intended start, event) or None at the end of the trace"""
+        if self._events is None:
+            # Offsets count from the first event of the whole trace, not of this part
+            for event in iter_trace(self.path):
+                self.first_timestamp = event["timestamp"]
+                break
+            self._events = iter_trace(self.path, self.part, self.parts)
+            self.start_time = time.time()
+        try:
+            event = next(self._events)
+        except StopIteration as end:
+            # Only the first StopIteration carries the count, later ones are empty
+            if end.value is not None:
+                self.invalid = end.value
+            return None
+        self.dispatched += 1
+        offset = (event["timestamp"] - self.first_timestamp) / self.speedup
+        return self.start_time + offset, event
+
+
+def trace_wait_time(schedule):
+    """Build a wait_time function that sleeps each user until its next trace event"""
+
+    def wait_time(user):
+        arrival = schedule.next_event()
+        if arrival is None:
+            # Trace is over: the shape stops the test once in-flight requests drain
+            raise StopUser()
+        user.intended_start, user.trace_event = arrival
+        return max(0.0, user.intended_start - time.time())
+
+    return wait_time
+
+
+def replay_event(user, event, methods):
+    """Call the user's method for the event's operation with the event's argument
+
+    methods maps operations to method names of the user class, e.g.
+    {"list": "list_terms", "get": "get_term", ...}.
+    """
+    method = getattr(user, methods[event["operation"]])
+    field = OPERATIONS[event["operation"]]
+    if field:
+        method(event[field])
+    else:
+        method()
+
+
+class TraceReplayShape(LoadTestShape):
+    """Keep a fixed pool of users for the length of the trace, then stop
+
+    Abstract: subclasses set users and duration (trace length in seconds at
+    replay speed).
+    """
+
+    abstract = True
+    users = 1
+    duration = 0.0
+
+    def tick(self):
+        if self.get_run_time() >= self.duration + DRAIN_SECONDS:
+            return None
+        return (self.users, self.users)